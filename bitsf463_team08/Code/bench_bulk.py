@@ -0,0 +1,113 @@
+import os
+import time
+
+from twisted.internet import reactor
+from twisted.internet.protocol import DatagramProtocol
+
+from bulk import BulkChannel
+from io_worker import IOWorker
+from send_queue import SendQueue
+from sync import Snapshot, StateSync
+from wire import MESSAGE_TYPES, decode_message
+
+"""This file measures the throughput of a snapshot sync between two nodes over UDP datagrams and over the TCP bulk channel"""
+
+BASE_PORT = 22000
+
+# Seconds to wait for a sync to complete
+ROUND_TIMEOUT = 120.0
+
+class BenchSync(StateSync):
+    """This class downloads snapshots without applying them"""
+
+    def apply(self, data : bytes) -> None:
+        """Function to skip applying the snapshot, only the transfer is measured"""
+        pass
+
+class SyncNode(DatagramProtocol):
+    """This class defines a node that only serves and downloads snapshots"""
+
+    def __init__(self, port : int, bulk : bool) -> None:
+        """Initializes the node"""
+        self.port_no = port
+        self.host = "127.0.0.1"
+        self.outbox = SendQueue(self)
+        self.bulk = BulkChannel(self, bulk)
+        self.io = IOWorker()
+        self.sync = BenchSync(self)
+        self.done = None
+
+        self.handlers = {
+            MESSAGE_TYPES["sync_manifest"] : lambda data, addr : self.sync.start(data, addr),
+            MESSAGE_TYPES["request_chunks"] : lambda data, addr : self.sync.serve_chunks(data[0], data[1], addr),
+            MESSAGE_TYPES["sync_chunk"] : lambda data, addr : self.sync.receive_chunk(*data),
+        }
+
+    def startProtocol(self) -> None:
+        """Function to start the I/O worker and accept bulk connections"""
+        self.io.start()
+        self.bulk.listen(self.port_no, "127.0.0.1")
+
+    def datagramReceived(self, datagram : bytes, addr : tuple) -> None:
+        """Function to hand sync messages to the sync handler"""
+        message = decode_message(datagram)
+        if message is not None and message.type in self.handlers:
+            self.handlers[message.type](message.data, addr)
+
+    def transfer_data(self, data : bytes, addr : tuple) -> None:
+        """Function to send a datagram through the send queue"""
+        self.outbox.send(data, addr)
+
+    def sync_done(self) -> None:
+        """Function to record when the download completed"""
+        self.done = time.perf_counter()
+
+def run_round(pairs : dict, rounds : list, results : list) -> None:
+    """Function to sync a snapshot from one node to the other and measure how long it takes, then start the next round"""
+    transport, size = rounds.pop(0)
+    server, downloader = pairs[transport]
+    downloader.done = None
+
+    # Random bytes in hex, so that the snapshot does not compress and has the size asked for
+    snapshot = Snapshot(os.urandom(size // 2).hex().encode("ascii"))
+    start = time.perf_counter()
+    server.sync.send_manifest(snapshot, ("127.0.0.1", downloader.port_no))
+
+    def finish():
+        elapsed = downloader.done - start if downloader.done is not None else None
+        results.append((transport, size, elapsed))
+
+        if len(rounds) != 0:
+            run_round(pairs, rounds, results)
+        else:
+            reactor.stop()
+
+    def check(deadline : float):
+        if downloader.done is not None or time.perf_counter() > deadline:
+            finish()
+        else:
+            reactor.callLater(0.01, check, deadline)
+
+    check(start + ROUND_TIMEOUT)
+
+if __name__ == "__main__":
+    pairs = {}
+    for index, transport in enumerate(("udp", "tcp")):
+        nodes = []
+        for port in (BASE_PORT + 2 * index, BASE_PORT + 2 * index + 1):
+            node = SyncNode(port, transport == "tcp")
+            reactor.listenUDP(port, node, interface = "127.0.0.1")
+            nodes.append(node)
+        pairs[transport] = nodes
+
+    rounds = [(transport, size) for size in (1024 * 1024, 8 * 1024 * 1024, 32 * 1024 * 1024) for transport in ("udp", "tcp")]
+    results = []
+    reactor.callWhenRunning(run_round, pairs, rounds, results)
+    reactor.run()
+
+    print("%10s %10s %10s %8s" % ("transport", "MB", "seconds", "MB/s"))
+    for transport, size, elapsed in results:
+        if elapsed is None:
+            print("%10s %10.1f %10s %8s" % (transport, size / 2 ** 20, "timeout", "-"))
+        else:
+            print("%10s %10.1f %10.2f %8.1f" % (transport, size / 2 ** 20, elapsed, size / 2 ** 20 / elapsed))
@@ -0,0 +1,105 @@
+import statistics
+import time
+
+from twisted.internet import reactor
+from twisted.internet.protocol import DatagramProtocol
+
+from block import Block
+from dedup import DedupCache
+from gossip import Gossip, message_key
+from liveness import PeerMonitor
+from reliable import RELIABLE_TYPE, ACK_TYPE, ReliableChannel
+from send_queue import SendQueue
+from wire import MESSAGE_TYPES, decode_message
+
+"""This file measures how long a new block takes to reach every node of a simulated network over loopback UDP"""
+
+NODE_COUNT = 500
+BASE_PORT = 20000
+
+# Seconds to wait for a block to reach every node
+ROUND_TIMEOUT = 5.0
+
+class SimNode(DatagramProtocol):
+    """This class defines a node that only takes part in the gossip overlay"""
+
+    def __init__(self, index : int, peer_list : dict) -> None:
+        """Initializes the node"""
+        self.id = str(index)
+        self.peer_list = peer_list
+        self.outbox = SendQueue(self)
+        self.reliable = ReliableChannel(self)
+        self.gossip = Gossip(self)
+        self.dedup = DedupCache()
+
+        # Never started, so every peer stays alive for the overlay
+        self.monitor = PeerMonitor(self)
+        self.received = {}
+
+    def datagramReceived(self, datagram : bytes, addr : tuple) -> None:
+        """Function to pass gossip messages seen for the first time to the overlay"""
+        message = decode_message(datagram)
+        if message is not None and (message.type == RELIABLE_TYPE or message.type == ACK_TYPE):
+            for inner in self.reliable.receive(message, addr):
+                self.datagramReceived(inner, addr)
+        elif message is not None and message.type == MESSAGE_TYPES["gossip"] and self.dedup.check(message_key(message.payload)):
+            self.gossip.receive(*message.data, addr)
+
+    def deliver(self, message_type : int, data, addr : tuple) -> None:
+        """Function to record when a block first reached the node"""
+        self.received.setdefault(data[0], time.perf_counter())
+
+def run_round(nodes : list, fanout, ttl : int, results : list, rounds : list) -> None:
+    """Function to mint a block at a node and measure when it reaches the others, then start the next round"""
+    for node in nodes:
+        node.gossip.fanout = fanout
+        node.gossip.ttl = ttl
+        node.outbox.sent = 0
+        node.dedup.checked = 0
+        node.dedup.dropped = 0
+
+    origin = nodes[len(results) % len(nodes)]
+    block = Block(str(len(results)), [])
+    block_hash = block.get_hash()
+
+    start = time.perf_counter()
+    origin.received[block_hash] = start
+    origin.gossip.publish("new_block", [block_hash, block.details])
+
+    def finish():
+        times = [node.received[block_hash] - start for node in nodes if block_hash in node.received]
+        sent = [node.outbox.sent for node in nodes]
+        dropped = sum(node.dedup.dropped for node in nodes)
+        results.append((fanout, ttl, len(times), statistics.median(times), max(times), sum(sent), origin.outbox.sent, max(sent), dropped))
+
+        if len(rounds) != 0:
+            run_round(nodes, *rounds.pop(0), results, rounds)
+        else:
+            reactor.stop()
+
+    def check(deadline : float):
+        if all(block_hash in node.received for node in nodes) or time.perf_counter() > deadline:
+            # Leave time for the last relays to be counted
+            reactor.callLater(0.2, finish)
+        else:
+            reactor.callLater(0.01, check, deadline)
+
+    check(start + ROUND_TIMEOUT)
+
+if __name__ == "__main__":
+    peer_list = {str(index) : {"port_no" : BASE_PORT + index, "properties" : []} for index in range(NODE_COUNT)}
+    nodes = [SimNode(index, peer_list) for index in range(NODE_COUNT)]
+    for index, node in enumerate(nodes):
+        reactor.listenUDP(BASE_PORT + index, node, interface = "127.0.0.1")
+
+    # Sending to every peer directly, as before the overlay, then gossip with the default and a few fixed fan-outs
+    rounds = [(NODE_COUNT - 1, 1)] * 3 + [(None, 8)] * 3 + [(4, 8)] * 3 + [(6, 8)] * 3
+    results = []
+    reactor.callWhenRunning(run_round, nodes, *rounds.pop(0), results, rounds)
+    reactor.run()
+
+    print("%8s %4s %9s %10s %10s %11s %12s %14s %11s" % ("fanout", "ttl", "reached", "median ms", "last ms", "datagrams",
+                                                          "origin sent", "max node sent", "duplicates"))
+    for fanout, ttl, reached, median, last, total, origin, most, dropped in results:
+        print("%8s %4d %5d/%-3d %10.1f %10.1f %11d %12d %14d %11d" % ("auto" if fanout is None else fanout, ttl, reached, NODE_COUNT,
+                                                                       median * 1e3, last * 1e3, total, origin, most, dropped))
@@ -0,0 +1,128 @@
+import random
+
+from twisted.internet import reactor
+from twisted.internet.protocol import DatagramProtocol
+
+from dedup import DedupCache
+from gossip import Gossip, message_key
+from liveness import DEAD, PeerMonitor
+from reliable import RELIABLE_TYPE, ACK_TYPE, ReliableChannel
+from send_queue import SendQueue
+from wire import MESSAGE_TYPES, decode_message
+
+"""This file measures how quickly peers that leave are detected, and the datagrams still sent to them, in a simulated network"""
+
+NODE_COUNT = 100
+LEAVING = 20
+BASE_PORT = 23000
+
+# Seconds at which the leaving nodes stop, and seconds the run lasts
+LEAVE_AT = 3
+DURATION = 20
+
+# Messages gossiped per second by random nodes
+PUBLISH_RATE = 10
+
+PROBE_TYPES = {MESSAGE_TYPES[tag] : tag for tag in ("ping", "ping_request", "ping_ack")}
+
+class CountingQueue(SendQueue):
+    """This class counts the datagrams sent to nodes that left"""
+
+    def __init__(self, client, departed : set) -> None:
+        """Initializes the queue"""
+        super().__init__(client)
+        self.departed = departed
+        self.wasted = 0
+
+    def write(self, destination, data : bytes, addr : tuple) -> None:
+        """Function to count the datagram before sending it"""
+        if self.client.transport is None:
+            return
+
+        if addr in self.departed:
+            self.wasted += 1
+        super().write(destination, data, addr)
+
+class SimNode(DatagramProtocol):
+    """This class defines a node taking part in the gossip overlay and the failure detector"""
+
+    def __init__(self, index : int, peer_list : dict, departed : set) -> None:
+        """Initializes the node"""
+        self.id = str(index)
+        self.peer_list = peer_list
+        self.outbox = CountingQueue(self, departed)
+        self.reliable = ReliableChannel(self)
+        self.gossip = Gossip(self)
+        self.dedup = DedupCache()
+        self.monitor = PeerMonitor(self)
+
+    def datagramReceived(self, datagram : bytes, addr : tuple) -> None:
+        """Function to hand probes to the failure detector and gossip to the overlay"""
+        message = decode_message(datagram)
+        if message is None:
+            return
+        self.monitor.heard(addr)
+
+        if message.type == RELIABLE_TYPE or message.type == ACK_TYPE:
+            for inner in self.reliable.receive(message, addr):
+                self.datagramReceived(inner, addr)
+        elif message.type in PROBE_TYPES:
+            getattr(self.monitor, "receive_" + PROBE_TYPES[message.type])(*message.data, addr)
+        elif message.type == MESSAGE_TYPES["gossip"] and self.dedup.check(message_key(message.payload)):
+            self.gossip.receive(*message.data, addr)
+
+    def deliver(self, message_type : int, data, addr : tuple) -> None:
+        """Function to ignore delivered messages, only the traffic is measured"""
+        pass
+
+    def leave(self) -> None:
+        """Function to stop the node without telling anyone"""
+        if self.monitor.timer.active():
+            self.monitor.timer.cancel()
+        self.transport.stopListening()
+
+def publish(nodes : list) -> None:
+    """Function to gossip a message from a random node that is still running"""
+    random.choice(nodes).gossip.publish("new_block", [random.getrandbits(64), {}])
+    reactor.callLater(1 / PUBLISH_RATE, publish, nodes)
+
+def sample(staying : list, leaving : list, second : int, rows : list) -> None:
+    """Function to record the traffic of the last second and how many nodes know about the nodes that left"""
+    wasted = sum(node.outbox.wasted for node in staying)
+    sent = sum(node.outbox.sent for node in staying)
+    for node in staying:
+        node.outbox.wasted = 0
+        node.outbox.sent = 0
+
+    known = sum(1 for node in staying for gone in leaving if node.monitor.member(gone.id).state == DEAD)
+    false = sum(1 for node in staying for other in staying if other is not node and node.monitor.member(other.id).state == DEAD)
+    rows.append((second, sent, wasted, known / (len(staying) * len(leaving)), false))
+
+    if second == LEAVE_AT:
+        for node in leaving:
+            node.leave()
+
+    if second < DURATION:
+        reactor.callLater(1, sample, staying, leaving, second + 1, rows)
+    else:
+        reactor.stop()
+
+if __name__ == "__main__":
+    peer_list = {str(index) : {"port_no" : BASE_PORT + index, "properties" : []} for index in range(NODE_COUNT)}
+    departed = {("127.0.0.1", BASE_PORT + index) for index in range(NODE_COUNT - LEAVING, NODE_COUNT)}
+    nodes = [SimNode(index, peer_list, departed) for index in range(NODE_COUNT)]
+    for index, node in enumerate(nodes):
+        reactor.listenUDP(BASE_PORT + index, node, interface = "127.0.0.1")
+        node.monitor.start()
+
+    staying = nodes[:NODE_COUNT - LEAVING]
+    leaving = nodes[NODE_COUNT - LEAVING:]
+    rows = []
+    reactor.callWhenRunning(publish, staying)
+    reactor.callWhenRunning(sample, staying, leaving, 0, rows)
+    reactor.run()
+
+    print("%d nodes, %d leave at %d s, %d messages gossiped per second" % (NODE_COUNT, LEAVING, LEAVE_AT, PUBLISH_RATE))
+    print("%6s %10s %14s %12s %16s" % ("second", "datagrams", "to departed", "known dead", "false evictions"))
+    for second, sent, wasted, known, false in rows[1:]:
+        print("%6d %10d %14d %11.0f%% %16d" % (second, sent, wasted, known * 100, false))
@@ -0,0 +1,38 @@
+import time
+import uuid
+
+from wire import encode_message
+
+"""This file compares the bytes sent to the network when a peer joins, with full peer lists and with membership deltas"""
+
+SIZES = [10, 100, 1000, 5000]
+
+# Properties owned by every peer, which the old peer list carried in every broadcast
+PROPERTIES_PER_PEER = 10
+
+def old_peer_list(size : int) -> dict:
+    """Function to build a peer list as it was broadcast before, with the ownership of every peer"""
+    return {str(uuid.uuid4()) : {"host" : "127.0.0.1", "port_no" : 1000 + index,
+                                 "properties" : ["%daddr%d" % (index, n) for n in range(PROPERTIES_PER_PEER)]}
+            for index in range(size)}
+
+def new_peer_list(size : int) -> dict:
+    """Function to build a peer list holding only the endpoints of the peers"""
+    return {str(uuid.uuid4()) : {"host" : "127.0.0.1", "port_no" : 1000 + index} for index in range(size)}
+
+if __name__ == "__main__":
+    print("%6s %16s %16s %14s %10s" % ("peers", "full list (KB)", "deltas (KB)", "snapshot (KB)", "encode us"))
+    for size in SIZES:
+        origin = str(uuid.uuid4())
+
+        # Every peer used to receive the full list, now every peer receives the delta and only the new user the full membership
+        full = len(encode_message("peer_list_update", old_peer_list(size)))
+        delta = len(encode_message("membership_delta", [origin, size, "join", str(uuid.uuid4()), ["127.0.0.1", 1000 + size]]))
+        snapshot = len(encode_message("membership", [{origin : size}, new_peer_list(size)]))
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            encode_message("membership_delta", [origin, size, "join", origin, ["127.0.0.1", 1000]])
+        encode = (time.perf_counter() - start) * 1000
+
+        print("%6d %16.1f %16.1f %14.1f %10.2f" % (size, full * size / 1024, delta * size / 1024, snapshot / 1024, encode))
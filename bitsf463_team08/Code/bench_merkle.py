@@ -0,0 +1,33 @@
+import random
+import string
+import time
+
+from block import Block
+
+"""This file benchmarks building the merkle tree of a block and creating and verifying inclusion proofs"""
+
+def benchmark(count : int, samples : int = 1000) -> None:
+    """Function to time the merkle tree operations for a block with the given number of transactions"""
+    transactions = [''.join(random.choices(string.ascii_letters, k = 15)) for _ in range(count)]
+    chosen = random.choices(transactions, k = samples)
+
+    start = time.perf_counter()
+    block = Block("", transactions)
+    build_time = time.perf_counter() - start
+    root = block.details["header"]["merkle_root"]
+
+    start = time.perf_counter()
+    proofs = [block.inclusion_proof(tx_id) for tx_id in chosen]
+    proof_time = (time.perf_counter() - start) / samples
+
+    start = time.perf_counter()
+    for tx_id, proof in zip(chosen, proofs):
+        assert Block.verify_inclusion(root, tx_id, proof)
+    verify_time = (time.perf_counter() - start) / samples
+
+    print("%7d transactions: build %10.3f ms, proof %8.2f us, verify %8.2f us, proof length %d" %
+          (count, build_time * 1e3, proof_time * 1e6, verify_time * 1e6, len(proofs[0])))
+
+if __name__ == "__main__":
+    for count in (10, 1000, 100000):
+        benchmark(count)
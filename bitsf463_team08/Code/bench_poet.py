@@ -0,0 +1,44 @@
+import numpy as np
+
+from poet import TARGET_INTERVAL
+
+"""This file simulates the block interval and fork rate of the Proof of Elapsed Time against the size of the network"""
+
+SIZES = [2, 5, 10, 20, 50, 100, 200, 500]
+ROUNDS = 20000
+
+# Seconds a block takes to reach the other peers, which mint a competing block if their wait ends before it arrives
+PROPAGATION_DELAY = 0.1
+
+def draw_fixed(rng, rounds : int, peers : int) -> np.ndarray:
+    """Function to draw the waits as older clients did, uniform up to 15 s after half a second"""
+    return 0.5 + rng.uniform(0, 15, (rounds, peers))
+
+def draw_exponential(rng, rounds : int, peers : int) -> np.ndarray:
+    """Function to draw exponential waits with the rate scaled by the number of peers"""
+    return rng.exponential(peers * TARGET_INTERVAL, (rounds, peers))
+
+def draw_uniform(rng, rounds : int, peers : int) -> np.ndarray:
+    """Function to draw uniform waits stretched by the number of peers"""
+    return rng.uniform(0, (peers + 1) * TARGET_INTERVAL, (rounds, peers))
+
+def simulate(draw, rng, peers : int) -> tuple:
+    """Function to get the mean block interval and the fraction of rounds in which a second peer mints before the block reaches it"""
+    waits = np.sort(draw(rng, ROUNDS, peers), axis = 1)
+    interval = waits[:, 0] + PROPAGATION_DELAY
+    forks = waits[:, 1] - waits[:, 0] < PROPAGATION_DELAY
+    return interval.mean(), forks.mean()
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    schemes = [("uniform 0-15 s", draw_fixed), ("exponential", draw_exponential), ("scaled uniform", draw_uniform)]
+
+    print("%d rounds, %.1f s target, %.0f ms propagation" % (ROUNDS, TARGET_INTERVAL, PROPAGATION_DELAY * 1e3))
+    print("%6s" % "peers" + "".join("%30s" % name for name, _ in schemes))
+    print("%6s" % "" + "%15s %14s" % ("interval (s)", "forks") * len(schemes))
+    for peers in SIZES:
+        row = "%6d" % peers
+        for _, draw in schemes:
+            interval, forks = simulate(draw, rng, peers)
+            row += "%15.2f %13.2f%%" % (interval, forks * 100)
+        print(row)
@@ -0,0 +1,64 @@
+import base64
+import random
+import string
+import time
+
+from reconcile import INITIAL_CELLS, Sketch, short_id, sketch_fits
+from wire import encode_message
+
+"""This file benchmarks the bytes exchanged reconciling two mempools with sketches against announcing every pending transaction"""
+
+IDS_PER_MESSAGE = 256
+
+def random_ids(count : int) -> list:
+    """Function to generate transaction IDs in the format used by the Transaction class"""
+    return [''.join(random.choices(string.ascii_letters, k = 15)) for _ in range(count)]
+
+def reconcile(ours : list, theirs : list) -> tuple:
+    """Function to run one reconciliation, returning the bytes sent, the number of round trips and whether it fell back to the inventory"""
+    our_ids = {short_id(transaction_id) : transaction_id for transaction_id in ours}
+    their_ids = {short_id(transaction_id) : transaction_id for transaction_id in theirs}
+
+    sent = 0
+    rounds = 0
+    cells = INITIAL_CELLS
+    while cells == INITIAL_CELLS or sketch_fits(cells, ours):
+        rounds += 1
+        sketch = Sketch.of(our_ids, cells)
+        sent += len(encode_message("mempool_sketch", [base64.b64encode(sketch.to_bytes()).decode("ascii")]))
+
+        # The peer subtracts our sketch from its own
+        result = Sketch.of(their_ids, cells).subtract(sketch).decode()
+        if result is not None:
+            only_theirs, only_ours = result
+            sent += len(encode_message("sketch_difference", [[their_ids[key] for key in only_theirs], only_ours]))
+            return sent, rounds, False
+
+        sent += len(encode_message("sketch_failed", [cells]))
+        cells *= 2
+
+    return sent + inventory(ours), rounds, True
+
+def inventory(ids : list) -> int:
+    """Function to get the bytes of announcing every pending transaction ID to a peer"""
+    return sum(len(encode_message("inventory", [ids[start:start + IDS_PER_MESSAGE]]))
+               for start in range(0, len(ids), IDS_PER_MESSAGE))
+
+if __name__ == "__main__":
+    print("%8s %10s %12s %12s %7s %9s %10s" % ("mempool", "difference", "sketch B", "inventory B", "rounds", "fallback", "time ms"))
+    for size in (100, 1000, 10000):
+        for difference in (0, 2, 10, 50, 200):
+            if difference >= size:
+                continue
+
+            common = random_ids(size - difference // 2)
+            ours = common + random_ids(difference // 2)
+            theirs = common + random_ids(difference - difference // 2)
+
+            start = time.perf_counter()
+            sent, rounds, fallback = reconcile(ours, theirs)
+            elapsed = time.perf_counter() - start
+
+            # Without sketches both peers announce every pending transaction to each other
+            print("%8d %10d %12d %12d %7d %9s %10.2f" % (size, difference, sent, inventory(ours) + inventory(theirs),
+                                                        rounds, fallback, elapsed * 1e3))
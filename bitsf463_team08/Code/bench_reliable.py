@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+
+from twisted.internet import reactor
+from twisted.internet.protocol import DatagramProtocol
+
+from reliable import RELIABLE_TYPE, ACK_TYPE, ReliableChannel
+from send_queue import SendQueue
+from wire import MESSAGE_TYPES, encode_message, decode_message
+
+"""This file measures the delivery rate and latency of the reliable channel over loopback UDP with simulated packet loss"""
+
+BASE_PORT = 21000
+MESSAGES = 200
+
+# Seconds to wait for the messages of a round to arrive
+ROUND_TIMEOUT = 30.0
+
+class LossyNode(DatagramProtocol):
+    """This class defines a node that drops a fraction of the datagrams it receives"""
+
+    def __init__(self) -> None:
+        """Initializes the node"""
+        self.outbox = SendQueue(self)
+        self.reliable = ReliableChannel(self)
+        self.loss = 0.0
+        self.received = {}
+
+    def datagramReceived(self, datagram : bytes, addr : tuple) -> None:
+        """Function to drop a datagram at random, or handle it"""
+        if random.random() >= self.loss:
+            self.handle(datagram, addr)
+
+    def handle(self, datagram : bytes, addr : tuple) -> None:
+        """Function to record when a message arrived, unwrapping reliable frames"""
+        message = decode_message(datagram)
+        if message is None:
+            return
+
+        if message.type == RELIABLE_TYPE or message.type == ACK_TYPE:
+            for inner in self.reliable.receive(message, addr):
+                self.handle(inner, addr)
+        elif message.type == MESSAGE_TYPES["blocks"]:
+            self.received.setdefault(message.data[0], time.perf_counter())
+
+def run_round(sender : LossyNode, receiver : LossyNode, rounds : list, results : list) -> None:
+    """Function to send a batch of messages with and without the reliable channel and measure when they arrive"""
+    size, loss, reliable = rounds.pop(0)
+    sender.loss = receiver.loss = loss
+    receiver.received = {}
+    sender.reliable.retransmitted = 0
+
+    addr = ("127.0.0.1", BASE_PORT + 1)
+    padding = "x" * size
+    sent = {}
+    for index in range(MESSAGES):
+        data = encode_message("blocks", [index, padding])
+        sent[index] = time.perf_counter()
+        if reliable:
+            sender.reliable.send(data, addr)
+        else:
+            sender.outbox.send(data, addr)
+
+    def finish():
+        times = [receiver.received[index] - sent[index] for index in receiver.received]
+        results.append((size, loss, reliable, len(times), statistics.median(times) if len(times) != 0 else 0.0,
+                        max(times, default = 0.0), sender.reliable.retransmitted))
+
+        if len(rounds) != 0:
+            run_round(sender, receiver, rounds, results)
+        else:
+            reactor.stop()
+
+    def check(deadline : float):
+        # Plain datagrams are never sent again, so give them only a short while
+        if len(receiver.received) == MESSAGES or time.perf_counter() > deadline:
+            finish()
+        else:
+            reactor.callLater(0.01, check, deadline)
+
+    check(time.perf_counter() + (ROUND_TIMEOUT if reliable else 1.0))
+
+if __name__ == "__main__":
+    sender = LossyNode()
+    receiver = LossyNode()
+    reactor.listenUDP(BASE_PORT, sender, interface = "127.0.0.1")
+    reactor.listenUDP(BASE_PORT + 1, receiver, interface = "127.0.0.1")
+
+    # Small messages fit a single datagram, large ones are split into fragments
+    rounds = [(size, loss, reliable) for size in (200, 20000) for loss in (0.0, 0.05, 0.2) for reliable in (False, True)]
+    results = []
+    reactor.callWhenRunning(run_round, sender, receiver, rounds, results)
+    reactor.run()
+
+    print("%8s %6s %9s %10s %10s %10s %14s" % ("bytes", "loss", "reliable", "delivered", "median ms", "last ms", "retransmitted"))
+    for size, loss, reliable, delivered, median, last, retransmitted in results:
+        print("%8d %5.0f%% %9s %6d/%-3d %10.1f %10.1f %14d" % (size, loss * 100, reliable, delivered, MESSAGES,
+                                                              median * 1e3, last * 1e3, retransmitted))
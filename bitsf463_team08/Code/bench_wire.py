@@ -0,0 +1,87 @@
+import json
+import time
+
+from wire import MESSAGE_TYPES, encode_message, decode_message
+
+"""This file benchmarks decoding and dispatching every message type with the binary format and the old JSON format"""
+
+HASH = "f6c18bf902f116da40a79e5930f23f5592f24916e8dcb1bebfcc19913856fadb"
+TRANSACTION = {"buyer_id" : "8670204c-4bfc-48ee-8db5-b9e69e5257b6", "seller_id" : "NA",
+               "property_id" : "536addrA", "amount" : 0.0, "time" : "2023-04-22 17:57:26.426575"}
+HEADER = {"prev_hash" : HASH, "timestamp" : "2023-04-22 17:57:26.426575", "merkle_root" : HASH}
+BLOCK = {"header" : HEADER, "body" : {"transactions" : ["rsDdUpjgfAjpinx", "MSRhPDHqmpPygMx", "LeSHSYfYmGoSivn"]}}
+PEERS = {"8670204c-4bfc-48ee-8db5-b9e69e5257b6" : {"port_no" : 1000, "properties" : ["536addrA"]}}
+
+# A representative payload for every message type
+PAYLOADS = {
+    "temp_properties" : {"536addrA" : {"address" : "addrA", "history" : []}},
+    "temp_transactions" : {"rsDdUpjgfAjpinx" : TRANSACTION},
+    "new_user" : ["8670204c-4bfc-48ee-8db5-b9e69e5257b6", 1001],
+    "peer_list_update" : PEERS,
+    "new_block" : [HASH, BLOCK],
+    "request_update" : [HASH],
+    "sending_transaction_with_h" : [{"rsDdUpjgfAjpinx" : TRANSACTION}, 321, 1000, 536, 761, 6],
+    "sending_transaction_with_b" : [{"rsDdUpjgfAjpinx" : TRANSACTION}, 1, 1001],
+    "sending_transaction_with_s" : [{"rsDdUpjgfAjpinx" : TRANSACTION}, 55, 1000, {"536addrA" : {"address" : "addrA", "history" : []}}],
+    "proof_result" : [{"rsDdUpjgfAjpinx" : TRANSACTION}, True, 1001],
+    "sync_manifest" : [HASH[:16], 6563177, 1603, HASH],
+    "request_manifest" : "",
+    "request_chunks" : [HASH[:16], list(range(8))],
+    "sync_chunk" : [HASH[:16], 7, HASH, "A" * 5464],
+    "sync_expired" : [HASH[:16]],
+    "tip" : [HASH],
+    "request_headers" : [HASH, HASH],
+    "headers" : [[[HASH, HEADER]] * 24, HASH, False],
+    "request_bodies" : [[HASH] * 8],
+    "bodies" : [[[HASH, BLOCK["body"]["transactions"], {"rsDdUpjgfAjpinx" : TRANSACTION}, {"536addrA" : "addrA"}]] * 8],
+    "request_mempool" : "",
+    "mempool" : [{"rsDdUpjgfAjpinx" : TRANSACTION}, {"536addrA" : {"address" : "addrA", "history" : []}}],
+    "request_blocks" : [HASH, HASH],
+    "blocks" : [[[HASH, BLOCK]] * 4, HASH],
+    "update" : [[[HASH, HEADER, BLOCK["body"]["transactions"], {"rsDdUpjgfAjpinx" : TRANSACTION}, {"536addrA" : "addrA"}]] * 4, HASH],
+    "inventory" : [["rsDdUpjgfAjpinx"]],
+    "request_transactions" : [["rsDdUpjgfAjpinx"]],
+    "transactions" : [[["rsDdUpjgfAjpinx", TRANSACTION, {"address" : "addrA", "history" : []}]]],
+    "mempool_sketch" : ["A" * 256],
+    "sketch_failed" : [12],
+    "sketch_difference" : [["rsDdUpjgfAjpinx"], [17766008309425328791]],
+    "gossip" : ["f6c18bf902f116da", 8, 5, [HASH, BLOCK]],
+}
+
+# Tags in the order the old if/elif chain compared them, leaving out the ones with binary payloads
+TAGS = [tag for tag in MESSAGE_TYPES if tag in PAYLOADS]
+HANDLERS = {MESSAGE_TYPES[tag] : tag for tag in TAGS}
+
+def json_path(datagram : bytes):
+    """Old path: decode and parse the whole datagram, then compare the tag against every branch"""
+    datagram = json.loads(datagram.decode("utf-8"))
+    for tag in TAGS:
+        if datagram["tag"] == tag:
+            return tag, datagram["data"]
+
+def binary_dispatch(datagram : bytes):
+    """New path without using the payload: read the header and look up the handler"""
+    message = decode_message(datagram)
+    return HANDLERS.get(message.type), message
+
+def binary_path(datagram : bytes):
+    """New path: read the header, look up the handler and decode the payload"""
+    message = decode_message(datagram)
+    return HANDLERS.get(message.type), message.data
+
+def measure(function, datagram : bytes, repeat : int) -> float:
+    """Function to get the average time of one call in microseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(datagram)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+if __name__ == "__main__":
+    print("%-28s %7s %7s %10s %10s %10s" % ("tag", "json B", "wire B", "json us", "wire us", "dispatch us"))
+    for tag in TAGS:
+        old = json.dumps({"tag" : tag, "data" : PAYLOADS[tag]}).encode("utf-8")
+        new = encode_message(tag, PAYLOADS[tag])
+        repeat = 2000
+
+        print("%-28s %7d %7d %10.2f %10.2f %10.2f" % (tag, len(old), len(new), measure(json_path, old, repeat),
+              measure(binary_path, new, repeat), measure(binary_dispatch, new, repeat)))
@@ -0,0 +1,53 @@
+import time
+from collections import OrderedDict
+
+"""This file contains the implementation of the cache used to drop repeated messages before they are decoded"""
+
+# Seconds for which a message is remembered, and the largest number of messages remembered
+DEDUP_TTL = 60.0
+DEDUP_SIZE = 16384
+
+class DedupCache:
+    """This class remembers the keys of recently received messages for a limited time, evicting the oldest when full"""
+
+    def __init__(self, ttl : float = DEDUP_TTL, size : int = DEDUP_SIZE) -> None:
+        """Initializes the cache"""
+        self.ttl = ttl
+        self.size = size
+
+        # Maps each key to the time it expires at, oldest first since every entry lives equally long
+        self.entries = OrderedDict()
+
+        self.checked = 0
+        self.dropped = 0
+
+    def expire(self, now : float) -> None:
+        """Function to forget the keys that have expired"""
+        while len(self.entries) != 0 and next(iter(self.entries.values())) <= now:
+            self.entries.popitem(last = False)
+
+    def add(self, key : bytes) -> bool:
+        """Function to remember a key, False if it was already known"""
+        now = time.monotonic()
+        self.expire(now)
+
+        if key in self.entries:
+            return False
+
+        self.entries[key] = now + self.ttl
+        if len(self.entries) > self.size:
+            self.entries.popitem(last = False)
+        return True
+
+    def check(self, key : bytes) -> bool:
+        """Function to remember the key of a received message, False if it is a duplicate to be dropped"""
+        self.checked += 1
+        if self.add(key):
+            return True
+
+        self.dropped += 1
+        return False
+
+    def drop_rate(self) -> float:
+        """Function to get the fraction of checked messages that were dropped"""
+        return self.dropped / self.checked if self.checked != 0 else 0.0
@@ -0,0 +1,226 @@
+import os
+import json
+import threading
+import time
+
+"""This file contains the implementation of the Mempool class holding the pending transactions and properties"""
+
+# Journal entries beyond the pending items after which the journal is rewritten as a single snapshot
+COMPACT_ENTRIES = 1024
+
+class Mempool:
+    """This class keeps the pending transactions and properties in memory and journals every change to disk"""
+
+    def __init__(self, journal_path : str = "./data/mempool.journal") -> None:
+        """Initializes the mempool, replaying the journal if one exists"""
+        self.lock = threading.RLock()
+        self.journal_path = journal_path
+
+        # Pending transactions and properties, kept in the order they were added
+        self.transactions = {}
+        self.properties = {}
+
+        # Maps a property ID to the ID of the pending transaction involving it
+        self.property_transactions = {}
+
+        # Maps every pending transaction to when it arrived here and to its encoded size, which the block policy is based on
+        self.arrived = {}
+        self.sizes = {}
+        self.bytes = 0
+
+        # Entries in the journal, most of which are dead once the transactions they added were taken
+        self.entries = 0
+
+        if os.path.exists(journal_path):
+            self.replay()
+        else:
+            self.import_temp_files()
+
+        self.journal = open(journal_path, 'a')
+
+    def import_temp_files(self) -> None:
+        """Function to import the pending data stored by older clients in the temp files"""
+        directory = os.path.dirname(self.journal_path)
+
+        for name, target in (("temp_transactions.txt", self.transactions), ("temp_properties.txt", self.properties)):
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    target.update(json.loads(f.read()))
+
+        for transaction_id in self.transactions:
+            self.property_transactions[self.transactions[transaction_id]["property_id"]] = transaction_id
+            self.track(transaction_id, self.transactions[transaction_id])
+
+        # Start the journal with the imported entries
+        with open(self.journal_path, 'w') as f:
+            f.write(json.dumps({"op" : "replace", "transactions" : self.transactions, "properties" : self.properties}) + "\n")
+        self.entries = 1
+
+    def replay(self) -> None:
+        """Function to rebuild the mempool from the journal"""
+        with open(self.journal_path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn write at the end of the journal
+                    break
+                self.apply(entry)
+                self.entries += 1
+
+    def apply(self, entry : dict) -> None:
+        """Function to apply a single journal entry to the in-memory state"""
+        if entry["op"] == "transaction":
+            self.transactions[entry["id"]] = entry["data"]
+            self.property_transactions[entry["data"]["property_id"]] = entry["id"]
+            self.track(entry["id"], entry["data"])
+
+        elif entry["op"] == "property":
+            self.properties[entry["id"]] = entry["data"]
+
+        elif entry["op"] == "remove":
+            for transaction_id in entry["transactions"]:
+                details = self.transactions.pop(transaction_id, None)
+                if details is not None and self.property_transactions.get(details["property_id"]) == transaction_id:
+                    del self.property_transactions[details["property_id"]]
+                self.untrack(transaction_id)
+            for property_id in entry["properties"]:
+                self.properties.pop(property_id, None)
+
+        elif entry["op"] == "merge":
+            for transaction_id, details in entry["transactions"].items():
+                self.transactions[transaction_id] = details
+                self.property_transactions[details["property_id"]] = transaction_id
+                self.track(transaction_id, details)
+            self.properties.update(entry["properties"])
+
+        elif entry["op"] == "replace":
+            if "transactions" in entry:
+                self.transactions = dict(entry["transactions"])
+                self.property_transactions = {details["property_id"] : transaction_id
+                                              for transaction_id, details in self.transactions.items()}
+                self.arrived, self.sizes, self.bytes = {}, {}, 0
+                for transaction_id, details in self.transactions.items():
+                    self.track(transaction_id, details)
+            if "properties" in entry:
+                self.properties = dict(entry["properties"])
+
+    def track(self, transaction_id : str, details : dict) -> None:
+        """Function to record the arrival and size of a pending transaction"""
+        self.untrack(transaction_id)
+        self.arrived[transaction_id] = time.monotonic()
+        self.sizes[transaction_id] = len(json.dumps(details))
+        self.bytes += self.sizes[transaction_id]
+
+    def untrack(self, transaction_id : str) -> None:
+        """Function to forget the arrival and size of a transaction that is no longer pending"""
+        self.arrived.pop(transaction_id, None)
+        self.bytes -= self.sizes.pop(transaction_id, 0)
+
+    def oldest(self) -> float:
+        """Function to get when the oldest pending transaction arrived, None if nothing is pending"""
+        with self.lock:
+            return next(iter(self.arrived.values()), None)
+
+    def log(self, entry : dict) -> None:
+        """Function to write an entry to the journal and then apply it"""
+        with self.lock:
+            self.journal.write(json.dumps(entry) + "\n")
+            self.journal.flush()
+            self.apply(entry)
+
+            self.entries += 1
+            if self.entries - len(self.transactions) - len(self.properties) > COMPACT_ENTRIES:
+                self.compact()
+
+    def compact(self) -> None:
+        """Function to rewrite the journal as a single snapshot of the pending data, replacing it only once fully written"""
+        with self.lock:
+            self.journal.close()
+
+            temp_path = self.journal_path + ".tmp"
+            with open(temp_path, 'w') as f:
+                f.write(json.dumps({"op" : "replace", "transactions" : self.transactions, "properties" : self.properties}) + "\n")
+            os.replace(temp_path, self.journal_path)
+
+            self.journal = open(self.journal_path, 'a')
+            self.entries = 1
+
+    def add_transaction(self, transaction_id : str, details : dict) -> None:
+        """Function to add a pending transaction"""
+        self.log({"op" : "transaction", "id" : transaction_id, "data" : details})
+
+    def add_property(self, property_id : str, details : dict) -> None:
+        """Function to add a pending property"""
+        self.log({"op" : "property", "id" : property_id, "data" : details})
+
+    def replace_transactions(self, transactions : dict) -> None:
+        """Function to replace all the pending transactions with the ones received from a peer"""
+        self.log({"op" : "replace", "transactions" : transactions})
+
+    def replace_properties(self, properties : dict) -> None:
+        """Function to replace all the pending properties with the ones received from a peer"""
+        self.log({"op" : "replace", "properties" : properties})
+
+    def merge(self, transactions : dict, properties : dict) -> list:
+        """Function to add the transactions and properties received from a peer that are not yet pending, returning the IDs of the new transactions"""
+        with self.lock:
+            transactions = {transaction_id : details for transaction_id, details in transactions.items()
+                            if transaction_id not in self.transactions}
+            properties = {property_id : details for property_id, details in properties.items()
+                          if property_id not in self.properties}
+
+            if len(transactions) != 0 or len(properties) != 0:
+                self.log({"op" : "merge", "transactions" : transactions, "properties" : properties})
+
+            return list(transactions)
+
+    def remove(self, transaction_ids : list, property_ids : list = None) -> None:
+        """Function to remove pending transactions and properties"""
+        if property_ids is None:
+            property_ids = []
+        self.log({"op" : "remove", "transactions" : list(transaction_ids), "properties" : list(property_ids)})
+
+    def get_transaction(self, transaction_id : str) -> dict:
+        """Function to get a pending transaction, None if it does not exist"""
+        return self.transactions.get(transaction_id)
+
+    def get_property(self, property_id : str) -> dict:
+        """Function to get a pending property, None if it does not exist"""
+        return self.properties.get(property_id)
+
+    def transaction_for_property(self, property_id : str) -> str:
+        """Function to get the ID of the pending transaction involving a property"""
+        return self.property_transactions.get(property_id)
+
+    def snapshot(self) -> tuple:
+        """Function to get a copy of the pending transactions and properties"""
+        with self.lock:
+            return dict(self.transactions), dict(self.properties)
+
+    def take(self, transaction_ids : list = None) -> tuple:
+        """Function to remove and return the given pending transactions, all of them by default, and the properties they create for minting"""
+        with self.lock:
+            if transaction_ids is not None and len(transaction_ids) < len(self.transactions):
+                transactions = {transaction_id : self.transactions[transaction_id] for transaction_id in transaction_ids}
+                properties = {details["property_id"] : self.properties[details["property_id"]]
+                              for details in transactions.values() if details["property_id"] in self.properties}
+                self.remove(list(transactions), list(properties))
+                return transactions, properties
+
+            transactions, properties = self.snapshot()
+
+            # Nothing else is pending, so the journal can be started afresh
+            self.journal.close()
+            self.journal = open(self.journal_path, 'w')
+            self.transactions = {}
+            self.properties = {}
+            self.property_transactions = {}
+            self.arrived, self.sizes, self.bytes = {}, {}, 0
+            self.entries = 0
+
+            return transactions, properties
+
+    def __len__(self) -> int:
+        return len(self.transactions)
@@ -0,0 +1,36 @@
+import os
+import sys
+
+from state_store import JsonStateStore, SqliteStateStore
+
+"""This file contains the tool to import the JSON state files of a client into the SQLite state store"""
+
+# Files written by clients older than the state store, any of which means the data folder holds state to import
+LEGACY_FILES = ("properties.txt", "transactions.txt", "peer_list.txt", "temp_properties.txt", "temp_transactions.txt",
+                "block_list.txt", "blockchain.txt")
+
+def needs_migration(directory : str = "./data") -> bool:
+    """Function to check whether a data folder was used by an older client and has no state store yet"""
+    if os.path.exists(os.path.join(directory, "state.db")):
+        return False
+    return any(os.path.exists(os.path.join(directory, name)) for name in LEGACY_FILES)
+
+def migrate(directory : str = "./data") -> None:
+    """Function to import properties.txt, transactions.txt and peer_list.txt into state.db"""
+    source = JsonStateStore(directory)
+    target = SqliteStateStore(os.path.join(directory, "state.db"))
+
+    transactions = source.all_transactions()
+    properties = source.all_properties()
+    target.replace_all(transactions, properties)
+
+    peer_list = source.load_peers()
+    if peer_list is not None:
+        target.save_peers(peer_list)
+
+    print("Imported", len(properties), "properties,", len(transactions), "transactions and",
+          len(peer_list or {}), "peers into", os.path.join(directory, "state.db"))
+
+if __name__ == "__main__":
+    # Run from inside the client folder, or pass the path of its data folder
+    migrate(sys.argv[1] if len(sys.argv) > 1 else "./data")
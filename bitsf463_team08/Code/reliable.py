@@ -0,0 +1,277 @@
+import math
+import random
+import struct
+from collections import deque
+
+from twisted.internet import reactor
+
+from wire import MESSAGE_TYPES, encode_raw
+
+"""This file contains the implementation of the reliable channel that acknowledges, retransmits and fragments datagrams"""
+
+# Bytes of a message carried by a single fragment, small enough not to be split by the network
+FRAGMENT_SIZE = 1400
+
+# Retransmission timeout before the first measurement, and its bounds, in seconds
+INITIAL_RTO = 0.5
+MIN_RTO = 0.05
+MAX_RTO = 5.0
+
+# Largest number of fragments sent to a destination and not acknowledged yet, the rest wait for acks
+SEND_WINDOW = 64
+
+# Number of times a fragment is sent again before giving up on it
+MAX_RETRIES = 8
+
+# Largest number of fragments received out of order listed in an ack
+SACK_LIMIT = 64
+
+# Fragments a receiver waits for past a gap before treating the missing one as lost for good
+RECEIVE_WINDOW = 1024
+
+# Seconds after which an incomplete message is discarded
+REASSEMBLY_TIMEOUT = 60.0
+
+# Session of the sender, sequence number, lowest sequence number the sender still waits an ack for,
+# sequence number of the first fragment of the message, fragment index and count
+FRAME = struct.Struct(">IIIIHH")
+
+# Session of the sender being acknowledged and the sequence number up to which everything was received
+ACK = struct.Struct(">II")
+SEQUENCE = struct.Struct(">I")
+
+RELIABLE_TYPE = MESSAGE_TYPES["reliable"]
+ACK_TYPE = MESSAGE_TYPES["ack"]
+
+class Fragment:
+    """This class holds a sent fragment till it is acknowledged"""
+
+    def __init__(self, sequence : int, first : int, index : int, count : int, data : bytes) -> None:
+        """Initializes the fragment"""
+        self.sequence = sequence
+        self.first = first
+        self.index = index
+        self.count = count
+        self.data = data
+        self.sent = None
+        self.deadline = None
+        self.retries = 0
+
+class Outgoing:
+    """This class holds the fragments sent to a destination and the round trip time measured to it"""
+
+    def __init__(self) -> None:
+        """Initializes the state of a destination"""
+        self.next_sequence = 0
+        self.waiting = deque()
+        self.unacked = {}
+        self.srtt = None
+        self.rttvar = None
+        self.rto = INITIAL_RTO
+        self.timer = None
+
+class Incoming:
+    """This class tracks the fragments received from a source in one of its sessions"""
+
+    def __init__(self, session : int) -> None:
+        """Initializes the state of a source"""
+        self.session = session
+
+        # Every sequence number below cumulative was received, received holds the ones above it
+        self.cumulative = 0
+        self.received = set()
+
+        # Maps the first sequence number of an incomplete message to its arrival time and fragments
+        self.messages = {}
+        self.ack_pending = False
+
+class ReliableChannel:
+    """This class sends messages that are acknowledged, retransmitted with an adaptive timeout and split into fragments"""
+
+    def __init__(self, client, clock = reactor) -> None:
+        """Initializes the reliable channel of a client, the timers run on the given clock"""
+        self.client = client
+        self.clock = clock
+
+        # A random session lets receivers tell a restarted sender from old sequence numbers
+        self.session = random.getrandbits(32)
+        self.outgoing = {}
+        self.incoming = {}
+
+        self.sent = 0
+        self.retransmitted = 0
+        self.failed = 0
+
+    def send(self, data : bytes, addr : tuple) -> None:
+        """Function to send an encoded message reliably, called on the reactor thread"""
+        outgoing = self.outgoing.get(addr)
+        if outgoing is None:
+            outgoing = self.outgoing[addr] = Outgoing()
+
+        first = outgoing.next_sequence
+        count = max(1, math.ceil(len(data) / FRAGMENT_SIZE))
+        for index in range(count):
+            sequence = outgoing.next_sequence
+            outgoing.next_sequence += 1
+
+            outgoing.waiting.append((sequence, Fragment(sequence, first, index, count, data[index * FRAGMENT_SIZE:(index + 1) * FRAGMENT_SIZE])))
+
+        self.sent += 1
+        self.fill(outgoing, addr)
+
+    def fill(self, outgoing : Outgoing, addr : tuple) -> None:
+        """Function to send the waiting fragments that fit in the window of a destination"""
+        while len(outgoing.waiting) != 0 and len(outgoing.unacked) < SEND_WINDOW:
+            sequence, fragment = outgoing.waiting.popleft()
+            outgoing.unacked[sequence] = fragment
+            self.transmit(outgoing, fragment, addr)
+
+        self.schedule(outgoing, addr)
+
+    def lowest(self, outgoing : Outgoing) -> int:
+        """Function to get the lowest sequence number of a destination not acknowledged yet, the ones below were received or given up on"""
+        if len(outgoing.unacked) != 0:
+            return min(outgoing.unacked)
+        if len(outgoing.waiting) != 0:
+            return outgoing.waiting[0][0]
+        return outgoing.next_sequence
+
+    def transmit(self, outgoing : Outgoing, fragment : Fragment, addr : tuple) -> None:
+        """Function to send a fragment, backing off the timeout by the number of times it was sent before"""
+        fragment.sent = self.clock.seconds()
+        fragment.deadline = fragment.sent + min(MAX_RTO, outgoing.rto * 2 ** fragment.retries)
+
+        # The lowest sequence number is sent with every frame so that the receiver does not wait for fragments given up on
+        header = FRAME.pack(self.session, fragment.sequence, self.lowest(outgoing), fragment.first, fragment.index, fragment.count)
+        self.client.outbox.send(encode_raw("reliable", header + fragment.data), addr)
+
+    def schedule(self, outgoing : Outgoing, addr : tuple) -> None:
+        """Function to wake up at the earliest retransmission deadline of a destination"""
+        if outgoing.timer is not None and outgoing.timer.active():
+            outgoing.timer.cancel()
+        outgoing.timer = None
+
+        if len(outgoing.unacked) != 0:
+            deadline = min(fragment.deadline for fragment in outgoing.unacked.values())
+            outgoing.timer = self.clock.callLater(max(0.0, deadline - self.clock.seconds()), self.retransmit, addr)
+
+    def retransmit(self, addr : tuple) -> None:
+        """Function to send again the fragments whose acknowledgement is overdue"""
+        outgoing = self.outgoing[addr]
+        outgoing.timer = None
+
+        now = self.clock.seconds()
+        for sequence, fragment in list(outgoing.unacked.items()):
+            if fragment.deadline > now:
+                continue
+
+            if fragment.retries >= MAX_RETRIES:
+                del outgoing.unacked[sequence]
+                self.failed += 1
+                continue
+
+            fragment.retries += 1
+            self.retransmitted += 1
+            self.transmit(outgoing, fragment, addr)
+
+        # Fragments given up on free the window for the ones waiting
+        self.fill(outgoing, addr)
+
+    def forget(self, addr : tuple) -> None:
+        """Function to stop retransmitting to a destination that left, counting its fragments as failed"""
+        outgoing = self.outgoing.pop(addr, None)
+        if outgoing is None:
+            return
+
+        if outgoing.timer is not None and outgoing.timer.active():
+            outgoing.timer.cancel()
+        self.failed += len(outgoing.unacked) + len(outgoing.waiting)
+
+    def receive(self, message, addr : tuple) -> list:
+        """Function to handle a reliable frame or an ack, returning the messages it completed"""
+        payload = bytes(message.payload)
+        if message.type == ACK_TYPE:
+            self.receive_ack(payload, addr)
+            return []
+
+        session, sequence, lowest, first, index, count = FRAME.unpack_from(payload)
+        incoming = self.incoming.get(addr)
+        if incoming is None or incoming.session != session:
+            incoming = self.incoming[addr] = Incoming(session)
+
+        # Every frame is acknowledged, including repeats whose ack was lost
+        if not incoming.ack_pending:
+            incoming.ack_pending = True
+            self.clock.callLater(0, self.send_ack, addr)
+
+        # The sender gave up on the fragments below its lowest sequence number, or we restarted and never saw them
+        if lowest > incoming.cumulative:
+            incoming.cumulative = lowest
+            incoming.received = {number for number in incoming.received if number >= lowest}
+
+        if sequence < incoming.cumulative or sequence in incoming.received:
+            return []
+
+        incoming.received.add(sequence)
+        if sequence >= incoming.cumulative + RECEIVE_WINDOW:
+            incoming.cumulative = sequence - RECEIVE_WINDOW
+            incoming.received = {number for number in incoming.received if number >= incoming.cumulative}
+        while incoming.cumulative in incoming.received:
+            incoming.received.remove(incoming.cumulative)
+            incoming.cumulative += 1
+
+        data = payload[FRAME.size:]
+        if count == 1:
+            return [data]
+
+        now = self.clock.seconds()
+        for start in [start for start, (arrived, _) in incoming.messages.items() if now - arrived > REASSEMBLY_TIMEOUT]:
+            del incoming.messages[start]
+
+        _, fragments = incoming.messages.setdefault(first, (now, {}))
+        fragments[index] = data
+        if len(fragments) != count:
+            return []
+
+        del incoming.messages[first]
+        return [b"".join(fragments[number] for number in range(count))]
+
+    def send_ack(self, addr : tuple) -> None:
+        """Function to acknowledge every frame received from a source since the last ack"""
+        incoming = self.incoming.get(addr)
+        if incoming is None:
+            return
+
+        incoming.ack_pending = False
+        selective = sorted(incoming.received)[:SACK_LIMIT]
+        payload = ACK.pack(incoming.session, incoming.cumulative) + b"".join(SEQUENCE.pack(number) for number in selective)
+        self.client.outbox.send(encode_raw("ack", payload), addr)
+
+    def receive_ack(self, payload : bytes, addr : tuple) -> None:
+        """Function to forget the acknowledged fragments and update the round trip time"""
+        session, cumulative = ACK.unpack_from(payload)
+        outgoing = self.outgoing.get(addr)
+        if outgoing is None or session != self.session:
+            return
+
+        acked = set(number for (number,) in SEQUENCE.iter_unpack(payload[ACK.size:]))
+        now = self.clock.seconds()
+        for sequence in [sequence for sequence in outgoing.unacked if sequence < cumulative or sequence in acked]:
+            fragment = outgoing.unacked.pop(sequence)
+
+            # Only fragments sent once give an unambiguous sample
+            if fragment.retries == 0:
+                self.measure(outgoing, now - fragment.sent)
+
+        self.fill(outgoing, addr)
+
+    def measure(self, outgoing : Outgoing, rtt : float) -> None:
+        """Function to update the smoothed round trip time and the retransmission timeout"""
+        if outgoing.srtt is None:
+            outgoing.srtt = rtt
+            outgoing.rttvar = rtt / 2
+        else:
+            outgoing.rttvar = 0.75 * outgoing.rttvar + 0.25 * abs(outgoing.srtt - rtt)
+            outgoing.srtt = 0.875 * outgoing.srtt + 0.125 * rtt
+
+        outgoing.rto = min(MAX_RTO, max(MIN_RTO, outgoing.srtt + 4 * outgoing.rttvar))
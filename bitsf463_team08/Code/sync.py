@@ -0,0 +1,653 @@
+import json
+import base64
+import hashlib
+import time
+
+from twisted.internet import reactor
+
+from block import Block
+from endpoint import peer_endpoint
+from wire import encode_message
+
+"""This file contains the implementation of the chunked protocol used to sync the state of a new or returning client"""
+
+# Size of the snapshot data carried by a single chunk
+# Twisted reads at most 8192 bytes per datagram, which has to fit the base64 encoded chunk when the bulk channel is not used
+CHUNK_SIZE = 4 * 1024
+
+# Size of a chunk streamed over the bulk channel, where it is not limited by the datagram size
+BULK_CHUNK_SIZE = 64 * 1024
+
+# Limits on the number of chunks requested but not yet received
+INITIAL_WINDOW = 4
+MAX_WINDOW = 32
+
+# Seconds to wait for a requested chunk before requesting it again, and the number of attempts
+RETRY_INTERVAL = 1.0
+MAX_RETRIES = 10
+
+# Seconds for which a served snapshot is kept after the last request for one of its chunks
+SNAPSHOT_TTL = 120
+
+class Snapshot:
+    """This class holds the chunks of a snapshot being served to peers"""
+
+    def __init__(self, data : bytes, chunk_size : int = CHUNK_SIZE) -> None:
+        """Initializes the snapshot by splitting the data into chunks"""
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.id = "%s-%d" % (self.digest[:16], chunk_size)
+        self.size = len(data)
+        self.chunk_size = chunk_size
+        self.chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)] or [b""]
+        self.expiry = None
+
+class Download:
+    """This class tracks the chunks of a snapshot being downloaded from a peer"""
+
+    def __init__(self, snapshot_id : str, size : int, chunk_count : int, digest : str, addr : tuple) -> None:
+        """Initializes the download"""
+        self.id = snapshot_id
+        self.size = size
+        self.chunk_count = chunk_count
+        self.digest = digest
+        self.addr = addr
+
+        self.started = time.time()
+        self.chunks = {}
+        self.next_index = 0
+        self.window = INITIAL_WINDOW
+
+        # Maps the index of each requested chunk to the number of times it was requested
+        self.in_flight = {}
+        self.timer = None
+
+class StateSync:
+    """This class serves snapshots of the state of a client and downloads them from peers"""
+
+    def __init__(self, client) -> None:
+        """Initializes the sync handler of a client"""
+        self.client = client
+        self.snapshots = {}
+        self.download = None
+
+    def send(self, tag : str, data, addr : tuple) -> None:
+        """Function to send a sync message to a peer over the bulk channel"""
+        data = encode_message(tag, data)
+
+        reactor.callFromThread(self.client.bulk.send, data, addr)
+
+    def build_snapshot(self, chunk_size : int) -> Snapshot:
+        """Function to serialize the state of the client, called on the I/O thread"""
+        temp_transactions, temp_properties = self.client.mempool.snapshot()
+        data = [self.client.chain.export_blocks(), self.client.chain.head, temp_transactions, temp_properties,
+                self.client.state.all_transactions(), self.client.state.all_properties()]
+
+        return Snapshot(json.dumps(data).encode("utf-8"), chunk_size)
+
+    def offer(self, addr : tuple) -> None:
+        """Function to build a snapshot without blocking the reactor and send its manifest to a peer"""
+        chunk_size = BULK_CHUNK_SIZE if self.client.bulk.streams(addr) else CHUNK_SIZE
+        deferred = self.client.io.run(self.build_snapshot, chunk_size)
+        deferred.addCallback(self.send_manifest, addr)
+
+    def send_manifest(self, snapshot : Snapshot, addr : tuple) -> None:
+        """Function to store a built snapshot and send its manifest to a peer"""
+        self.snapshots[snapshot.id] = snapshot
+        self.touch(snapshot)
+        self.send("sync_manifest", [snapshot.id, snapshot.size, len(snapshot.chunks), snapshot.digest], addr)
+
+    def touch(self, snapshot : Snapshot) -> None:
+        """Function to extend the time for which a snapshot is kept"""
+        if snapshot.expiry is not None and snapshot.expiry.active():
+            snapshot.expiry.reset(SNAPSHOT_TTL)
+        else:
+            snapshot.expiry = reactor.callLater(SNAPSHOT_TTL, self.snapshots.pop, snapshot.id, None)
+
+    def serve_chunks(self, snapshot_id : str, indices : list, addr : tuple) -> None:
+        """Function to send the requested chunks of a snapshot to a peer"""
+        snapshot = self.snapshots.get(snapshot_id)
+
+        # Large chunks do not fit a datagram, a peer no longer reached over the bulk channel needs a new snapshot
+        if snapshot is None or (snapshot.chunk_size > CHUNK_SIZE and not self.client.bulk.streams(addr)):
+            self.send("sync_expired", [snapshot_id], addr)
+            return
+
+        self.touch(snapshot)
+        for index in indices:
+            if 0 <= index < len(snapshot.chunks):
+                chunk = snapshot.chunks[index]
+                self.send("sync_chunk", [snapshot_id, index, hashlib.sha256(chunk).hexdigest(),
+                                         base64.b64encode(chunk).decode("ascii")], addr)
+
+    def start(self, manifest : list, addr : tuple) -> None:
+        """Function to start downloading a snapshot after its manifest is received"""
+        if self.download is not None:
+            if self.download.id == manifest[0]:
+                return
+            self.cancel()
+
+        self.download = Download(manifest[0], manifest[1], manifest[2], manifest[3], addr)
+        print("Syncing", manifest[1], "bytes in", manifest[2], "chunks")
+        self.fill_window()
+
+    def fill_window(self) -> None:
+        """Function to request new chunks till the window is full"""
+        download = self.download
+        indices = []
+        while len(download.in_flight) < download.window and download.next_index < download.chunk_count:
+            if download.next_index not in download.chunks:
+                download.in_flight[download.next_index] = 1
+                indices.append(download.next_index)
+            download.next_index += 1
+
+        if len(indices) != 0:
+            self.send("request_chunks", [download.id, indices], download.addr)
+
+        if download.timer is None or not download.timer.active():
+            download.timer = reactor.callLater(RETRY_INTERVAL, self.retry)
+
+    def retry(self) -> None:
+        """Function to request the chunks that were lost again, shrinking the window"""
+        download = self.download
+        if download is None or len(download.in_flight) == 0:
+            return
+
+        if max(download.in_flight.values()) >= MAX_RETRIES:
+            print("Sync failed, peer stopped responding!\n")
+            self.cancel()
+            self.client.sync_done()
+            return
+
+        download.window = max(1, download.window // 2)
+        for index in download.in_flight:
+            download.in_flight[index] += 1
+
+        self.send("request_chunks", [download.id, list(download.in_flight)], download.addr)
+        download.timer = reactor.callLater(RETRY_INTERVAL, self.retry)
+
+    def receive_chunk(self, snapshot_id : str, index : int, chunk_hash : str, chunk : str) -> None:
+        """Function to store a received chunk and request the next ones"""
+        download = self.download
+        if download is None or download.id != snapshot_id or index in download.chunks:
+            return
+
+        chunk = base64.b64decode(chunk)
+        if hashlib.sha256(chunk).hexdigest() != chunk_hash:
+            # Corrupted chunk, it will be requested again by the retry timer
+            return
+
+        download.chunks[index] = chunk
+        download.in_flight.pop(index, None)
+        download.window = min(MAX_WINDOW, download.window + 1)
+
+        if len(download.chunks) == download.chunk_count:
+            self.finish()
+        else:
+            self.fill_window()
+
+    def expired(self, snapshot_id : str) -> None:
+        """Function to restart the sync when the peer no longer has the snapshot"""
+        download = self.download
+        if download is None or download.id != snapshot_id:
+            return
+
+        addr = download.addr
+        self.cancel()
+        self.send("request_manifest", "", addr)
+
+    def cancel(self) -> None:
+        """Function to stop the current download"""
+        if self.download is not None and self.download.timer is not None and self.download.timer.active():
+            self.download.timer.cancel()
+        self.download = None
+
+    def finish(self) -> None:
+        """Function to verify the downloaded snapshot and apply it"""
+        download = self.download
+        self.cancel()
+
+        data = b"".join(download.chunks[index] for index in range(download.chunk_count))
+        if hashlib.sha256(data).hexdigest() != download.digest:
+            print("Sync failed, snapshot is corrupted!\n")
+            self.send("request_manifest", "", download.addr)
+            return
+
+        deferred = self.client.io.run(self.apply, data)
+        deferred.addCallback(self.applied, download)
+
+    def applied(self, taken : bool, download : Download) -> None:
+        """Function to report a completed sync"""
+        if taken:
+            print("Sync complete in %.2f seconds!\n" % (time.time() - download.started))
+        else:
+            print("Sync failed, the received chain was rejected!\n")
+        self.client.sync_done()
+
+    def apply(self, data : bytes) -> bool:
+        """Function to replace the local state with a downloaded snapshot, called on the I/O thread"""
+        list_dict = json.loads(data)
+
+        # The state is only taken along with a chain whose blocks all carry a valid proof
+        if not self.client.chain.update_chain(list_dict[0], list_dict[1], self.client.poet.verify_block):
+            return False
+        self.client.mempool.replace_transactions(list_dict[2])
+        self.client.mempool.replace_properties(list_dict[3])
+        self.client.state.replace_all(list_dict[4], list_dict[5])
+        return True
+
+# Largest number of missed blocks sent directly in reply to request_update, more are synced headers first
+INCREMENTAL_LIMIT = 64
+
+# Number of block headers sent in a single message
+HEADERS_PER_MESSAGE = 24
+
+# Number of block bodies requested at once, and the size limit of a reply carrying them
+BODIES_PER_REQUEST = 8
+BODY_BUDGET = 6000
+
+# Maximum number of body requests outstanding with the fastest peer, slower peers get proportionally fewer
+MAX_BODY_REQUESTS = 8
+
+# Seconds between checks for body requests that were lost
+BODY_CHECK_INTERVAL = 0.5
+
+class ChainSync:
+    """This class syncs the blockchain of a returning client, headers first and then block bodies from every peer"""
+
+    def __init__(self, client) -> None:
+        """Initializes the chain sync handler of a client"""
+        self.client = client
+
+        # Path most recently served to a peer, reused while it pages through the headers
+        self.served_tip = None
+        self.served_start = None
+        self.served_path = []
+        self.served_positions = {}
+
+        self.reset()
+
+    def reset(self) -> None:
+        """Function to clear the state of the current sync"""
+        self.active = False
+        self.started = None
+        self.pings = {}
+        self.peers = {}
+        self.header_peer = None
+        self.tip = None
+        self.headers = []
+        self.queue = []
+        self.bodies = {}
+        self.applied = 0
+        self.applying = False
+        self.timer = None
+
+    def send(self, tag : str, data, addr : tuple) -> None:
+        """Function to send a sync message to a peer over the bulk channel"""
+        data = encode_message(tag, data)
+
+        reactor.callFromThread(self.client.bulk.send, data, addr)
+
+    def serve_update(self, known_hash : str, addr : tuple) -> None:
+        """Function to send the blocks and state changes after the head of a returning client, or our head if there are too many"""
+        deferred = self.client.io.run(self.build_update, known_hash)
+        deferred.addCallback(lambda message : self.send(*message, addr))
+
+    def build_update(self, known_hash : str) -> tuple:
+        """Function to get the tag and data of the reply to request_update, called on the I/O thread"""
+        chain = self.client.chain
+
+        # The client is either up to date, ahead of us or on another branch when its head is not an older block of ours
+        if known_hash in chain.log and known_hash != chain.head:
+            path = chain.path_after(known_hash, chain.head)
+            if len(path) <= INCREMENTAL_LIMIT and chain.get_parent(path[0]) == known_hash:
+                updates = []
+                size = 0
+                for block_hash in path:
+                    body = self.body_of(block_hash)
+                    if body is None:
+                        break
+
+                    update = [block_hash, chain.get_block(block_hash)["header"]] + body[1:]
+                    size += len(json.dumps(update))
+                    if len(updates) != 0 and size > BODY_BUDGET:
+                        break
+                    updates.append(update)
+
+                if len(updates) != 0:
+                    return "update", [updates, chain.head]
+
+        return "tip", [chain.head]
+
+    def serve_mempool(self, addr : tuple) -> None:
+        """Function to send the pending transactions and properties to a peer"""
+        self.send("mempool", list(self.client.mempool.snapshot()), addr)
+
+    def serve_headers(self, locator : str, tip : str, addr : tuple) -> None:
+        """Function to send the headers after the locator block on the path to the tip"""
+        deferred = self.client.io.run(self.build_headers, locator, tip)
+        deferred.addCallback(lambda headers : self.send("headers", headers, addr))
+
+    def build_headers(self, locator : str, tip : str) -> list:
+        """Function to get the headers after the locator block on the path to the tip, called on the I/O thread"""
+        chain = self.client.chain
+        if tip != self.served_tip or (locator not in self.served_positions and locator != self.served_start):
+            self.served_tip = tip
+            self.served_path = chain.path_after(locator, tip)
+            self.served_positions = {block_hash : index for index, block_hash in enumerate(self.served_path)}
+            self.served_start = locator
+
+        start = 0 if locator == self.served_start else self.served_positions[locator] + 1
+        hashes = self.served_path[start:start + HEADERS_PER_MESSAGE]
+
+        # The locator is not on the chain of the tip when the path goes back to the genesis block
+        diverged = len(hashes) != 0 and chain.get_parent(hashes[0]) == "" and start == 0
+
+        headers = [[block_hash, chain.get_block(block_hash)["header"]] for block_hash in hashes]
+        return [headers, tip, diverged]
+
+    def body_of(self, block_hash : str) -> list:
+        """Function to get the transactions of a block with their details, the addresses of new properties and the proof of its winner"""
+        block = self.client.chain.get_block(block_hash)
+        if block is None:
+            return None
+
+        state = self.client.state
+        transactions = block["body"]["transactions"]
+        details = {transaction_id : state.get_transaction(transaction_id) for transaction_id in transactions}
+        if None in details.values():
+            return None
+
+        addresses = {}
+        for transaction in details.values():
+            if transaction["seller_id"] == "NA":
+                addresses[transaction["property_id"]] = state.get_property(transaction["property_id"])["address"]
+
+        return [block_hash, transactions, details, addresses, block.get("poet")]
+
+    def serve_bodies(self, hashes : list, addr : tuple) -> None:
+        """Function to send block bodies along with the details of their transactions"""
+        deferred = self.client.io.run(self.build_bodies, hashes)
+        deferred.addCallback(lambda bodies : self.send("bodies", [bodies], addr))
+
+    def build_bodies(self, hashes : list) -> list:
+        """Function to get the bodies of blocks that fit in one reply, called on the I/O thread"""
+        bodies = []
+        size = 0
+        for block_hash in hashes:
+            body = self.body_of(block_hash)
+            if body is None:
+                continue
+
+            size += len(json.dumps(body))
+            if len(bodies) != 0 and size > BODY_BUDGET:
+                break
+            bodies.append(body)
+
+        return bodies
+
+    def start(self) -> None:
+        """Function to send our head to every peer, measuring the latency of each"""
+        self.reset()
+        self.active = True
+        self.started = time.time()
+
+        for peer in self.client.peer_list:
+            if peer == self.client.id:
+                continue
+
+            addr = peer_endpoint(self.client.peer_list[peer])
+            self.pings[addr] = time.time()
+            self.send("request_update", [self.client.chain.head, self.client.membership.versions], addr)
+
+    def receive_update(self, updates : list, tip : str, addr : tuple) -> None:
+        """Function to apply the blocks missed while offline, sent directly by the first peer to reply"""
+        if not self.active:
+            return
+
+        if addr in self.pings:
+            self.peers[addr] = {"rtt" : time.time() - self.pings.pop(addr), "in_flight" : {}}
+
+        # Updates from other peers are ignored, as are updates arriving once the headers first sync has started
+        if self.header_peer is None:
+            self.header_peer = addr
+        elif self.header_peer != addr or len(self.queue) != 0:
+            return
+        self.tip = tip
+
+        previous = self.headers[-1][0] if len(self.headers) != 0 else self.client.chain.head
+        for update in updates:
+            block_hash, header = update[:2]
+            if header["prev_hash"] != previous or Block.hash_header(header) != block_hash:
+                print("Invalid update received, sync stopped!\n")
+                self.finish()
+                return
+
+            self.headers.append([block_hash, header])
+            self.bodies[block_hash] = self.body(update[2:])
+            previous = block_hash
+
+        self.apply_bodies()
+
+        # Ask for the next page of missed blocks, after the last one received as they may not be applied yet
+        if self.active:
+            self.send("request_update", [previous], addr)
+
+    def receive_tip(self, tip : str, addr : tuple) -> None:
+        """Function to record the head and latency of a peer, using the first peer ahead of us for the headers"""
+        if not self.active or addr not in self.pings:
+            return
+
+        rtt = time.time() - self.pings.pop(addr)
+
+        # Peers that are not ahead of us have no blocks to give, the first of them is enough to finish the startup
+        if tip in self.client.chain.log:
+            self.client.sync_done()
+            if len(self.pings) == 0 and self.header_peer is None:
+                self.finish()
+            return
+
+        self.peers[addr] = {"rtt" : rtt, "in_flight" : {}}
+
+        if self.header_peer is None:
+            self.header_peer = addr
+            self.tip = tip
+            self.send("request_headers", [self.client.chain.head, tip], addr)
+
+    def receive_headers(self, headers : list, tip : str, diverged : bool, addr : tuple) -> None:
+        """Function to validate a page of headers and request the next page or start fetching the bodies"""
+        if not self.active or addr != self.header_peer or tip != self.tip:
+            return
+
+        # Our chain is not a prefix of the peer's chain, so the full state has to be synced
+        if diverged:
+            print("Chain has diverged, syncing the full state")
+            self.reset()
+            self.send("request_manifest", "", addr)
+            return
+
+        previous = self.headers[-1][0] if len(self.headers) != 0 else self.client.chain.head
+        for block_hash, header in headers:
+            if header["prev_hash"] != previous or Block.hash_header(header) != block_hash:
+                print("Invalid header received, sync stopped!\n")
+                self.finish()
+                return
+
+            self.headers.append([block_hash, header])
+            previous = block_hash
+
+        if previous != tip:
+            if len(headers) == 0:
+                print("Peer is missing headers, sync stopped!\n")
+                self.finish()
+            else:
+                self.send("request_headers", [previous, tip], addr)
+            return
+
+        self.queue = [block_hash for block_hash, _ in self.headers]
+        if len(self.queue) == 0:
+            self.finish()
+            return
+
+        self.dispatch()
+        self.timer = reactor.callLater(BODY_CHECK_INTERVAL, self.check_requests)
+
+    def dispatch(self) -> None:
+        """Function to spread body requests over the peers, giving faster peers more requests"""
+        if len(self.peers) == 0:
+            return
+
+        best = min(peer["rtt"] for peer in self.peers.values())
+        for addr in sorted(self.peers, key = lambda addr : self.peers[addr]["rtt"]):
+            peer = self.peers[addr]
+            window = max(1, round(MAX_BODY_REQUESTS * best / max(peer["rtt"], 1e-6)))
+
+            while len(peer["in_flight"]) < window and len(self.queue) != 0:
+                hashes = tuple(self.queue[:BODIES_PER_REQUEST])
+                del self.queue[:BODIES_PER_REQUEST]
+
+                peer["in_flight"][hashes] = time.time()
+                self.send("request_bodies", [list(hashes)], addr)
+
+    def check_requests(self) -> None:
+        """Function to requeue body requests that took too long, slowing down the peers that lost them"""
+        if not self.active:
+            return
+
+        now = time.time()
+        for peer in self.peers.values():
+            for hashes, sent in list(peer["in_flight"].items()):
+                if now - sent > max(1.0, 4 * peer["rtt"]):
+                    del peer["in_flight"][hashes]
+                    self.queue[0:0] = [block_hash for block_hash in hashes if block_hash not in self.bodies]
+                    peer["rtt"] *= 2
+
+        self.dispatch()
+        self.timer = reactor.callLater(BODY_CHECK_INTERVAL, self.check_requests)
+
+    def receive_bodies(self, bodies : list, addr : tuple) -> None:
+        """Function to store received block bodies and apply the blocks that are next in order"""
+        peer = self.peers.get(addr)
+        if not self.active or peer is None:
+            return
+
+        received = set()
+        for body in bodies:
+            self.bodies[body[0]] = self.body(body[1:])
+            received.add(body[0])
+
+        # Match the reply to its request to measure the latency and requeue what the peer did not send
+        for hashes, sent in list(peer["in_flight"].items()):
+            if received.intersection(hashes) or len(bodies) == 0:
+                del peer["in_flight"][hashes]
+                peer["rtt"] = 0.8 * peer["rtt"] + 0.2 * (time.time() - sent)
+                self.queue[0:0] = [block_hash for block_hash in hashes if block_hash not in self.bodies]
+                break
+
+        self.apply_bodies()
+        if self.active:
+            self.dispatch()
+
+    def body(self, parts : list) -> tuple:
+        """Function to get the transactions, their details, the addresses of new properties and the proof of a received body, older peers send no proof"""
+        transactions, details, addresses = parts[:3]
+        return transactions, details, addresses, parts[3] if len(parts) > 3 else None
+
+    def apply_bodies(self) -> None:
+        """Function to append, in order, the blocks whose bodies have been received"""
+
+        # Only one batch is written at a time, bodies received meanwhile are applied once it is done
+        if self.applying:
+            return
+
+        ready = []
+        index = self.applied
+        while index < len(self.headers) and self.headers[index][0] in self.bodies:
+            block_hash, header = self.headers[index]
+            ready.append([block_hash, header, *self.bodies.pop(block_hash)])
+            index += 1
+
+        if len(ready) == 0:
+            return
+
+        self.applying = True
+        deferred = self.client.io.run(self.append_blocks, ready)
+        deferred.addCallback(self.appended_blocks, ready, self.started)
+
+    def append_blocks(self, ready : list) -> tuple:
+        """Function to append blocks along with their transactions, called on the I/O thread"""
+
+        # Returns the number of blocks appended and whether it stopped at an "invalid" body, an "unproven" block or a "changed" chain
+        chain = self.client.chain
+        state = self.client.state
+
+        for count, (block_hash, header, transactions, details, addresses, proof) in enumerate(ready):
+            block = {
+                "header" : header,
+                "body" : {
+                    "transactions" : transactions
+                }
+            }
+            if proof is not None:
+                block["poet"] = proof
+
+            if not Block.is_valid(block_hash, block):
+                return count, "invalid"
+
+            if block_hash not in chain.log and not self.client.poet.verify_block(block):
+                return count, "unproven"
+
+            if chain.receive_block(block_hash, block) not in ("added", "known"):
+                return count, "changed"
+
+            # Apply the transactions that are not yet part of the local state
+            new_transactions = {transaction_id : details[transaction_id] for transaction_id in transactions
+                                if state.get_transaction(transaction_id) is None}
+            new_properties = {property_id : {"address" : address, "history" : []}
+                              for property_id, address in addresses.items()
+                              if state.get_property(property_id) is None}
+            chain.commit_transactions(new_transactions, new_properties, state)
+
+        return len(ready), None
+
+    def appended_blocks(self, result : tuple, ready : list, started : float) -> None:
+        """Function to continue the sync once a batch of blocks has been appended"""
+
+        # The sync was stopped or restarted while the batch was being written
+        if started != self.started:
+            return
+
+        count, stopped = result
+        self.applying = False
+        self.applied += count
+
+        if stopped == "invalid":
+            # The body does not match the header, fetch it again and keep the ones after it
+            self.queue.insert(0, ready[count][0])
+            for block_hash, _, *body in ready[count + 1:]:
+                self.bodies[block_hash] = tuple(body)
+            return
+
+        if stopped == "unproven":
+            print("Block without a valid proof received, sync stopped!\n")
+            self.finish()
+            return
+
+        if stopped == "changed":
+            print("Blockchain changed during sync, sync stopped!\n")
+            self.finish()
+            return
+
+        if self.applied == len(self.headers) and self.headers[-1][0] == self.tip:
+            print("Synced", self.applied, "blocks from", len(self.peers), "peers in %.2f seconds!\n" % (time.time() - self.started))
+            self.send("request_mempool", "", self.header_peer)
+            self.finish()
+            return
+
+        self.apply_bodies()
+
+    def finish(self) -> None:
+        """Function to stop the sync"""
+        if self.timer is not None and self.timer.active():
+            self.timer.cancel()
+        self.reset()
+        self.client.sync_done()
@@ -0,0 +1,150 @@
+import pytest
+
+from block import Block, BlockChain
+from mempool import Mempool
+from policy import BlockPolicy
+from state_store import JsonStateStore, SqliteStateStore
+
+"""This file tests that the blockchain switches to a higher branch, reverting and committing the state to match"""
+
+class Gossip:
+    """This class records the blocks a peer publishes"""
+
+    def __init__(self) -> None:
+        """Initializes the record"""
+        self.published = []
+
+    def publish(self, tag : str, data : list) -> None:
+        """Function to record a published message"""
+        self.published.append((tag, data))
+
+class Peer:
+    """This class holds the parts of a client the blockchain commits the state and mints through"""
+
+    def __init__(self, state) -> None:
+        """Initializes the peer"""
+        self.state = state
+        self.mempool = Mempool("./data/mempool.journal")
+        self.policy = BlockPolicy()
+        self.gossip = Gossip()
+
+def creation(buyer_id : str, property_id : str) -> dict:
+    """Function to get the details of a transaction creating a property"""
+    return {"buyer_id" : buyer_id, "seller_id" : "NA", "property_id" : property_id, "timestamp" : "0"}
+
+def block(prev_hash : str, transaction_ids : list) -> tuple:
+    """Function to create a block, returning its hash and details"""
+    new_block = Block(prev_hash, transaction_ids)
+    return new_block.get_hash(), new_block.details
+
+@pytest.fixture(params = ["json", "sqlite"])
+def peer(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    if request.param == "json":
+        return Peer(JsonStateStore("./data"))
+    return Peer(SqliteStateStore("./data/state.db"))
+
+def test_switches_to_higher_branch(peer):
+    chain = BlockChain()
+    genesis = chain.head
+
+    # Our branch has one block creating p1
+    peer.mempool.merge({"t1" : creation("alice", "p1")}, {"p1" : {"address" : "a", "history" : []}})
+    a1, details = block(genesis, ["t1"])
+    assert chain.receive_block(a1, details, peer) == "added"
+    assert chain.apply_blocks(peer) == (None, [])
+    assert peer.state.get_property("p1")["history"] == ["t1"]
+
+    # A branch of the same height is kept aside, a higher one becomes the chain
+    b1, details = block(genesis, ["t2"])
+    assert chain.receive_block(b1, details, peer) == "stale"
+    assert chain.head == a1
+    b2, details = block(b1, ["t3"])
+    assert chain.receive_block(b2, details, peer) == "reorg"
+    assert chain.head == b2 and chain.height(b2) == 2 and chain.reorgs == 1
+
+    # The block that left the chain is undone and its transaction is pending again
+    assert peer.state.get_transaction("t1") is None
+    assert peer.state.get_property("p1") is None
+    assert peer.mempool.get_transaction("t1") is not None
+
+    # Nothing is committed or minted till the transactions of the new branch are known
+    assert chain.apply_blocks(peer) == (b1, ["t2"])
+    assert chain.mint_block(peer) is None
+    peer.mempool.merge({"t2" : creation("bob", "p2")}, {"p2" : {"address" : "b", "history" : []}})
+    assert chain.apply_blocks(peer) == (b2, ["t3"])
+    peer.mempool.merge({"t3" : creation("carol", "p3")}, {"p3" : {"address" : "c", "history" : []}})
+    assert chain.apply_blocks(peer) == (None, [])
+
+    assert peer.state.get_property("p2")["history"] == ["t2"]
+    assert peer.state.get_property("p3")["history"] == ["t3"]
+    assert peer.mempool.get_transaction("t2") is None and peer.mempool.get_transaction("t1") is not None
+
+    # Peers on the old branch are sent the blocks from the one both branches share
+    assert chain.path_after(a1, b2) == [b1, b2]
+
+def test_reverts_sale(peer):
+    chain = BlockChain()
+
+    peer.mempool.merge({"t1" : creation("alice", "p1")}, {"p1" : {"address" : "a", "history" : []}})
+    a1, details = block(chain.head, ["t1"])
+    chain.receive_block(a1, details, peer)
+    chain.apply_blocks(peer)
+
+    # Alice sells p1 in a block that a higher branch then replaces
+    sale = {"buyer_id" : "bob", "seller_id" : "alice", "property_id" : "p1", "timestamp" : "1"}
+    peer.mempool.merge({"t2" : sale}, {})
+    a2, details = block(a1, ["t2"])
+    chain.receive_block(a2, details, peer)
+    chain.apply_blocks(peer)
+    assert peer.state.get_property("p1")["history"] == ["t2", "t1"]
+
+    b2, details = block(a1, [])
+    chain.receive_block(b2, details, peer)
+    b3, details = block(b2, [])
+    assert chain.receive_block(b3, details, peer) == "reorg"
+    assert chain.apply_blocks(peer) == (None, [])
+
+    assert peer.state.get_property("p1")["history"] == ["t1"]
+    assert peer.state.get_transaction("t2") is None
+    assert peer.mempool.get_transaction("t2") == sale
+    assert list(peer.state.properties_owned_by("alice")) == ["p1"]
+
+def test_sync_rejects_chain_with_unproven_block(peer):
+    chain = BlockChain()
+    genesis = chain.head
+
+    a1, first = block(genesis, [])
+    first["poet"] = {}
+    a2, second = block(a1, [])
+    assert not chain.update_chain({a1 : first, a2 : second}, a2, lambda details, parent : "poet" in details)
+    assert chain.head == genesis and a1 not in chain.log
+
+    second["poet"] = {}
+    assert chain.update_chain({a1 : first, a2 : second}, a2, lambda details, parent : "poet" in details)
+    assert chain.head == a2 and chain.get_block(a2)["poet"] == {}
+
+def test_mint_drops_sales_of_unknown_properties(peer):
+    chain = BlockChain()
+
+    # p2 is still being created by a pending transaction, p9 does not exist anywhere
+    sale = {"buyer_id" : "bob", "seller_id" : "alice", "property_id" : "p9", "timestamp" : "1"}
+    waiting = {"buyer_id" : "carol", "seller_id" : "bob", "property_id" : "p2", "timestamp" : "2"}
+    peer.mempool.merge({"t1" : creation("alice", "p1"), "t2" : sale, "t3" : waiting, "t4" : creation("bob", "p2")},
+                       {"p1" : {"address" : "a", "history" : []}, "p2" : {"address" : "b", "history" : []}})
+
+    block_hash = chain.mint_block(peer)
+    assert chain.get_block(block_hash)["body"]["transactions"] == ["t1"]
+    assert peer.state.get_property("p1")["history"] == ["t1"]
+    assert peer.state.get_transaction("t2") is None and peer.mempool.get_transaction("t2") is None
+
+    # The sale waiting for p2 stays pending and is minted once p2 exists
+    assert list(peer.mempool.transactions) == ["t3", "t4"]
+    assert peer.mempool.get_property("p2")["history"] == []
+    block_hash = chain.mint_block(peer)
+    assert chain.get_block(block_hash)["body"]["transactions"] == ["t4"]
+    block_hash = chain.mint_block(peer)
+    assert chain.get_block(block_hash)["body"]["transactions"] == ["t3"]
+    assert peer.state.get_property("p2")["history"] == ["t3", "t4"]
+    assert len(peer.mempool) == 0
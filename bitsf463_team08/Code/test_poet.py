@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from block import Block
+from poet import PoET, CLOCK_TOLERANCE
+
+"""This file tests the checks made on the wait announced by the winner of a block"""
+
+class Chain:
+    """This class holds the blocks a client has, by hash"""
+
+    def __init__(self, blocks : dict) -> None:
+        """Initializes the chain"""
+        self.blocks = blocks
+
+    def get_block(self, block_hash : str) -> dict:
+        """Function to get a block, None if it is not stored"""
+        return self.blocks.get(block_hash)
+
+class Monitor:
+    """This class reports every peer as alive"""
+
+    def is_alive(self, peer_id : str) -> bool:
+        """Function to check whether a peer is alive"""
+        return True
+
+class Peer:
+    """This class holds the parts of a client the Proof of Elapsed Time uses"""
+
+    def __init__(self, peer_id : str, peer_list : dict, blocks : dict) -> None:
+        """Initializes the peer"""
+        self.id = peer_id
+        self.peer_list = peer_list
+        self.monitor = Monitor()
+        self.chain = Chain(blocks)
+
+def setup() -> tuple:
+    """Function to create a verifier and a winner who know each other, with a parent block minted ten minutes ago"""
+    parent = Block("", [])
+    parent.details["header"]["timestamp"] = str(datetime.now() - timedelta(seconds = 600))
+    blocks = {parent.get_hash() : parent.details}
+    peer_list = {"alice" : {}, "bob" : {}}
+    return PoET(Peer("alice", peer_list, blocks)), PoET(Peer("bob", peer_list, blocks)), parent.get_hash()
+
+def mint(winner : PoET, prev_hash : str, timestamp : datetime) -> dict:
+    """Function to get the details of a block minted by a winner with the given timestamp"""
+    block = Block(prev_hash, [])
+    block.details["header"]["timestamp"] = str(timestamp)
+    block.details["poet"] = winner.draw(prev_hash)
+    return block.details
+
+def test_accepts_waited_block():
+    verifier, winner, prev_hash = setup()
+    assert verifier.verify_block(mint(winner, prev_hash, datetime.now()))
+
+def test_rejects_block_stamped_ahead():
+    verifier, winner, prev_hash = setup()
+    assert not verifier.verify_block(mint(winner, prev_hash, datetime.now() + timedelta(seconds = 10 * CLOCK_TOLERANCE)))
+    assert verifier.rejected == 1
+
+def test_rejects_unknown_minter_and_missing_proof():
+    verifier, winner, prev_hash = setup()
+    details = mint(winner, prev_hash, datetime.now())
+    details["poet"]["minter"] = "mallory"
+    assert not verifier.verify_block(details)
+    del details["poet"]
+    assert not verifier.verify_block(details)
+
+def test_history_outlives_its_minters():
+    verifier, winner, prev_hash = setup()
+    grandparent = Block("", [])
+    grandparent.details["header"]["timestamp"] = str(datetime.now() - timedelta(seconds = 1200))
+    old = mint(winner, grandparent.get_hash(), datetime.now() - timedelta(seconds = 600))
+    recent = mint(winner, prev_hash, datetime.now())
+
+    # Once the winner has left, only its recent blocks are rejected
+    del verifier.client.peer_list["bob"]
+    assert verifier.verify_block(old, grandparent.details)
+    assert not verifier.verify_block(recent)
@@ -0,0 +1,117 @@
+import random
+
+from twisted.internet.task import Clock
+
+from reliable import RELIABLE_TYPE, ACK_TYPE, MAX_RETRIES, MAX_RTO, ReliableChannel
+from wire import encode_message, decode_message
+
+"""This file tests the reliable channel under packet loss and a restart of the receiver, on a simulated clock"""
+
+# Seconds a datagram takes to cross the simulated network
+LATENCY = 0.01
+
+class Outbox:
+    """This class hands the datagrams of a node to the simulated network"""
+
+    def __init__(self, network : "Network", addr : tuple) -> None:
+        """Initializes the outbox"""
+        self.network = network
+        self.addr = addr
+
+    def send(self, data : bytes, addr : tuple) -> None:
+        """Function to send a datagram through the network"""
+        self.network.send(data, self.addr, addr)
+
+class Node:
+    """This class defines a node that only records the messages its reliable channel delivers"""
+
+    def __init__(self, network : "Network", addr : tuple) -> None:
+        """Initializes the node"""
+        self.outbox = Outbox(network, addr)
+        self.reliable = ReliableChannel(self, network.clock)
+        self.received = []
+        self.up = True
+
+    def datagramReceived(self, datagram : bytes, addr : tuple) -> None:
+        """Function to unwrap reliable frames and record the messages they complete"""
+        message = decode_message(datagram)
+        if message.type == RELIABLE_TYPE or message.type == ACK_TYPE:
+            for inner in self.reliable.receive(message, addr):
+                self.datagramReceived(inner, addr)
+        else:
+            self.received.append(message.data[0])
+
+class Network:
+    """This class delivers datagrams between nodes after a delay, dropping a fraction of them and all of those to nodes that are down"""
+
+    def __init__(self, loss : float = 0.0) -> None:
+        """Initializes the network"""
+        self.clock = Clock()
+        self.loss = loss
+        self.random = random.Random(0)
+        self.nodes = {}
+
+    def send(self, data : bytes, source : tuple, addr : tuple) -> None:
+        """Function to deliver a datagram after the latency unless it is lost"""
+        if self.random.random() >= self.loss:
+            self.clock.callLater(LATENCY, self.deliver, data, source, addr)
+
+    def deliver(self, data : bytes, source : tuple, addr : tuple) -> None:
+        """Function to hand a datagram to the node it was sent to if it is up"""
+        node = self.nodes[addr]
+        if node.up:
+            node.datagramReceived(data, source)
+
+    def run(self, seconds : float) -> None:
+        """Function to advance the simulated clock in small steps"""
+        for _ in range(int(seconds / LATENCY)):
+            self.clock.advance(LATENCY)
+
+SENDER = ("127.0.0.1", 1000)
+RECEIVER = ("127.0.0.1", 1001)
+
+def setup(loss : float = 0.0) -> tuple:
+    """Function to create a network with a sender and a receiver"""
+    network = Network(loss)
+    network.nodes[SENDER] = Node(network, SENDER)
+    network.nodes[RECEIVER] = Node(network, RECEIVER)
+    return network, network.nodes[SENDER], network.nodes[RECEIVER]
+
+def send(sender : Node, numbers : range, size : int = 100) -> None:
+    """Function to send numbered messages to the receiver"""
+    for number in numbers:
+        sender.reliable.send(encode_message("blocks", [number, "x" * size]), RECEIVER)
+
+def test_delivers_everything_under_loss():
+    network, sender, receiver = setup(loss = 0.3)
+    send(sender, range(300))
+    send(sender, range(300, 310), size = 5000)
+    network.run(120)
+
+    assert sorted(set(receiver.received)) == list(range(310))
+    assert sender.reliable.failed == 0
+    outgoing = sender.reliable.outgoing[RECEIVER]
+    assert len(outgoing.unacked) == 0 and len(outgoing.waiting) == 0
+
+def test_recovers_after_receiver_restart():
+    network, sender, receiver = setup()
+    send(sender, range(100))
+    network.run(5)
+    assert sorted(receiver.received) == list(range(100))
+
+    # The receiver goes down long enough for the sender to give up on what it sends meanwhile
+    receiver.up = False
+    send(sender, range(100, 400))
+    network.run(MAX_RETRIES * MAX_RTO + 10)
+    assert sender.reliable.failed > 0
+
+    # The receiver comes back with a fresh channel, and everything sent from then on arrives
+    restarted = Node(network, RECEIVER)
+    network.nodes[RECEIVER] = restarted
+    send(sender, range(400, 700))
+    network.run(30)
+
+    assert set(range(400, 700)) <= set(restarted.received)
+    outgoing = sender.reliable.outgoing[RECEIVER]
+    assert len(outgoing.unacked) == 0 and len(outgoing.waiting) == 0
+    assert sender.reliable.failed + len(set(restarted.received) & set(range(100, 400))) == 300
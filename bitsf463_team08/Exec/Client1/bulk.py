@@ -0,0 +1,210 @@
+import struct
+from collections import deque
+
+from zope.interface import implementer
+from twisted.internet import reactor
+from twisted.internet.error import CannotListenError
+from twisted.internet.interfaces import IPushProducer
+from twisted.internet.protocol import ClientFactory, Factory
+from twisted.protocols.basic import Int32StringReceiver
+
+"""This file contains the implementation of the TCP channel used for bulk transfers such as syncs, alongside the UDP datagrams"""
+
+# Whether bulk transfers use TCP, without it they are sent as datagrams like every other message
+BULK_ENABLED = True
+
+# Largest frame accepted on a bulk connection
+MAX_FRAME = 64 * 1024 * 1024
+
+# Seconds an unused connection is kept open, and seconds to wait when connecting to a peer
+IDLE_TIMEOUT = 60
+CONNECT_TIMEOUT = 5
+
+# Seconds for which a peer that refused a connection is sent datagrams instead
+FALLBACK_TTL = 10
+
+# The first frame of a connection carries the UDP port of the peer that opened it, followed by the host it advertises
+HELLO = struct.Struct(">H")
+
+@implementer(IPushProducer)
+class Stream:
+    """This class queues the frames sent on a connection and writes them only while the transport is not paused"""
+
+    def __init__(self, protocol) -> None:
+        """Initializes the stream of a connection"""
+        self.protocol = protocol
+        self.frames = deque()
+        self.paused = False
+
+    def write(self, frame : bytes) -> None:
+        """Function to queue a frame and write it if the transport accepts more data"""
+        self.frames.append(frame)
+        self.flush()
+
+    def flush(self) -> None:
+        """Function to write the queued frames till the transport asks us to pause"""
+        while len(self.frames) != 0 and not self.paused and self.protocol.connected:
+            self.protocol.sendString(self.frames.popleft())
+
+    def pauseProducing(self) -> None:
+        """Function called by the transport when its buffer is full"""
+        self.paused = True
+
+    def resumeProducing(self) -> None:
+        """Function called by the transport once its buffer has drained"""
+        self.paused = False
+        self.flush()
+
+    def stopProducing(self) -> None:
+        """Function called by the transport when the connection is lost"""
+        self.frames.clear()
+
+class BulkProtocol(Int32StringReceiver):
+    """This class frames the messages sent over a bulk connection with their length"""
+
+    MAX_LENGTH = MAX_FRAME
+
+    def __init__(self, channel, addr : tuple = None) -> None:
+        """Initializes the connection, addr is the UDP address of the peer once known"""
+        self.channel = channel
+        self.addr = addr
+        self.stream = Stream(self)
+        self.idle = None
+
+    def connectionMade(self) -> None:
+        """Function to announce our UDP port on the connections we open and send the frames queued meanwhile"""
+        self.transport.registerProducer(self.stream, True)
+        self.touch()
+
+        # Chunk requests are small, so they are sent right away instead of waiting to be coalesced
+        self.transport.setTcpNoDelay(True)
+
+        if self.addr is not None:
+            self.sendString(HELLO.pack(self.channel.client.port_no) + self.channel.client.host.encode("utf-8"))
+            self.channel.connected(self)
+
+    def stringReceived(self, frame : bytes) -> None:
+        """Function to handle a frame as if it were a datagram from the UDP address of the peer"""
+        self.touch()
+        if self.addr is None:
+            host = str(frame[HELLO.size:], "utf-8") or self.transport.getPeer().host
+            self.addr = (host, HELLO.unpack_from(frame)[0])
+            self.channel.connected(self)
+            return
+
+        self.channel.received += 1
+        self.channel.client.datagramReceived(frame, self.addr)
+
+    def lengthLimitExceeded(self, length : int) -> None:
+        """Function to drop a connection sending a frame larger than allowed"""
+        print("Bulk frame of", length, "bytes dropped!")
+        self.transport.loseConnection()
+
+    def touch(self) -> None:
+        """Function to postpone closing the connection while it is in use"""
+        if self.idle is not None and self.idle.active():
+            self.idle.reset(IDLE_TIMEOUT)
+        else:
+            self.idle = reactor.callLater(IDLE_TIMEOUT, self.transport.loseConnection)
+
+    def connectionLost(self, reason) -> None:
+        """Function to forget a closed connection"""
+        if self.idle is not None and self.idle.active():
+            self.idle.cancel()
+        self.channel.disconnected(self)
+
+class BulkFactory(Factory):
+    """This class creates the protocol of the connections opened by peers"""
+
+    def __init__(self, channel) -> None:
+        """Initializes the factory"""
+        self.channel = channel
+
+    def buildProtocol(self, addr) -> BulkProtocol:
+        """Function to create the protocol of an accepted connection, whose peer announces its UDP port first"""
+        return BulkProtocol(self.channel)
+
+class BulkConnector(ClientFactory):
+    """This class opens a connection to a peer, falling back to datagrams if it fails"""
+
+    def __init__(self, channel, addr : tuple) -> None:
+        """Initializes the connector"""
+        self.channel = channel
+        self.addr = addr
+
+    def buildProtocol(self, addr) -> BulkProtocol:
+        """Function to create the protocol of the connection"""
+        return BulkProtocol(self.channel, self.addr)
+
+    def clientConnectionFailed(self, connector, reason) -> None:
+        """Function to send the frames queued for a peer that cannot be reached over TCP as datagrams"""
+        self.channel.failed(self.addr)
+
+class BulkChannel:
+    """This class sends bulk messages over a TCP connection per peer, reusing connections opened by either side"""
+
+    def __init__(self, client, enabled : bool = BULK_ENABLED) -> None:
+        """Initializes the bulk channel of a client"""
+        self.client = client
+        self.enabled = enabled
+
+        self.connections = {}
+
+        # Frames waiting for a connection being opened, and the peers sent datagrams instead
+        self.pending = {}
+        self.fallback = {}
+
+        self.sent = 0
+        self.received = 0
+
+    def listen(self, port : int, interface : str = "") -> None:
+        """Function to accept bulk connections on the TCP port with the number of our UDP port"""
+        if not self.enabled:
+            return
+
+        try:
+            reactor.listenTCP(port, BulkFactory(self), interface = interface)
+        except CannotListenError:
+            print("TCP port", port, "is in use, bulk transfers use UDP!")
+            self.enabled = False
+
+    def streams(self, addr : tuple) -> bool:
+        """Function to check whether bulk messages to a peer are sent over TCP"""
+        return self.enabled and self.fallback.get(addr, 0) <= reactor.seconds()
+
+    def send(self, data : bytes, addr : tuple) -> None:
+        """Function to send a bulk message to the UDP address of a peer, called on the reactor thread"""
+        if not self.streams(addr):
+            self.client.transfer_data(data, addr)
+            return
+
+        self.sent += 1
+        connection = self.connections.get(addr)
+        if connection is not None:
+            connection.stream.write(data)
+            return
+
+        # The first message to a peer opens the connection, the next ones wait for it
+        if addr not in self.pending:
+            self.pending[addr] = []
+            reactor.connectTCP(addr[0], addr[1], BulkConnector(self, addr), timeout = CONNECT_TIMEOUT)
+        self.pending[addr].append(data)
+
+    def connected(self, protocol : BulkProtocol) -> None:
+        """Function to use a new connection for the peer at its end"""
+        self.connections.setdefault(protocol.addr, protocol)
+        self.fallback.pop(protocol.addr, None)
+
+        for data in self.pending.pop(protocol.addr, []):
+            protocol.stream.write(data)
+
+    def disconnected(self, protocol : BulkProtocol) -> None:
+        """Function to forget a closed connection"""
+        if self.connections.get(protocol.addr) is protocol:
+            del self.connections[protocol.addr]
+
+    def failed(self, addr : tuple) -> None:
+        """Function to send datagrams to a peer that does not accept bulk connections"""
+        self.fallback[addr] = reactor.seconds() + FALLBACK_TTL
+        for data in self.pending.pop(addr, []):
+            self.client.transfer_data(data, addr)
@@ -6,15 +6,74 @@ import pickle
 import random
 import math
 import time
+import hashlib
 
 from block import Block, BlockChain
 from property import Property
 from transaction import Transaction
+from state_store import STATE_BACKEND, open_state_store
+from migrate_state import migrate, needs_migration
+from mempool import Mempool
+from sync import StateSync, ChainSync
+from reconcile import MempoolReconciler
+from gossip import Gossip, message_key
+from dedup import DedupCache
+from liveness import PeerMonitor
+from membership import JOIN, LEAVE, ENDPOINT, Membership
+from mint import MintScheduler
+from policy import BlockPolicy
+from poet import PoET
+from wire import MESSAGE_TYPES, encode_message, decode_message
+from io_worker import IOWorker, ReactorLag
+from send_queue import SendQueue
+from bulk import BulkChannel
+from endpoint import DEFAULT_HOST, BIND_INTERFACE, BOOTSTRAP_PEERS, parse_endpoint, format_endpoint, peer_endpoint, parse_arguments
+from reliable import RELIABLE_TYPE, ACK_TYPE, ReliableChannel
 
 from twisted.internet.protocol import DatagramProtocol
 from twisted.internet import reactor
 
 """This file contains the implementation of the Client class"""
+
+# Seconds a starting client waits for the reply to its sync request before continuing without it
+BOOTSTRAP_TIMEOUT = 10
+
+# Seconds a new user waits for a bootstrap peer to answer before asking the next one
+JOIN_RETRY = 2
+
+# Seconds a leaving client keeps running so that its leave reaches the peers
+LEAVE_GRACE = 0.5
+
+# Number of transaction IDs announced or requested in one datagram
+IDS_PER_MESSAGE = 256
+
+# Size limit of the transaction details sent in one datagram
+ITEMS_BUDGET = 6000
+
+# Messages that are only ever pushed, so a repeat is a duplicate, while requests may be legitimately sent again
+DEDUP_TYPES = {MESSAGE_TYPES[tag] for tag in ("new_block", "peer_list_update", "transactions",
+                                              "sending_transaction_with_h", "sending_transaction_with_b",
+                                              "sending_transaction_with_s", "proof_result")}
+
+# Gossiped messages are recognised by their ID, which stays the same over every hop
+GOSSIP_TYPE = MESSAGE_TYPES["gossip"]
+
+# Seconds a seller waits for the buyer to verify the ownership proof
+PROOF_TIMEOUT = 15
+
+# Seconds before the missing transactions of a received block are requested again
+BODY_RETRY = 2
+
+# Maps each message type to the method of the Client class handling it
+HANDLERS = {}
+
+def handles(tag):
+    """Decorator registering a method of the Client class as the handler of a message tag"""
+    def register(function):
+        HANDLERS[MESSAGE_TYPES[tag]] = function
+        return function
+    return register
+
 def find_key(string):
     index = 0
     for char in string:
@@ -26,7 +85,8 @@ def find_key(string):
 
 class Client(DatagramProtocol):
     """This class defines the structure and actions of a client"""
-    def __init__(self, port : int, first_client : bool = False) -> None:
+    def __init__(self, port : int, first_client : bool = False, bootstrap_timeout : float = BOOTSTRAP_TIMEOUT,
+                 host : str = DEFAULT_HOST, interface : str = BIND_INTERFACE, bootstrap : list = None) -> None:
         """Initializes the Client object"""
         self.properties = {}
         # Check to see if ID already exists
@@ -43,54 +103,153 @@ class Client(DatagramProtocol):
             with open("./data/id.txt", 'w') as f:
                 f.write(self.id + '#' + str(port))
 
+        # Import the JSON state files of an older client into the state store
+        if STATE_BACKEND == "sqlite" and needs_migration():
+            migrate()
+
+        self.state = open_state_store()
+        self.io = IOWorker()
+        self.lag = ReactorLag()
+        self.outbox = SendQueue(self)
+        self.reliable = ReliableChannel(self)
+        self.bulk = BulkChannel(self)
+        self.mempool = Mempool()
+        self.sync = StateSync(self)
+        self.chain_sync = ChainSync(self)
+        self.reconciler = MempoolReconciler(self)
+        self.gossip = Gossip(self)
+        self.dedup = DedupCache()
+        self.monitor = PeerMonitor(self)
+        self.membership = Membership(self)
+        self.policy = BlockPolicy()
+        self.poet = PoET(self)
+        self.minter = MintScheduler(self)
+
         self.first_client = first_client
         self.peer_list = {}
 
+        # Address advertised to peers, the interface the sockets are bound to and the peers a new user joins through
+        self.host = host
+        self.interface = interface
+        self.bootstrap = bootstrap if bootstrap is not None else [parse_endpoint(text) for text in BOOTSTRAP_PEERS]
+
+        # Startup state, the blockchain is loaded by startProtocol
+        self.bootstrap_timeout = bootstrap_timeout
+        self.phase = None
+        self.timeout = None
+        self.chain = None
+        self.backlog = []
+
+        # Set once a bootstrap peer answered the request to join, which is then no longer sent
+        self.answered = False
+
+        # Requests again the transactions a received block is waiting for
+        self.body_timer = None
+
     def startProtocol(self) -> None:
         """Function runs after the client is initialized"""
+        self.phase = "loading"
+        self.phase_started = time.monotonic()
+        self.timings = []
+
+        # Disk I/O of the handlers runs on the I/O thread, the lag gauge shows how long the reactor was blocked
+        self.io.start()
+        self.lag.start()
 
-        sleep_time = 2
+        # Syncs are streamed over TCP on the port with the same number, small messages stay on UDP
+        self.bulk.listen(self.port_no, self.interface)
+
+        # Load the blockchain and peers without blocking the reactor, datagrams received meanwhile are kept till then
+        deferred = self.io.run(self.load_local_state)
+        deferred.addCallback(self.local_state_loaded)
+
+    def load_local_state(self) -> tuple:
+        """Function to open the blockchain and read the stored peer list, called on the I/O thread"""
+        return BlockChain(), self.state.load_peers(), self.state.load_versions()
+
+    def local_state_loaded(self, result : tuple) -> None:
+        """Function to contact the network once the local state is loaded"""
+        self.chain, peer_list, versions = result
+        self.end_phase()
 
         # Create a new peer list if first client
         # Else get the updated peer list from other peers / first client
-        if not self.first_client:
-            if os.path.exists("./data/peer_list.txt"):
-                with open("./data/peer_list.txt", 'r') as f:
-                    self.peer_list = json.loads(f.read())
-
-                data = {
-                    "tag" : "request_update",
-                    "data" : ""
-                }
-
-                data = json.dumps(data)
-                data = data.encode("utf-8")
-
-                for peer in self.peer_list:
-                    if peer == self.id:
-                        continue
-
-                    reactor.callFromThread(self.transfer_data, data, ("127.0.0.1", self.peer_list[peer]["port_no"]))
-                    sleep_time = 5
-            else:
-                data = {
-                    "tag" : "new_user",
-                    "data" : [self.id, self.port_no]
-                }
-                data = json.dumps(data)
-                data = data.encode("utf-8")
-                reactor.callFromThread(self.transfer_data, data, ("127.0.0.1", 1000))
+        if peer_list is not None:
+            # Keep the peers known before a restart, announcing ourselves again if we left or moved
+            self.peer_list = self.membership.load(peer_list, versions)
+            if self.id not in self.peer_list:
+                self.membership.publish(JOIN, self.id, (self.host, self.port_no))
+            elif peer_endpoint(self.peer_list[self.id]) != (self.host, self.port_no):
+                self.membership.publish(ENDPOINT, self.id, (self.host, self.port_no))
+        elif not self.first_client:
+            # Join the network, the first client replies with the peer list and a snapshot of the state
+            self.phase = "joining"
+            self.join(0)
+        else:
+            self.membership.publish(JOIN, self.id, (self.host, self.port_no))
+
+        # Catch up with the blocks minted while the client was offline, headers first
+        if self.phase != "joining" and len(self.peer_list) > 1:
+            self.phase = "syncing"
+            self.chain_sync.start()
+
+        if self.phase == "loading":
+            self.ready()
         else:
-            self.peer_list[self.id] = {
-                "port_no" : self.port_no,
-                "properties" : []
-            }
+            self.timeout = reactor.callLater(self.bootstrap_timeout, self.timed_out)
 
-            with open("./data/peer_list.txt", 'w') as f:
-                f.write(json.dumps(self.peer_list))
+        # Handle the datagrams received while loading
+        backlog = self.backlog
+        self.backlog = []
+        for datagram, addr in backlog:
+            self.datagramReceived(datagram, addr)
 
-        time.sleep(sleep_time)
-        self.chain = BlockChain()
+    def join(self, index : int) -> None:
+        """Function to ask the bootstrap peers in turn to let us join, till one of them answers"""
+        if self.phase != "joining" or self.answered:
+            return
+
+        peers = [addr for addr in self.bootstrap if addr != (self.host, self.port_no)]
+        if len(peers) == 0:
+            return
+
+        data = encode_message("new_user", [self.id, self.port_no, self.host])
+        self.transfer_data(data, peers[index % len(peers)])
+        reactor.callLater(JOIN_RETRY, self.join, index + 1)
+
+    def end_phase(self) -> None:
+        """Function to record the time taken by the current startup phase"""
+        now = time.monotonic()
+        self.timings.append((self.phase, now - self.phase_started))
+        self.phase_started = now
+
+    def sync_done(self) -> None:
+        """Function called by the sync handlers when a sync finishes, completing the startup if it was waiting for one"""
+        if self.phase in ("joining", "syncing"):
+            if self.timeout.active():
+                self.timeout.cancel()
+            self.ready()
+
+    def timed_out(self) -> None:
+        """Function to complete the startup when no sync finished in time"""
+        print("No sync reply within %d seconds, continuing in the background" % self.bootstrap_timeout)
+        self.ready()
+
+    def ready(self) -> None:
+        """Function to report the startup timings and start the event loop"""
+        if self.phase != "loading":
+            self.end_phase()
+        self.phase = "ready"
+
+        print("Ready in %.1f ms (%s)" % (sum(seconds for _, seconds in self.timings) * 1e3,
+                                         ", ".join("%s %.1f ms" % (phase, seconds * 1e3) for phase, seconds in self.timings)))
+
+        # Keep the pending transactions in agreement with the peers, and find out which peers left
+        self.reconciler.start()
+        self.monitor.start()
+
+        # Mint the transactions left pending before a restart once the block policy says they are due
+        self.minter.check()
 
         # Start the event loop
         reactor.callInThread(self.event_loop)
@@ -105,253 +264,474 @@ class Client(DatagramProtocol):
 
         prop.generate_h()
 
-        data = {
-                "tag" : "sending_transaction_with_h",
-                "data" : [transaction, prop.h, self.port_no, prop.public_key, prop.p, prop.g]
-                }
-        data = json.dumps(data)
-        data = data.encode("utf-8")
-        for peer in self.peer_list:
-            if peer == self.id:
-                continue
-            time.sleep(0.15)
-            reactor.callFromThread(self.transfer_data, data, ("127.0.0.1", self.peer_list[peer]["port_no"]))
+        self.gossip.publish("sending_transaction_with_h", [transaction, prop.h, [self.host, self.port_no], prop.public_key, prop.p, prop.g])
 
         return
 
     def datagramReceived(self, datagram: bytes, addr : tuple) -> None:
         """Function runs when a datagram is received"""
 
-        datagram = datagram.decode("utf-8")
-        datagram = json.loads(datagram)
-
-        # Update the list of pending properties to be added
-        if datagram["tag"] == "temp_properties":
-            with open("./data/temp_properties.txt", 'w') as f:
-                f.write(json.dumps(datagram["data"]))
-
-        # Update the list of pending transactions to be added
-        elif datagram["tag"] == "temp_transactions":
-            with open("./data/temp_transactions.txt", 'w') as f:
-                f.write(json.dumps(datagram["data"]))
-
-            # If the number of pending transactions is 3, start minting the block
-            if len(datagram["data"]) == 3:
-                reactor.callInThread(self.proof_oet)
-
-        # Request from a new user processed - Send all data
-        elif datagram["tag"] == "new_user":
-            self.peer_list[datagram["data"][0]] = {
-                "port_no" : datagram["data"][1],
-                "properties" : []
-            }
-
-            with open("./data/peer_list.txt", 'w') as f:
-                f.write(json.dumps(self.peer_list))
-
-            data = {
-                "tag" : "peer_list_update",
-                "data" : self.peer_list
-            }
-            data = json.dumps(data)
-            data = data.encode("utf-8")
-
-            for peer in self.peer_list:
-                if peer == self.id:
-                    continue
-                reactor.callFromThread(self.transfer_data, data, ("127.0.0.1", self.peer_list[peer]["port_no"]))
+        # Keep the datagrams received while the blockchain is loading
+        if self.chain is None:
+            self.backlog.append((datagram, addr))
+            return
 
-            block_list = {}
-            blockchain = {}
-            temp_transactions = {}
-            temp_properties = {}
-            transactions = {}
-            properties = {}
+        message = decode_message(datagram)
+        if message is None:
+            return
+        self.monitor.heard(addr)
 
-            if os.path.exists("./data/block_list.txt"):
-                with open("./data/block_list.txt", 'r') as f:
-                    block_list = json.loads(f.read())
+        # Acknowledge reliable frames and handle the messages they complete as if received directly
+        if message.type == RELIABLE_TYPE or message.type == ACK_TYPE:
+            for inner in self.reliable.receive(message, addr):
+                self.datagramReceived(inner, addr)
+            return
 
-            if os.path.exists("./data/blockchain.txt"):
-                with open("./data/blockchain.txt", 'r') as f:
-                    blockchain = f.read()
+        # Drop repeated messages before decoding them
+        key = self.dedup_key(message)
+        if key is not None and not self.dedup.check(key):
+            return
 
-            if os.path.exists("./data/temp_transactions.txt"):
-                with open("./data/temp_transactions.txt", 'r') as f:
-                    temp_transactions = json.loads(f.read())
+        # Look up the handler of the message type, the payload is only decoded if there is one
+        handler = HANDLERS.get(message.type)
+        if handler is not None:
+            handler(self, message.data, addr)
+
+    def dedup_key(self, message) -> bytes:
+        """Function to get the key identifying a message in the dedup cache, None if repeats are not dropped"""
+        if message.type == GOSSIP_TYPE:
+            return message_key(message.payload)
+        if message.type in DEDUP_TYPES:
+            return hashlib.blake2b(message.payload, digest_size = 16).digest()
+        return None
+
+    def deliver(self, message_type : int, data, addr : tuple) -> None:
+        """Function to hand the decoded data of a message to the handler of its type"""
+        handler = HANDLERS.get(message_type)
+        if handler is not None:
+            handler(self, data, addr)
+
+    @handles("gossip")
+    def handle_gossip(self, data, addr : tuple) -> None:
+        """Message gossiped by a peer - Relay it if it is new and handle the message it carries"""
+        self.gossip.receive(*data, addr)
+
+    @handles("ping")
+    def handle_ping(self, data, addr : tuple) -> None:
+        """Probe of the failure detector - Answer it"""
+        self.monitor.receive_ping(data[0], data[1], addr)
+
+    @handles("ping_request")
+    def handle_ping_request(self, data, addr : tuple) -> None:
+        """Request to probe a peer that did not answer the sender"""
+        self.monitor.receive_ping_request(data[0], data[1], data[2], addr)
+
+    @handles("ping_ack")
+    def handle_ping_ack(self, data, addr : tuple) -> None:
+        """Answer to a probe"""
+        self.monitor.receive_ping_ack(data[0], data[1], addr)
+
+    @handles("inventory")
+    def handle_inventory(self, data, addr : tuple) -> None:
+        """New transactions announced by a peer - Request the ones not known yet"""
+        self.request_missing(data[0], addr)
+
+    @handles("request_transactions")
+    def handle_request_transactions(self, data, addr : tuple) -> None:
+        """Request for the details of transactions, along with the properties they create"""
+        items = self.pending_items(data[0])
+
+        # The transactions already in the blockchain are looked up on the I/O thread, for peers still committing the block
+        known = {item[0] for item in items}
+        committed = [transaction_id for transaction_id in data[0] if transaction_id not in known]
+        if len(committed) != 0:
+            deferred = self.io.run(self.committed_items, committed)
+            deferred.addCallback(lambda committed_items : self.send_items(items + committed_items, addr))
+        else:
+            self.send_items(items, addr)
+
+    @handles("transactions")
+    def handle_transactions(self, data, addr : tuple) -> None:
+        """Details of announced transactions received - Merge them into the pending ones"""
+        transactions = {}
+        properties = {}
+        for transaction_id, details, new_property in data[0]:
+            transactions[transaction_id] = details
+            if new_property is not None:
+                properties[details["property_id"]] = new_property
+
+        deferred = self.io.run(self.merge_transactions, transactions, properties)
+        deferred.addCallback(self.merged)
+
+        # The transactions may be the ones a received block was waiting for
+        if len(self.chain.unapplied) != 0:
+            deferred.addCallback(lambda _ : self.apply_blocks(addr))
+
+    @handles("mempool_sketch")
+    def handle_mempool_sketch(self, data, addr : tuple) -> None:
+        """Sketch of the pending transactions of a peer - Work out how the mempools differ"""
+        self.reconciler.receive_sketch(data[0], addr)
+
+    @handles("sketch_failed")
+    def handle_sketch_failed(self, data, addr : tuple) -> None:
+        """Sketch was too small for the peer to work out the difference"""
+        self.reconciler.receive_failed(data[0], addr)
+
+    @handles("sketch_difference")
+    def handle_sketch_difference(self, data, addr : tuple) -> None:
+        """Difference between the mempools worked out by a peer - Exchange the missing transactions"""
+        self.reconciler.receive_difference(data[0], data[1], addr)
+
+    @handles("new_user")
+    def handle_new_user(self, data, addr : tuple) -> None:
+        """Request from a new user processed - Send all data"""
+        # Older clients do not send their host, which is then the address the request came from
+        host = data[2] if len(data) > 2 else addr[0]
+
+        # The peers get the join as a delta through the gossip overlay, unless a repeated request announces it again
+        peer = self.peer_list.get(data[0])
+        if peer is None or peer_endpoint(peer) != (host, data[1]):
+            self.membership.publish(JOIN, data[0], (host, data[1]))
+
+        # The new user gets the full membership
+        self.membership.send_snapshot(addr)
+
+        # Offer a snapshot of the state, which the new user downloads in chunks
+        self.sync.offer(addr)
+
+    @handles("sync_manifest")
+    def handle_sync_manifest(self, data, addr : tuple) -> None:
+        """Manifest of a snapshot received by the new user - Start downloading it"""
+        self.answered = True
+        self.sync.start(data, addr)
+
+    @handles("request_manifest")
+    def handle_request_manifest(self, data, addr : tuple) -> None:
+        """Request for the manifest of a new snapshot"""
+        self.sync.offer(addr)
+
+    @handles("request_chunks")
+    def handle_request_chunks(self, data, addr : tuple) -> None:
+        """Request for chunks of a snapshot"""
+        self.sync.serve_chunks(data[0], data[1], addr)
+
+    @handles("sync_chunk")
+    def handle_sync_chunk(self, data, addr : tuple) -> None:
+        """Chunk of a snapshot received"""
+        self.sync.receive_chunk(*data)
+
+    @handles("sync_expired")
+    def handle_sync_expired(self, data, addr : tuple) -> None:
+        """Snapshot being downloaded is no longer available"""
+        self.sync.expired(data[0])
+
+    @handles("tip")
+    def handle_tip(self, data, addr : tuple) -> None:
+        """Head of the chain of a peer received"""
+        self.chain_sync.receive_tip(data[0], addr)
+
+    @handles("request_headers")
+    def handle_request_headers(self, data, addr : tuple) -> None:
+        """Request for the headers after a block"""
+        self.chain_sync.serve_headers(data[0], data[1], addr)
+
+    @handles("headers")
+    def handle_headers(self, data, addr : tuple) -> None:
+        """Headers received from a peer"""
+        self.chain_sync.receive_headers(*data, addr)
+
+    @handles("request_bodies")
+    def handle_request_bodies(self, data, addr : tuple) -> None:
+        """Request for block bodies"""
+        self.chain_sync.serve_bodies(data[0], addr)
+
+    @handles("bodies")
+    def handle_bodies(self, data, addr : tuple) -> None:
+        """Block bodies received from a peer"""
+        self.chain_sync.receive_bodies(data[0], addr)
+
+    @handles("request_mempool")
+    def handle_request_mempool(self, data, addr : tuple) -> None:
+        """Request for the pending transactions and properties"""
+        self.chain_sync.serve_mempool(addr)
+
+    @handles("mempool")
+    def handle_mempool(self, data, addr : tuple) -> None:
+        """Pending transactions and properties received after a sync"""
+        deferred = self.io.run(self.mempool.merge, data[0], data[1])
+        deferred.addCallback(lambda _ : self.minter.check())
+
+    @handles("peer_list_update")
+    def handle_peer_list_update(self, data, addr : tuple) -> None:
+        """Full peer list sent by an older client - Add the peers not known yet"""
+        self.answered = True
+        self.membership.merge(data)
+
+    @handles("membership")
+    def handle_membership(self, data, addr : tuple) -> None:
+        """Full membership received by a new user or a peer that fell too far behind"""
+        self.answered = True
+        self.membership.receive_snapshot(data[0], data[1])
+
+    @handles("membership_delta")
+    def handle_membership_delta(self, data, addr : tuple) -> None:
+        """Peer joined, left or moved - Apply the change if no earlier one is missing"""
+        self.membership.receive(data, addr)
+
+    @handles("request_membership")
+    def handle_request_membership(self, data, addr : tuple) -> None:
+        """Request for the membership changes newer than the version of a peer"""
+        self.membership.serve(data[0], addr)
+
+    @handles("membership_deltas")
+    def handle_membership_deltas(self, data, addr : tuple) -> None:
+        """Membership changes that were missing received"""
+        self.membership.receive_deltas(data[0], addr)
+
+    @handles("new_block")
+    def handle_new_block(self, data, addr : tuple) -> None:
+        """Receives the new block from the winner of the mint"""
+        block_hash, details = data
+        deferred = self.io.run(self.receive_block, block_hash, details)
+        deferred.addCallback(self.received_block, block_hash, details, addr)
+
+    def receive_block(self, block_hash : str, details : dict) -> str:
+        """Function to check the wait announced by the winner of a block before adding it, called on the I/O thread"""
+        if block_hash not in self.chain.log and not self.poet.verify_block(details):
+            return "invalid"
+        return self.chain.receive_block(block_hash, details, self)
+
+    def received_block(self, result : str, block_hash : str, details : dict, addr : tuple) -> None:
+        """Function to request the missing range from the sender if the parent of a received block is unknown"""
+        if result == "orphan":
+            self.request_blocks(block_hash, addr)
+            return
 
-            if os.path.exists("./data/temp_properties.txt"):
-                with open("./data/temp_properties.txt", 'r') as f:
-                    temp_properties = json.loads(f.read())
+        # A block extending the head, or a branch becoming the highest, stops our own wait and commits the transactions included
+        self.minter.received(result, details)
+        if result == "added" or result == "reorg":
+            self.apply_blocks(addr)
+
+    def apply_blocks(self, addr : tuple) -> None:
+        """Function to commit the transactions of the blocks added to the chain, the ones we do not have are requested from the sender"""
+        deferred = self.io.run(self.chain.apply_blocks, self)
+        deferred.addCallback(self.applied_blocks, addr)
+
+    def applied_blocks(self, result : tuple, addr : tuple) -> None:
+        """Function to request the transactions a block is waiting for, or to mint the transactions left pending once every block is committed"""
+        block_hash, missing = result
+        if block_hash is None:
+            self.minter.check()
+            return
 
-            if os.path.exists("./data/transactions.txt"):
-                with open("./data/transactions.txt", 'r') as f:
-                    transactions = json.loads(f.read())
+        self.request_transactions(missing, addr)
 
-            if os.path.exists("./data/properties.txt"):
-                with open("./data/properties.txt", 'r') as f:
-                    properties = json.loads(f.read())
+        # Ask again till they arrive, a single timer covering every block waiting
+        if self.body_timer is None or not self.body_timer.active():
+            self.body_timer = reactor.callLater(BODY_RETRY, self.retry_blocks, addr)
 
-            data = {
-                "tag" : "new_user_response",
-                "data" : [block_list, blockchain, temp_transactions, temp_properties, transactions, properties]
-            }
+    def retry_blocks(self, addr : tuple) -> None:
+        """Function to request the missing transactions again if a block is still waiting for them"""
+        self.body_timer = None
+        if len(self.chain.unapplied) != 0:
+            self.apply_blocks(addr)
 
-            data = json.dumps(data)
-            data = data.encode("utf-8")
+    @handles("request_blocks")
+    def handle_request_blocks(self, data, addr : tuple) -> None:
+        """Request for the blocks after a given block"""
+        known_hash, tip_hash = data
 
-            reactor.callFromThread(self.transfer_data, data, addr)
+        deferred = self.io.run(self.chain.blocks_after, known_hash, tip_hash)
+        deferred.addCallback(lambda blocks : self.transfer_data(encode_message("blocks", [blocks, tip_hash]), addr))
 
-        # Response received by the new user
-        elif datagram["tag"] == "new_user_response":
-            list_dict = datagram["data"]
-            with open("./data/block_list.txt", 'w') as f:
-                f.write(json.dumps(list_dict[0]))
-
-            self.chain.block_list = list_dict[0]
+    @handles("blocks")
+    def handle_blocks(self, data, addr : tuple) -> None:
+        """Range of missing blocks received"""
+        blocks, tip_hash = data
+        if len(blocks) == 0:
+            return
 
-            with open("./data/blockchain.txt", 'w') as f:
-                f.write(list_dict[1])
+        deferred = self.io.run(self.chain.add_blocks, blocks, self)
+        deferred.addCallback(self.received_blocks, blocks[-1], tip_hash, addr)
+
+    def received_blocks(self, reorganized : bool, last : list, tip_hash : str, addr : tuple) -> None:
+        """Function to keep requesting blocks till the announced block is reached, and commit the ones that joined the chain"""
+        last_hash, details = last
+        if reorganized:
+            self.minter.received("reorg", details)
+            self.apply_blocks(addr)
+
+        # Continue from the last block received, which the peer has even when it is not on our chain
+        if tip_hash not in self.chain.log and last_hash in self.chain.log:
+            self.request_blocks(tip_hash, addr, last_hash)
+
+    @handles("request_update")
+    def handle_request_update(self, data, addr : tuple) -> None:
+        """Request an update after logging back onto the network"""
+
+        # Send the membership changes the returning client missed, older clients do not send their version
+        if len(data) > 1:
+            self.membership.serve(data[1], addr)
+
+        # Send only the blocks and state changes after the head of the returning client
+        self.chain_sync.serve_update(data[0], addr)
+
+    @handles("update")
+    def handle_update(self, data, addr : tuple) -> None:
+        """Blocks and state changes missed while offline received"""
+        self.chain_sync.receive_update(data[0], data[1], addr)
+
+    @handles("sending_transaction_with_h")
+    def handle_sending_transaction_with_h(self, data, addr : tuple) -> None:
+        """Challenge the seller of a property after receiving its commitment"""
+        self.h = data[1]
+        self.b = random.randint(0,1)
+        self.public_key = find_key(list(data[0].values())[0]["property_id"])
+        self.p = data[4]
+        self.g = data[5]
+        reply = encode_message("sending_transaction_with_b", [data[0], self.b, [self.host, self.port_no]])
+        self.send_reliable(reply, tuple(data[2]))
+
+    @handles("sending_transaction_with_b")
+    def handle_sending_transaction_with_b(self, data, addr : tuple) -> None:
+        """Answer the challenge of a peer for a property being sold"""
+        prop = self.properties[list(data[0].values())[0]["property_id"]]
+        prop_json = {}
+        prop_json[prop.id] = prop.details
+        prop.b = data[1]
+        prop.generate_s()
+        reply = encode_message("sending_transaction_with_s", [data[0], prop.s, [self.host, self.port_no], prop_json])
+        self.send_reliable(reply, tuple(data[2]))
+
+    @handles("sending_transaction_with_s")
+    def handle_sending_transaction_with_s(self, data, addr : tuple) -> None:
+        """Verify the answer of the seller and send back the result"""
+        self.s = data[1]
+        result = (pow(self.g,self.s)%self.p == (self.h*pow(self.public_key,self.b))%self.p)
+        reply = encode_message("proof_result", [data[0], result, [self.host, self.port_no]])
+        if(result and list(data[0].values())[0]["buyer_id"]==self.id):
+            # datagram["data"][3][0].generate_keys()
+            prop = Property(list(data[3].values())[0]["address"], list(data[3].values())[0]["history"])
+            self.properties[prop.id]=prop
+        self.send_reliable(reply, tuple(data[2]))
+
+    @handles("proof_result")
+    def handle_proof_result(self, data, addr : tuple) -> None:
+        """Result of the ownership proof received by the seller"""
+        if(data[1]):
+            self.properties.pop(list(data[0].values())[0]["property_id"])
+            self.valid_transaction=True
+        else:
+            self.valid_transaction=False
 
-            self.chain.head = list_dict[1]
-
-            with open("./data/temp_transactions.txt", 'w') as f:
-                f.write(json.dumps(list_dict[2]))
-
-            with open("./data/temp_properties.txt", 'w') as f:
-                f.write(json.dumps(list_dict[3]))
-
-            with open("./data/transactions.txt", 'w') as f:
-                f.write(json.dumps(list_dict[4]))
-
-            with open("./data/properties.txt", 'w') as f:
-                f.write(json.dumps(list_dict[5]))
-
-        # Update the peer list after a new user joins
-        elif datagram["tag"] == "peer_list_update":
-            self.peer_list = datagram["data"]
-            with open("./data/peer_list.txt", 'w') as f:
-                f.write(json.dumps(self.peer_list))
-
-        # Receives the new block from the winner of the mint
-        elif datagram["tag"] == "new_block":
-            list_dict = datagram["data"]
-
-            with open("./data/block_list.txt", 'w') as f:
-                f.write(json.dumps(list_dict[0]))
-
-            with open("./data/blockchain.txt", 'w') as f:
-                f.write(list_dict[1])
-
-        # Request an update after logging back onto the network
-        elif datagram["tag"] == "request_update":
-            data = {
-                "tag" : "peer_list_update",
-                "data" : self.peer_list
-            }
-
-            data = json.dumps(data)
-            data = data.encode("utf-8")
-
-            reactor.callFromThread(self.transfer_data, data, addr)
-
-            block_list = {}
-            blockchain = {}
-            temp_transactions = {}
-            temp_properties = {}
-            transactions = {}
-            properties = {}
-
-            if os.path.exists("./data/block_list.txt"):
-                with open("./data/block_list.txt", 'r') as f:
-                    block_list = json.loads(f.read())
-
-            if os.path.exists("./data/blockchain.txt"):
-                with open("./data/blockchain.txt", 'r') as f:
-                    blockchain = f.read()
-
-            if os.path.exists("./data/temp_transactions.txt"):
-                with open("./data/temp_transactions.txt", 'r') as f:
-                    temp_transactions = json.loads(f.read())
-
-            if os.path.exists("./data/temp_properties.txt"):
-                with open("./data/temp_properties.txt", 'r') as f:
-                    temp_properties = json.loads(f.read())
-
-            if os.path.exists("./data/transactions.txt"):
-                with open("./data/transactions.txt", 'r') as f:
-                    transactions = json.loads(f.read())
-
-            if os.path.exists("./data/properties.txt"):
-                with open("./data/properties.txt", 'r') as f:
-                    properties = json.loads(f.read())
-
-            data = {
-                "tag" : "new_user_response",
-                "data" : [block_list, blockchain, temp_transactions, temp_properties, transactions, properties]
-            }
-
-            data = json.dumps(data)
-            data = data.encode("utf-8")
-
-            reactor.callFromThread(self.transfer_data, data, addr)
-
-        elif datagram["tag"]=="sending_transaction_with_h":
-            self.h = datagram["data"][1]
-            self.b = random.randint(0,1)
-            self.public_key = find_key(list(datagram["data"][0].values())[0]["property_id"])
-            self.p = datagram["data"][4]
-            self.g = datagram["data"][5]
-            data = {
-            "tag" : "sending_transaction_with_b",
-            "data" : [datagram["data"][0], self.b, self.port_no]
-            }
-            data = json.dumps(data)
-            data = data.encode("utf-8")
-            reactor.callFromThread(self.transfer_data, data, ("127.0.0.1", datagram["data"][2]))
-
-
-        elif datagram["tag"]=="sending_transaction_with_b":
-            prop = self.properties[list(datagram["data"][0].values())[0]["property_id"]]
-            prop_json = {}
-            prop_json[prop.id] = prop.details
-            prop.b = datagram["data"][1]
-            prop.generate_s()
-            data = {
-            "tag" : "sending_transaction_with_s",
-            "data" : [datagram["data"][0], prop.s, self.port_no, prop_json]
-            }
-            data = json.dumps(data)
-            data = data.encode("utf-8")
-            reactor.callFromThread(self.transfer_data, data, ("127.0.0.1", datagram["data"][2]))
-
-        elif datagram["tag"]=="sending_transaction_with_s":
-            self.s = datagram["data"][1]
-            result = (pow(self.g,self.s)%self.p == (self.h*pow(self.public_key,self.b))%self.p)
-            data = {
-            "tag" : "proof_result",
-            "data" : [datagram["data"][0], result, self.port_no]
-            }
-            data = json.dumps(data)
-            data = data.encode("utf-8")
-            if(result and list(datagram["data"][0].values())[0]["buyer_id"]==self.id):
-                # datagram["data"][3][0].generate_keys()
-                prop = Property(list(datagram["data"][3].values())[0]["address"], list(datagram["data"][3].values())[0]["history"])
-                self.properties[prop.id]=prop
-            reactor.callFromThread(self.transfer_data, data, ("127.0.0.1", datagram["data"][2]))
-
-        elif datagram["tag"]=="proof_result":
-            if(datagram["data"][1]):
-                self.properties.pop(list(datagram["data"][0].values())[0]["property_id"])
-                self.valid_transaction=True
-            else:
-                self.valid_transaction=False
+        self.feedback_received=True
 
-            self.feedback_received=True
+    def announce(self, transaction_ids : list) -> None:
+        """Function to announce new pending transactions to a few random peers, which request the ones they lack"""
+
+        # Announcements are not relayed, every peer announces the transactions it merges in turn
+        self.gossip.publish("inventory", [transaction_ids], ttl = 1)
+
+    def send_inventory(self, transaction_ids : list, addr : tuple) -> None:
+        """Function to announce pending transactions to a single peer"""
+        for start in range(0, len(transaction_ids), IDS_PER_MESSAGE):
+            self.transfer_data(encode_message("inventory", [transaction_ids[start:start + IDS_PER_MESSAGE]]), addr)
+
+    def request_missing(self, transaction_ids : list, addr : tuple) -> None:
+        """Function to request the transactions a peer has that are neither pending nor part of the blockchain"""
+        missing = [transaction_id for transaction_id in transaction_ids if self.mempool.get_transaction(transaction_id) is None]
+        if len(missing) == 0:
+            return
+
+        deferred = self.io.run(self.unknown_transactions, missing)
+        deferred.addCallback(self.request_transactions, addr)
+
+    def unknown_transactions(self, transaction_ids : list) -> list:
+        """Function to get the transactions that are not yet part of the blockchain, called on the I/O thread"""
+        return [transaction_id for transaction_id in transaction_ids if self.state.get_transaction(transaction_id) is None]
+
+    def request_transactions(self, transaction_ids : list, addr : tuple) -> None:
+        """Function to request the details of announced transactions from a peer"""
+        for start in range(0, len(transaction_ids), IDS_PER_MESSAGE):
+            self.transfer_data(encode_message("request_transactions", [transaction_ids[start:start + IDS_PER_MESSAGE]]), addr)
+
+    def pending_items(self, transaction_ids : list) -> list:
+        """Function to get the details of pending transactions along with the properties they create"""
+        items = []
+        for transaction_id in transaction_ids:
+            details = self.mempool.get_transaction(transaction_id)
+            if details is None:
+                continue
+
+            new_property = self.mempool.get_property(details["property_id"]) if details["seller_id"] == "NA" else None
+            items.append([transaction_id, details, new_property])
+
+        return items
+
+    def committed_items(self, transaction_ids : list) -> list:
+        """Function to get the details of transactions in the blockchain, with the properties they create as they were created, called on the I/O thread"""
+        items = []
+        for transaction_id in transaction_ids:
+            details = self.state.get_transaction(transaction_id)
+            if details is None:
+                continue
+
+            new_property = None
+            if details["seller_id"] == "NA":
+                created = self.state.get_property(details["property_id"])
+                if created is not None:
+                    new_property = {"address" : created["address"], "history" : []}
+            items.append([transaction_id, details, new_property])
+
+        return items
+
+    def send_items(self, items : list, addr : tuple) -> None:
+        """Function to send the details of pending transactions, split over as many datagrams as needed"""
+        batch = []
+        size = 0
+        for item in items:
+            item_size = len(json.dumps(item))
+            if len(batch) != 0 and size + item_size > ITEMS_BUDGET:
+                self.transfer_data(encode_message("transactions", [batch]), addr)
+                batch = []
+                size = 0
+
+            batch.append(item)
+            size += item_size
+
+        if len(batch) != 0:
+            self.transfer_data(encode_message("transactions", [batch]), addr)
+
+    def merge_transactions(self, transactions : dict, properties : dict) -> list:
+        """Function to add received transactions that are not yet part of the blockchain to the mempool, called on the I/O thread"""
+        unknown = self.unknown_transactions(list(transactions))
+        transactions = {transaction_id : transactions[transaction_id] for transaction_id in unknown}
+        properties = {details["property_id"] : properties[details["property_id"]]
+                      for details in transactions.values() if details["property_id"] in properties}
+
+        return self.mempool.merge(transactions, properties)
+
+    def merged(self, added : list) -> None:
+        """Function to pass on merged transactions and start minting once the block policy says they are due"""
+        if len(added) == 0:
+            return
+
+        self.announce(added)
+        self.minter.check()
+
+    def request_blocks(self, tip_hash : str, addr : tuple, known_hash : str = None) -> None:
+        """Function to request the blocks between the head, or a given block, and a block announced by a peer"""
+        data = encode_message("request_blocks", [self.chain.head if known_hash is None else known_hash, tip_hash])
+
+        reactor.callFromThread(self.transfer_data, data, addr)
 
     def transfer_data(self, data, addr):
-        """Function to transfer data over UDP in a thread-safe manner"""
-        self.transport.write(data, addr)
+        """Function to transfer data over UDP through the send queue, called on the reactor thread"""
+        self.outbox.send(data, addr)
+
+    def send_reliable(self, data, addr):
+        """Function to send data that is acknowledged and retransmitted if lost in a thread-safe manner"""
+        reactor.callFromThread(self.reliable.send, data, addr)
 
     def event_loop(self):
         """The main event loop"""
@@ -372,8 +752,27 @@ class Client(DatagramProtocol):
             if choice == "1":
                 print()
                 print("UUID:", self.id)
-                print("Port:", self.port_no)
+                print("Endpoint:", format_endpoint((self.host, self.port_no)))
                 print("Peers:", list(self.peer_list.keys()))
+                print("Membership: version %d, %d gaps" % (self.membership.version(), self.membership.gaps))
+                counts = self.monitor.counts()
+                print("Liveness: %d alive, %d suspect, %d dead, %d probes, %d refuted" % (counts["alive"], counts["suspect"], counts["dead"],
+                                                                                        self.monitor.probed, self.monitor.refuted))
+                print("Chain: height %d, %d reorganizations, %d blocks waiting for transactions" % (
+                    self.chain.height(self.chain.head), self.chain.reorgs, len(self.chain.unapplied)))
+                print("Block cache: %d hits, %d misses" % (self.chain.cache_hits, self.chain.cache_misses))
+                print("Reactor lag: %.1f ms last, %.1f ms max, %d I/O calls queued" % (self.lag.last * 1e3, self.lag.max * 1e3, self.io.pending))
+                print("Datagrams: %d sent, %d queued, %d dropped" % (self.outbox.sent, self.outbox.queued(), self.outbox.dropped))
+                print("Reliable: %d sent, %d retransmitted, %d failed" % (self.reliable.sent, self.reliable.retransmitted, self.reliable.failed))
+                print("Bulk: %d connections, %d messages sent, %d received" % (len(self.bulk.connections), self.bulk.sent, self.bulk.received))
+                print("Mint: %d blocks, %d wasted (%d cancelled), %d orphaned, %d of %d triggers coalesced" % (
+                    self.minter.blocks, self.minter.wasted, self.minter.cancelled, self.minter.orphaned, self.minter.coalesced, self.minter.triggered))
+                print("PoET: %s waits, %.1f s target, %d competing, %d verified, %d rejected, %d unverified" % (
+                    self.poet.distribution, self.poet.target, self.poet.peers(), self.poet.verified, self.poet.rejected, self.poet.unverified))
+                print("Block policy: %d transactions or %d bytes or %.0f s, %d full and %d aged blocks" % (
+                    self.policy.target, self.policy.max_bytes, self.policy.max_age, self.policy.full, self.policy.aged))
+                print("Gossip: %d published, %d relayed" % (self.gossip.published, self.gossip.relayed))
+                print("Duplicates: %d of %d checked dropped (%.1f%%)" % (self.dedup.dropped, self.dedup.checked, self.dedup.drop_rate() * 100))
                 print()
 
             elif choice == "2":
@@ -383,55 +782,13 @@ class Client(DatagramProtocol):
                 self.properties[new_property.id]=new_property
                 new_transaction = Transaction(self.id, "NA", new_property.id, 0.0)
 
-                if os.path.exists("./data/temp_properties.txt"):
-                    with open("./data/temp_properties.txt", 'r') as f:
-                        temp_properties = json.loads(f.read())
-                else:
-                    temp_properties = {}
-
-                temp_properties[new_property.id] = new_property.details
-
-                with open("./data/temp_properties.txt", 'w') as f:
-                    f.write(json.dumps(temp_properties))
-
-                if os.path.exists("./data/temp_transactions.txt"):
-                    with open("./data/temp_transactions.txt", 'r') as f:
-                        temp_transactions = json.loads(f.read())
-                else:
-                    temp_transactions = {}
-
-                temp_transactions[new_transaction.id] = new_transaction.details
-
-                with open("./data/temp_transactions.txt", 'w') as f:
-                    f.write(json.dumps(temp_transactions))
-
-                sendable_transactions = {
-                    "tag" : "temp_transactions",
-                    "data" : temp_transactions
-                }
-
-                sendable_properties = {
-                    "tag" : "temp_properties",
-                    "data" : temp_properties
-                }
-
-                sendable_properties = json.dumps(sendable_properties)
-                sendable_properties = sendable_properties.encode("utf-8")
-
-                sendable_transactions = json.dumps(sendable_transactions)
-                sendable_transactions = sendable_transactions.encode("utf-8")
+                self.mempool.add_property(new_property.id, new_property.details)
+                self.mempool.add_transaction(new_transaction.id, new_transaction.details)
 
-                for peer in self.peer_list:
-                    if peer == self.id:
-                        continue
-                    time.sleep(0.15)
-                    reactor.callFromThread(self.transfer_data, sendable_properties, ("127.0.0.1", self.peer_list[peer]["port_no"]))
+                # Announce only the new transaction, peers request its details and the new property
+                self.announce([new_transaction.id])
 
-                    time.sleep(0.15)
-                    reactor.callFromThread(self.transfer_data, sendable_transactions, ("127.0.0.1", self.peer_list[peer]["port_no"]))
-
-                if len(temp_transactions) == 3:
-                    reactor.callInThread(self.proof_oet)
+                reactor.callFromThread(self.minter.check)
 
             elif choice == "3":
                 buyer_id = input("Enter the Buyer ID: ")
@@ -441,136 +798,92 @@ class Client(DatagramProtocol):
                 if buyer_id not in self.peer_list:
                     print("Invaid Buyer ID!")
                     continue
-                elif property_id not in self.peer_list[self.id]["properties"]:
+                elif property_id not in self.state.properties_owned_by(self.id):
                     print("Property not owned!")
                     continue
+                elif self.mempool.transaction_for_property(property_id) is not None:
+                    print("A sale of this property is already pending!")
+                    continue
 
                 new_transaction = Transaction(buyer_id, self.id, property_id, amount)
 
-                if os.path.exists("./data/temp_transactions.txt"):
-                    with open("./data/temp_transactions.txt", 'r') as f:
-                        temp_transactions = json.loads(f.read())
-                else:
-                    temp_transactions = {}
-
-                temp_transactions[new_transaction.id] = new_transaction.details
-
-                sendable_transactions = {
-                    "tag" : "temp_transactions",
-                    "data" : temp_transactions
-                }
-
-                sendable_transactions = json.dumps(sendable_transactions)
-                sendable_transactions = sendable_transactions.encode("utf-8")
-
                 self.feedback_received = False
                 proof_transaction = {}
                 proof_transaction[new_transaction.id] = new_transaction.details
                 reactor.callInThread(self.create_proof, proof_transaction)
-                while(not self.feedback_received):
+                deadline = time.monotonic() + PROOF_TIMEOUT
+                while(not self.feedback_received and time.monotonic() < deadline):
                     time.sleep(0.1)
 
-                if(self.valid_transaction):
-                    with open("./data/temp_transactions.txt", 'w') as f:
-                        f.write(json.dumps(temp_transactions))
-
-                    for peer in self.peer_list:
-                        if peer == self.id:
-                            continue
-                        time.sleep(0.1)
-                        reactor.callFromThread(self.transfer_data, sendable_transactions, ("127.0.0.1", self.peer_list[peer]["port_no"]))
+                if(not self.feedback_received):
+                    print("The buyer did not answer, try again later!")
+                elif(self.valid_transaction):
+                    self.mempool.add_transaction(new_transaction.id, new_transaction.details)
+                    self.announce([new_transaction.id])
 
-                        if len(temp_transactions) == 3:
-                            reactor.callInThread(self.proof_oet)
+                    reactor.callFromThread(self.minter.check)
 
             elif choice == '4':
-                if os.path.exists("./data/properties.txt"):
-                    with open("./data/properties.txt", 'r') as f:
-                        properties = json.loads(f.read())
-                else:
-                    properties = {}
+                properties = self.state.properties_owned_by(self.id)
 
                 print()
-                for property_id in self.peer_list[self.id]["properties"]:
+                for property_id in properties:
                     print("Property ID:", property_id)
                     print(properties[property_id])
                     print()
 
             elif choice == '5':
                 property_id = input("Enter the property ID: ")
-
-                if os.path.exists("./data/properties.txt"):
-                    with open("./data/properties.txt", 'r') as f:
-                        properties = json.loads(f.read())
-                else:
-                    properties = {}
+                details = self.state.get_property(property_id)
 
                 print()
-                if property_id in properties:
-                    print("Property details:\n", properties[property_id])
+                if details is not None:
+                    print("Property details:\n", details)
                 else:
                     print("Invalid property ID!")
 
             elif choice == '6':
                 transaction_id = input("Enter the transaction ID: ")
-
-                if os.path.exists("./data/transactions.txt"):
-                    with open("./data/transactions.txt", 'r') as f:
-                        transactions = json.loads(f.read())
-                else:
-                    transactions = {}
+                details = self.state.get_transaction(transaction_id)
 
                 print()
-                if transaction_id in transactions:
-                    print("Transaction details:\n", transactions[transaction_id])
+                if details is not None:
+                    print("Transaction details:\n", details)
                 else:
                     print("Invalid transaction ID!")
 
             elif choice == '7':
                 block_id = input("Enter the block ID: ")
-
-                if os.path.exists("./data/block_list.txt"):
-                    with open("./data/block_list.txt", 'r') as f:
-                        block_list = json.loads(f.read())
-                else:
-                    block_list = {}
+                block = self.chain.get_block(block_id)
 
                 print()
-                if block_id in block_list:
-                    print("Block details:\n", block_list[block_id])
+                if block is not None:
+                    print("Block details:\n", block)
                 else:
                     print("Invalid block ID!")
 
             elif choice == '8':
-                if os.path.exists("./data/block_list.txt"):
-                    with open("./data/block_list.txt", 'r') as f:
-                        block_list = json.loads(f.read())
-                else:
-                    block_list = {}
-
                 top = self.chain.head
                 print(top, end = '')
 
-                top = block_list[top]["header"]["prev_hash"]
+                top = self.chain.get_parent(top)
 
                 while top != "":
                     print(" ->", top, end = '')
-                    top = block_list[top]["header"]["prev_hash"] 
+                    top = self.chain.get_parent(top)
 
             elif choice == 'quit':
-                reactor.callFromThread(reactor.stop)
+                reactor.callFromThread(self.leave)
                 break
 
-    def proof_oet(self):
-        """Implementation of the Proof of Elapsed Time"""
-        sleep_length = random.uniform(0, 15)
-        time.sleep(0.5)
-        print("\nSleeping for", sleep_length)
-        time.sleep(sleep_length)
-
-        self.chain.mint_block(self.peer_list, self)
+    def leave(self) -> None:
+        """Function to tell the peers we are leaving and stop shortly after"""
+        if self.id in self.peer_list:
+            self.membership.publish(LEAVE, self.id)
+        reactor.callLater(LEAVE_GRACE, reactor.stop)
 
 if __name__ == "__main__":
     port = 1000
-    reactor.listenUDP(port, Client(port, True))
+    args = parse_arguments(port)
+    reactor.listenUDP(args.port, Client(args.port, True, host = args.host, interface = args.interface, bootstrap = args.bootstrap), interface = args.interface)
     reactor.run()
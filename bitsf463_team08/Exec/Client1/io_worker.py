@@ -0,0 +1,67 @@
+import time
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.failure import Failure
+from twisted.python.threadpool import ThreadPool
+
+"""This file contains the implementation of the worker running disk I/O outside the reactor thread and of the reactor lag gauge"""
+
+# Seconds between two ticks of the reactor lag gauge
+LAG_INTERVAL = 0.05
+
+class IOWorker:
+    """This class runs disk reads and writes on a dedicated thread, one at a time and in the order they were queued"""
+
+    def __init__(self) -> None:
+        """Initializes the worker"""
+
+        # A single thread keeps writes to the block log, state store and mempool journal in order
+        self.pool = ThreadPool(minthreads = 1, maxthreads = 1, name = "io")
+        self.pending = 0
+
+    def start(self) -> None:
+        """Function to start the I/O thread, which is stopped along with the reactor"""
+        self.pool.start()
+        reactor.addSystemEventTrigger("during", "shutdown", self.pool.stop)
+
+    def run(self, function, *args, **kwargs) -> Deferred:
+        """Function to queue a call on the I/O thread, the Deferred fires in the reactor thread with its result"""
+        self.pending += 1
+
+        deferred = deferToThreadPool(reactor, self.pool, function, *args, **kwargs)
+        deferred.addBoth(self.done)
+        return deferred
+
+    def done(self, result):
+        """Function to count a finished call, reporting it if it failed"""
+        self.pending -= 1
+
+        if isinstance(result, Failure):
+            print("I/O error:", result.getErrorMessage())
+        return result
+
+class ReactorLag:
+    """This class measures how long the reactor was blocked by checking how late a periodic tick runs"""
+
+    def __init__(self, interval : float = LAG_INTERVAL) -> None:
+        """Initializes the gauge"""
+        self.interval = interval
+        self.last = 0.0
+        self.max = 0.0
+        self.expected = None
+
+    def start(self) -> None:
+        """Function to start ticking"""
+        self.expected = time.monotonic()
+        self.tick()
+
+    def tick(self) -> None:
+        """Function to record how late the current tick ran and schedule the next one"""
+        now = time.monotonic()
+        self.last = max(0.0, now - self.expected)
+        self.max = max(self.max, self.last)
+
+        self.expected = now + self.interval
+        reactor.callLater(self.interval, self.tick)
@@ -0,0 +1,189 @@
+import base64
+import hashlib
+import json
+import random
+import struct
+
+from twisted.internet import reactor
+
+from endpoint import peer_endpoint
+from wire import encode_message
+
+"""This file contains the implementation of the invertible Bloom lookup table used to reconcile the mempools of two peers"""
+
+# Number of cells every key is added to, the table is split into as many equal parts
+HASH_COUNT = 3
+
+# Cells in the first sketch sent to a peer, doubled every time the peer cannot decode the difference
+INITIAL_CELLS = 12
+
+# Largest sketch accepted from a peer, a sketch is only grown while it is smaller than the whole inventory anyway
+MAX_CELLS = INITIAL_CELLS * 2 ** 12
+
+# Largest message sent in a single datagram, as Twisted reads at most 8192 bytes per datagram
+# Larger sketches and differences go through the reliable channel, which fragments them
+DATAGRAM_LIMIT = 8000
+
+# Seconds between two reconciliations with a random peer
+RECONCILE_INTERVAL = 5.0
+
+# Count, key sum and checksum sum of a cell
+CELL = struct.Struct(">iQI")
+
+def short_id(transaction_id : str) -> int:
+    """Function to get the 64 bit key of a transaction used in the sketches"""
+    return int.from_bytes(hashlib.sha256(transaction_id.encode("utf-8")).digest()[:8], "big")
+
+def sketch_fits(cells : int, transaction_ids : list) -> bool:
+    """Function to check whether a sketch with the given number of cells is smaller than announcing every pending transaction ID"""
+    return cells <= MAX_CELLS and cells * CELL.size * 4 // 3 < len(json.dumps(transaction_ids))
+
+def checksum(key : int) -> int:
+    """Function to get the checksum telling apart a cell holding a single key"""
+    return int.from_bytes(hashlib.sha256(key.to_bytes(8, "big")).digest()[:4], "big")
+
+class Sketch:
+    """This class defines an invertible Bloom lookup table of 64 bit keys"""
+
+    def __init__(self, cells : int) -> None:
+        """Initializes an empty table with the given number of cells"""
+        self.counts = [0] * cells
+        self.keys = [0] * cells
+        self.hashes = [0] * cells
+
+    @classmethod
+    def of(cls, keys, cells : int) -> "Sketch":
+        """Function to build the table holding the given keys"""
+        sketch = cls(cells)
+        for key in keys:
+            sketch.insert(key, 1)
+        return sketch
+
+    @classmethod
+    def from_bytes(cls, data : bytes) -> "Sketch":
+        """Function to read a table encoded with to_bytes"""
+        sketch = cls(len(data) // CELL.size)
+        for index, (count, key, hash_sum) in enumerate(CELL.iter_unpack(data)):
+            sketch.counts[index] = count
+            sketch.keys[index] = key
+            sketch.hashes[index] = hash_sum
+        return sketch
+
+    def to_bytes(self) -> bytes:
+        """Function to encode the table"""
+        return b"".join(CELL.pack(*cell) for cell in zip(self.counts, self.keys, self.hashes))
+
+    def indices(self, key : int) -> list:
+        """Function to get the cell of a key in every part of the table"""
+        part = len(self.counts) // HASH_COUNT
+        return [number * part + (key >> (21 * number)) % part for number in range(HASH_COUNT)]
+
+    def insert(self, key : int, sign : int) -> None:
+        """Function to add (sign 1) or remove (sign -1) a key"""
+        hash_value = checksum(key)
+        for index in self.indices(key):
+            self.counts[index] += sign
+            self.keys[index] ^= key
+            self.hashes[index] ^= hash_value
+
+    def subtract(self, other : "Sketch") -> "Sketch":
+        """Function to get the table of the keys in this table but not the other one and the reverse, with negative counts"""
+        difference = Sketch(len(self.counts))
+        for index in range(len(self.counts)):
+            difference.counts[index] = self.counts[index] - other.counts[index]
+            difference.keys[index] = self.keys[index] ^ other.keys[index]
+            difference.hashes[index] = self.hashes[index] ^ other.hashes[index]
+        return difference
+
+    def decode(self) -> tuple:
+        """Function to list the keys of a difference table, None if there are too many to recover"""
+
+        # Repeatedly remove the keys of cells holding a single key, which may leave other cells with a single key
+        ours = []
+        theirs = []
+        pending = list(range(len(self.counts)))
+        while len(pending) != 0:
+            index = pending.pop()
+            count = self.counts[index]
+            if count not in (1, -1) or checksum(self.keys[index]) != self.hashes[index]:
+                continue
+
+            key = self.keys[index]
+            (ours if count == 1 else theirs).append(key)
+            self.insert(key, -count)
+            pending.extend(self.indices(key))
+
+        if any(self.counts) or any(self.keys) or any(self.hashes):
+            return None
+        return ours, theirs
+
+class MempoolReconciler:
+    """This class periodically reconciles the pending transactions of the client with a random peer"""
+
+    def __init__(self, client) -> None:
+        """Initializes the reconciler of a client"""
+        self.client = client
+        self.timer = None
+
+    def send(self, tag : str, data, addr : tuple) -> None:
+        """Function to send a reconciliation message to a peer, fragmented when it does not fit a datagram"""
+        data = encode_message(tag, data)
+        if len(data) > DATAGRAM_LIMIT:
+            self.client.send_reliable(data, addr)
+        else:
+            self.client.transfer_data(data, addr)
+
+    def start(self) -> None:
+        """Function to start reconciling periodically"""
+        self.timer = reactor.callLater(RECONCILE_INTERVAL, self.tick)
+
+    def tick(self) -> None:
+        """Function to reconcile with a random peer"""
+        self.timer = reactor.callLater(RECONCILE_INTERVAL, self.tick)
+
+        peers = [peer for peer in self.client.peer_list if peer != self.client.id and self.client.monitor.is_alive(peer)]
+        if len(peers) != 0:
+            self.send_sketch(INITIAL_CELLS, peer_endpoint(self.client.peer_list[random.choice(peers)]))
+
+    def short_ids(self) -> dict:
+        """Function to map the key of every pending transaction to its ID"""
+        transactions, _ = self.client.mempool.snapshot()
+        return {short_id(transaction_id) : transaction_id for transaction_id in transactions}
+
+    def send_sketch(self, cells : int, addr : tuple) -> None:
+        """Function to send a sketch of the pending transactions to a peer"""
+        sketch = Sketch.of(self.short_ids(), cells)
+        self.send("mempool_sketch", [base64.b64encode(sketch.to_bytes()).decode("ascii")], addr)
+
+    def receive_sketch(self, encoded : str, addr : tuple) -> None:
+        """Function to work out the difference between the mempools from the sketch of a peer"""
+        theirs = Sketch.from_bytes(base64.b64decode(encoded))
+        cells = len(theirs.counts)
+        if cells == 0 or cells > MAX_CELLS or cells % HASH_COUNT != 0:
+            return
+
+        ids = self.short_ids()
+        result = Sketch.of(ids, cells).subtract(theirs).decode()
+        if result is None:
+            self.send("sketch_failed", [cells], addr)
+            return
+
+        # Send the IDs of the transactions only we have, and the keys of the ones only the peer has
+        ours, missing = result
+        if len(ours) != 0 or len(missing) != 0:
+            self.send("sketch_difference", [[ids[key] for key in ours if key in ids], missing], addr)
+
+    def receive_failed(self, cells : int, addr : tuple) -> None:
+        """Function to retry with a sketch twice as large, or send every pending transaction ID once that would be smaller"""
+        transactions, _ = self.client.mempool.snapshot()
+        if sketch_fits(cells * 2, list(transactions)):
+            self.send_sketch(cells * 2, addr)
+        else:
+            self.client.send_inventory(list(transactions), addr)
+
+    def receive_difference(self, their_ids : list, our_keys : list, addr : tuple) -> None:
+        """Function to request the transactions only the peer has and send the ones only we have"""
+        self.client.request_missing(their_ids, addr)
+
+        ids = self.short_ids()
+        self.client.send_items(self.client.pending_items([ids[key] for key in our_keys if key in ids]), addr)
@@ -0,0 +1,309 @@
+import os
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+"""This file contains the implementation of the stores holding the properties, transactions and peers of a client"""
+
+# Backend used by open_state_store when none is given
+STATE_BACKEND = "sqlite"
+
+class StateStore(ABC):
+    """This class defines the interface every state backend has to implement"""
+
+    @abstractmethod
+    def get_property(self, property_id : str) -> dict:
+        """Function to get the details of a property, None if it does not exist"""
+
+    @abstractmethod
+    def get_transaction(self, transaction_id : str) -> dict:
+        """Function to get the details of a transaction, None if it does not exist"""
+
+    @abstractmethod
+    def properties_owned_by(self, owner_id : str) -> dict:
+        """Function to get all the properties currently owned by a client"""
+
+    @abstractmethod
+    def transactions_of(self, client_id : str) -> dict:
+        """Function to get all the transactions in which a client was the buyer or the seller"""
+
+    @abstractmethod
+    def all_properties(self) -> dict:
+        """Function to get every property"""
+
+    @abstractmethod
+    def all_transactions(self) -> dict:
+        """Function to get every completed transaction"""
+
+    @abstractmethod
+    def load_peers(self) -> dict:
+        """Function to get the stored peer list, None if it was never saved"""
+
+    @abstractmethod
+    def load_versions(self) -> dict:
+        """Function to get the stored version of the peer list, empty if it was never saved"""
+
+    @abstractmethod
+    def save_peers(self, peer_list : dict, versions : dict = None) -> None:
+        """Function to store the peer list, along with its version if given"""
+
+    @abstractmethod
+    def commit_block(self, transactions : dict, properties : dict) -> None:
+        """Function to atomically store the transactions and modified properties of a minted block"""
+
+    @abstractmethod
+    def replace_all(self, transactions : dict, properties : dict) -> None:
+        """Function to replace the stored transactions and properties with the ones received from a peer"""
+
+    @abstractmethod
+    def revert_block(self, transaction_ids : list, properties : dict, removed : list) -> None:
+        """Function to atomically undo a block leaving the chain, deleting its transactions and the properties it created and restoring the ones it modified"""
+
+class JsonStateStore(StateStore):
+    """This class stores the state in the JSON text files inside the data folder"""
+
+    def __init__(self, directory : str = "./data") -> None:
+        """Initializes the store"""
+        self.directory = directory
+
+    def read(self, name : str) -> dict:
+        """Function to read one of the JSON files"""
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            return {}
+
+        with open(path, 'r') as f:
+            return json.loads(f.read())
+
+    def write(self, name : str, data : dict) -> None:
+        """Function to write one of the JSON files"""
+        with open(os.path.join(self.directory, name), 'w') as f:
+            f.write(json.dumps(data))
+
+    def get_property(self, property_id : str) -> dict:
+        return self.read("properties.txt").get(property_id)
+
+    def get_transaction(self, transaction_id : str) -> dict:
+        return self.read("transactions.txt").get(transaction_id)
+
+    def properties_owned_by(self, owner_id : str) -> dict:
+        # The owner of a property is the buyer of the latest transaction in its history
+        transactions = self.read("transactions.txt")
+        return {property_id : details for property_id, details in self.read("properties.txt").items()
+                if len(details["history"]) != 0 and transactions.get(details["history"][0], {}).get("buyer_id") == owner_id}
+
+    def transactions_of(self, client_id : str) -> dict:
+        transactions = self.read("transactions.txt")
+        return {transaction_id : details for transaction_id, details in transactions.items()
+                if client_id in (details["buyer_id"], details["seller_id"])}
+
+    def all_properties(self) -> dict:
+        return self.read("properties.txt")
+
+    def all_transactions(self) -> dict:
+        return self.read("transactions.txt")
+
+    def load_peers(self) -> dict:
+        if not os.path.exists(os.path.join(self.directory, "peer_list.txt")):
+            return None
+        return self.read("peer_list.txt")
+
+    def load_versions(self) -> dict:
+        return self.read("peer_versions.txt")
+
+    def save_peers(self, peer_list : dict, versions : dict = None) -> None:
+        self.write("peer_list.txt", peer_list)
+        if versions is not None:
+            self.write("peer_versions.txt", versions)
+
+    def commit_block(self, transactions : dict, properties : dict) -> None:
+        self.write("transactions.txt", self.read("transactions.txt") | transactions)
+        self.write("properties.txt", self.read("properties.txt") | properties)
+
+    def replace_all(self, transactions : dict, properties : dict) -> None:
+        self.write("transactions.txt", transactions)
+        self.write("properties.txt", properties)
+
+    def revert_block(self, transaction_ids : list, properties : dict, removed : list) -> None:
+        transactions = self.read("transactions.txt")
+        for transaction_id in transaction_ids:
+            transactions.pop(transaction_id, None)
+
+        stored = self.read("properties.txt") | properties
+        for property_id in removed:
+            stored.pop(property_id, None)
+
+        self.write("transactions.txt", transactions)
+        self.write("properties.txt", stored)
+
+class SqliteStateStore(StateStore):
+    """This class stores the state in an indexed SQLite database"""
+
+    def __init__(self, path : str = "./data/state.db") -> None:
+        """Initializes the store, creating the tables and indexes if required"""
+        self.lock = threading.Lock()
+
+        # The connection is shared between the reactor thread and the minting thread
+        self.connection = sqlite3.connect(path, check_same_thread = False, isolation_level = None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS properties (
+                id TEXT PRIMARY KEY,
+                owner TEXT,
+                details TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS transactions (
+                id TEXT PRIMARY KEY,
+                buyer TEXT NOT NULL,
+                seller TEXT NOT NULL,
+                property_id TEXT NOT NULL,
+                details TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS peers (
+                id TEXT PRIMARY KEY,
+                details TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS properties_owner ON properties(owner);
+            CREATE INDEX IF NOT EXISTS transactions_buyer ON transactions(buyer);
+            CREATE INDEX IF NOT EXISTS transactions_seller ON transactions(seller);
+            CREATE INDEX IF NOT EXISTS transactions_property ON transactions(property_id);
+        """)
+
+    def query(self, statement : str, parameters : tuple = ()) -> list:
+        """Function to run a read query"""
+        with self.lock:
+            return self.connection.execute(statement, parameters).fetchall()
+
+    def get_property(self, property_id : str) -> dict:
+        rows = self.query("SELECT details FROM properties WHERE id = ?", (property_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_transaction(self, transaction_id : str) -> dict:
+        rows = self.query("SELECT details FROM transactions WHERE id = ?", (transaction_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def properties_owned_by(self, owner_id : str) -> dict:
+        rows = self.query("SELECT id, details FROM properties WHERE owner = ?", (owner_id,))
+        return {property_id : json.loads(details) for property_id, details in rows}
+
+    def transactions_of(self, client_id : str) -> dict:
+        rows = self.query("SELECT id, details FROM transactions WHERE buyer = ? UNION "
+                          "SELECT id, details FROM transactions WHERE seller = ?", (client_id, client_id))
+        return {transaction_id : json.loads(details) for transaction_id, details in rows}
+
+    def all_properties(self) -> dict:
+        rows = self.query("SELECT id, details FROM properties")
+        return {property_id : json.loads(details) for property_id, details in rows}
+
+    def all_transactions(self) -> dict:
+        rows = self.query("SELECT id, details FROM transactions")
+        return {transaction_id : json.loads(details) for transaction_id, details in rows}
+
+    def load_peers(self) -> dict:
+        if not self.query("SELECT value FROM meta WHERE key = 'peers_saved'"):
+            return None
+
+        rows = self.query("SELECT id, details FROM peers")
+        return {peer_id : json.loads(details) for peer_id, details in rows}
+
+    def load_versions(self) -> dict:
+        rows = self.query("SELECT value FROM meta WHERE key = 'peer_versions'")
+        return json.loads(rows[0][0]) if rows else {}
+
+    def write_peers(self, peer_list : dict, versions : dict = None) -> None:
+        """Function to replace the peers table, must be called inside a transaction"""
+        self.connection.execute("DELETE FROM peers")
+        self.connection.executemany("INSERT INTO peers VALUES (?, ?)",
+                                    [(peer_id, json.dumps(details)) for peer_id, details in peer_list.items()])
+        self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('peers_saved', '1')")
+        if versions is not None:
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('peer_versions', ?)", (json.dumps(versions),))
+
+    def write_transactions(self, transactions : dict) -> None:
+        """Function to insert transactions, must be called inside a transaction"""
+        self.connection.executemany("INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?)",
+                                    [(transaction_id, details["buyer_id"], details["seller_id"], details["property_id"], json.dumps(details))
+                                     for transaction_id, details in transactions.items()])
+
+    def write_properties(self, properties : dict, owners : dict) -> None:
+        """Function to insert properties, must be called inside a transaction"""
+        self.connection.executemany("INSERT OR REPLACE INTO properties VALUES (?, ?, ?)",
+                                    [(property_id, owners.get(property_id), json.dumps(details))
+                                     for property_id, details in properties.items()])
+
+    def save_peers(self, peer_list : dict, versions : dict = None) -> None:
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.write_peers(peer_list, versions)
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def commit_block(self, transactions : dict, properties : dict) -> None:
+        owners = {details["property_id"] : details["buyer_id"] for details in transactions.values()}
+
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.write_transactions(transactions)
+                self.write_properties(properties, owners)
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def replace_all(self, transactions : dict, properties : dict) -> None:
+        # The owner of a property is the buyer of the latest transaction in its history
+        owners = {}
+        for property_id, details in properties.items():
+            if len(details["history"]) != 0 and details["history"][0] in transactions:
+                owners[property_id] = transactions[details["history"][0]]["buyer_id"]
+
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.connection.execute("DELETE FROM transactions")
+                self.connection.execute("DELETE FROM properties")
+                self.write_transactions(transactions)
+                self.write_properties(properties, owners)
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def revert_block(self, transaction_ids : list, properties : dict, removed : list) -> None:
+        # The owner of a restored property is the buyer of the latest transaction left in its history
+        owners = {}
+        for property_id, details in properties.items():
+            latest = self.get_transaction(details["history"][0]) if len(details["history"]) != 0 else None
+            if latest is not None:
+                owners[property_id] = latest["buyer_id"]
+
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.connection.executemany("DELETE FROM transactions WHERE id = ?", [(transaction_id,) for transaction_id in transaction_ids])
+                self.connection.executemany("DELETE FROM properties WHERE id = ?", [(property_id,) for property_id in removed])
+                self.write_properties(properties, owners)
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+def open_state_store(backend : str = STATE_BACKEND, directory : str = "./data") -> StateStore:
+    """Function to open the state store of the given backend"""
+    if backend == "sqlite":
+        return SqliteStateStore(os.path.join(directory, "state.db"))
+    elif backend == "json":
+        return JsonStateStore(directory)
+
+    raise ValueError("Unknown state backend: " + backend)
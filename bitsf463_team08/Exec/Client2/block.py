@@ -2,12 +2,19 @@ from datetime import datetime
 import os
 import hashlib
 import json
-from twisted.internet import reactor
+import threading
+from collections import OrderedDict, deque
 
-from pymerkle import MerkleTree
+from block_log import BlockLog
 
 """This file contains the implementation of the classes for handling Blocks and the Blockchain"""
 
+# Number of decoded blocks kept in memory by default
+BLOCK_CACHE_SIZE = 1024
+
+# Maximum number of blocks sent in reply to a single request for missing blocks
+BLOCKS_PER_MESSAGE = 16
+
 class Block:
     """This class defines the structure of a block"""
     def __init__(self, prev_hash : str, transactions : list) -> None:
@@ -16,8 +23,10 @@ class Block:
         # Add the current system time to the block
         timestamp = str(datetime.now())
 
-        # Generate the merkle root for all the transactions in the block
-        merkle_root = self.get_root(transactions.copy())
+        # Generate the merkle tree for all the transactions in the block
+        self.levels = None
+        self.positions = None
+        merkle_root = self.get_root(transactions)
 
         # Store the details associated with the block
         self.details = {
@@ -34,9 +43,58 @@ class Block:
     def get_hash(self) -> str:
         """Function to calculate the SHA256 hash of the block header"""
 
-        return hashlib.sha256((self.details["header"]["prev_hash"] + 
-        self.details["header"]["timestamp"] + 
-        self.details["header"]["merkle_root"]).encode()).hexdigest()
+        return Block.hash_header(self.details["header"])
+
+    @staticmethod
+    def hash_header(header : dict) -> str:
+        """Function to calculate the SHA256 hash of a block header without the block body"""
+
+        return hashlib.sha256((header["prev_hash"] + 
+        header["timestamp"] + 
+        header["merkle_root"]).encode()).hexdigest()
+
+    @classmethod
+    def from_details(cls, details : dict) -> "Block":
+        """Function to create a block object from the stored details of a block"""
+        block = cls.__new__(cls)
+        block.details = details
+        block.levels = None
+        block.positions = None
+        return block
+
+    @staticmethod
+    def is_valid(block_hash : str, details : dict) -> bool:
+        """Function to check that received block details match the block hash and the merkle root"""
+        block = Block.from_details(details)
+        try:
+            return (block.get_hash() == block_hash and
+                    block.get_root(details["body"]["transactions"]) == details["header"]["merkle_root"])
+        except (KeyError, TypeError):
+            return False
+
+    @staticmethod
+    def hash_pair(left : str, right : str) -> str:
+        """Function to hash two nodes of the merkle tree"""
+        return hashlib.sha256((left + right).encode()).hexdigest()
+
+    def get_levels(self, transactions : list = None) -> list:
+        """Function to build the levels of the merkle tree once and cache them, leaves first"""
+        if self.levels is not None:
+            return self.levels
+
+        if transactions is None:
+            transactions = self.details["body"]["transactions"]
+
+        # Keep hashing pairwise till only 1 value is remaining
+        # If the number of nodes on a level is odd, the last node is paired with itself
+        level = list(transactions)
+        self.levels = [level]
+        while len(level) > 1:
+            level = [self.hash_pair(level[i], level[i + 1] if i + 1 < len(level) else level[i])
+                     for i in range(0, len(level), 2)]
+            self.levels.append(level)
+
+        return self.levels
 
     def get_root(self, transactions : list) -> str:
         """Function to calculate the merkle root of the transactions"""
@@ -45,164 +103,478 @@ class Block:
         if len(transactions) == 0:
             return "None"
 
-        # Keep hashing till only 1 value is remaining
-        while len(transactions) != 1:
-            # If number of leaf nodes is odd, make it even
-            if len(transactions) % 2 != 0:
-                transactions.append(transactions[-1])
-
-            processed = []
-            string = ""
-            
-            # Hash pairwise
-            for id in transactions:
-                if string == "":
-                    string += id
-                    continue
-                string += id
-                processed.append(hashlib.sha256(string.encode()).hexdigest())
-                string = ""
-            transactions = processed.copy()
+        return self.get_levels(transactions)[-1][0]
+
+    def inclusion_proof(self, tx_id : str) -> list:
+        """Function to get the sibling hashes proving that a transaction is part of the block, None if it is not"""
+        levels = self.get_levels()
+
+        if self.positions is None:
+            self.positions = {transaction_id : index for index, transaction_id in enumerate(levels[0])}
+
+        index = self.positions.get(tx_id)
+        if index is None:
+            return None
+
+        # Each step stores the sibling and whether it is on the left or the right
+        proof = []
+        for level in levels[:-1]:
+            if index % 2 == 0:
+                sibling = level[index + 1] if index + 1 < len(level) else level[index]
+                proof.append([sibling, "right"])
+            else:
+                proof.append([level[index - 1], "left"])
+            index //= 2
+
+        return proof
 
-        return transactions[0]
+    @staticmethod
+    def verify_inclusion(root : str, tx_id : str, proof : list) -> bool:
+        """Function to check an inclusion proof against the merkle root of a block"""
+        if proof is None:
+            return False
+
+        node = tx_id
+        for sibling, side in proof:
+            if side == "left":
+                node = Block.hash_pair(sibling, node)
+            else:
+                node = Block.hash_pair(node, sibling)
+
+        return node == root
 
 class BlockChain:
     """This class defines the structure of the blockchain"""
 
-    def __init__(self) -> None:
+    def __init__(self, cache_size : int = BLOCK_CACHE_SIZE) -> None:
         """Initializes the blockchain object"""
 
+        # Only the block index is kept in memory, block bodies are read on demand through an LRU cache
+        self.log = BlockLog()
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_lock = threading.Lock()
+
+        # Guards the head against the minting thread and the reactor thread updating it together
+        self.lock = threading.RLock()
+
+        # Height of every stored block, the head is always on the highest branch
+        self.heights = {}
+        self.load_heights()
+
+        # Blocks on the chain whose transactions are not committed to the state yet, oldest first
+        self.unapplied = deque()
+        self.reorgs = 0
+
+        # Import the chain from the older single file format if required
+        if len(self.log) == 0 and os.path.exists("./data/block_list.txt"):
+            with open("./data/block_list.txt", 'r') as f:
+                block_list = json.loads(f.read())
+
+            with open("./data/blockchain.txt", 'r') as f:
+                head = f.read()
+
+            self.update_chain(block_list, head)
+
         # Check if data of a blockchain already exists
         # Else create a new blockchain instance
-        if os.path.exists("./data/blockchain.txt"):
+        if len(self.log) != 0 and os.path.exists("./data/blockchain.txt"):
             with open("./data/blockchain.txt", 'r') as f:
                 self.head = f.read()
-
-            with open("./data/block_list.txt", 'r') as f:
-                self.block_list = json.loads(f.read())
         else:
+            self.log.reset()
+            self.heights = {}
             genesis_block = Block("", [])
             self.head = genesis_block.get_hash()
 
+            self.store(self.head, genesis_block.details)
+
             with open("./data/blockchain.txt", 'w') as f:
                 f.write(self.head)
 
-            self.block_list = {}
-            self.block_list[genesis_block.get_hash()] = genesis_block.details
+    def load_heights(self) -> None:
+        """Function to work out the height of every stored block from the index, in which parents come before their children"""
+        self.heights = {}
+        for block_hash in list(self.log.index):
+            prev_hash = self.log.parent(block_hash)
+            self.heights[block_hash] = self.heights.get(prev_hash, -1) + 1
+
+    def store(self, block_hash : str, details : dict) -> None:
+        """Function to append a block whose parent is stored, or the genesis block, to the log"""
+        self.log.append(block_hash, details)
+        self.heights[block_hash] = self.heights.get(details["header"]["prev_hash"], -1) + 1
+
+    def height(self, block_hash : str) -> int:
+        """Function to get the number of blocks before a stored block, None if it is not stored"""
+        return self.heights.get(block_hash)
+
+    def get_block(self, block_hash : str) -> dict:
+        """Function to get the details of a block from its hash, reading it from disk on a cache miss"""
+        with self.cache_lock:
+            if block_hash in self.cache:
+                self.cache_hits += 1
+                self.cache.move_to_end(block_hash)
+                return self.cache[block_hash]
+            self.cache_misses += 1
+
+        details = self.log.read(block_hash)
+        if details is not None:
+            self.cache_block(block_hash, details)
+
+        return details
+
+    def cache_block(self, block_hash : str, details : dict) -> None:
+        """Function to add a decoded block to the cache, evicting the least recently used one if full"""
+        with self.cache_lock:
+            self.cache[block_hash] = details
+            self.cache.move_to_end(block_hash)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last = False)
+
+    def get_parent(self, block_hash : str) -> str:
+        """Function to get the hash of the previous block without loading the block"""
+        return self.log.parent(block_hash)
+
+    def export_blocks(self) -> dict:
+        """Function to get every block of the chain as a dictionary"""
+        return {block_hash : details for block_hash, details in self.log.items()}
+
+    def set_head(self, head : str) -> None:
+        """Function to update the head of the blockchain"""
+        self.head = head
 
-            with open("./data/block_list.txt", 'w') as f:
-                f.write(json.dumps(self.block_list))
+        with open("./data/blockchain.txt", 'w') as f:
+            f.write(self.head)
 
-    def transfer_data(self, client, data : bytes, addr : tuple) -> None:
-        """Thread-safe method to send data to peers over UDP protocol"""
-        client.transport.write(data, addr)
+    def update_chain(self, block_list : dict, head : str, verify = None) -> bool:
+        """Function to append the blocks of a received chain that are not yet stored locally, returning whether it was taken
+
+        Given verify, a function of the details of a block and of its parent, every appended block must pass it
+        """
+
+        # Walk back from the received head till a block we already have is found
+        missing = []
+        top = head
+        while top != "" and top not in self.log:
+            if top not in block_list or not Block.is_valid(top, block_list[top]):
+                print("Received chain is incomplete!\n")
+                return False
+            missing.append(top)
+            top = block_list[top]["header"]["prev_hash"]
+
+        if verify is not None:
+            for block_hash in reversed(missing):
+                prev_hash = block_list[block_hash]["header"]["prev_hash"]
+                parent = block_list[prev_hash] if prev_hash in block_list else self.get_block(prev_hash)
+                if not verify(block_list[block_hash], parent):
+                    print("Received chain has a block without a valid proof!\n")
+                    return False
+
+        with self.lock:
+            # The received chain shares no block with ours, so it replaces it
+            if top == "":
+                self.log.reset()
+                self.heights = {}
+                with self.cache_lock:
+                    self.cache.clear()
+
+            for block_hash in reversed(missing):
+                self.store(block_hash, block_list[block_hash])
+
+            # The state received along with the chain already includes every block
+            self.set_head(head)
+            self.unapplied.clear()
+
+        return True
+
+    def receive_block(self, block_hash : str, details : dict, client = None) -> str:
+        """Function to validate a block announced by a peer and append it if it extends the head
+
+        Given a client, the block is queued for its transactions to be committed, and the chain switches
+        to the branch of a block that makes it the highest. Without one the caller commits the transactions
+        """
+
+        # Returns "added", "reorg" (head moved to another branch), "known", "stale" (parent is not the head),
+        # "orphan" (parent is unknown) or "invalid"
+        if block_hash in self.log:
+            return "known"
+
+        if not Block.is_valid(block_hash, details):
+            return "invalid"
+
+        prev_hash = details["header"]["prev_hash"]
+        if prev_hash not in self.log:
+            return "orphan"
+
+        with self.lock:
+            if prev_hash != self.head:
+                # Keep the block so that its children can be linked, and switch to its branch once it is the highest
+                self.store(block_hash, details)
+                if client is not None and self.reorganize(block_hash, client):
+                    return "reorg"
+                return "stale"
+
+            self.store(block_hash, details)
+            self.cache_block(block_hash, details)
+            self.set_head(block_hash)
+            if client is not None:
+                self.unapplied.append(block_hash)
+
+        return "added"
+
+    def branches(self, head : str, tip : str) -> tuple:
+        """Function to get, newest first, the blocks only on the branch of head and the blocks only on the branch of tip"""
+        leaving = []
+        joining = []
+        while self.heights[tip] > self.heights[head]:
+            joining.append(tip)
+            tip = self.get_parent(tip)
+        while self.heights[head] > self.heights[tip]:
+            leaving.append(head)
+            head = self.get_parent(head)
+
+        # Chains that share no block meet past their genesis blocks
+        while head != tip:
+            leaving.append(head)
+            joining.append(tip)
+            head = self.get_parent(head)
+            tip = self.get_parent(tip)
+
+        return leaving, joining
+
+    def reorganize(self, tip : str, client) -> bool:
+        """Function to switch the head to a stored block if its branch is higher, reverting the state of the blocks leaving the chain"""
+        with self.lock:
+            if self.heights.get(tip, -1) <= self.heights[self.head]:
+                return False
+
+            leaving, joining = self.branches(self.head, tip)
+
+            # Blocks still waiting for their transactions were never committed, the others are undone newest first
+            for block_hash in leaving:
+                if block_hash in self.unapplied:
+                    self.unapplied.remove(block_hash)
+                else:
+                    self.revert_block(block_hash, client)
+
+            self.set_head(tip)
+            self.unapplied.extend(reversed(joining))
+
+        # Blocks that only extend the head are not a reorganization
+        if len(leaving) != 0:
+            self.reorgs += 1
+            print("Switched to a higher branch, %d blocks left the chain and %d joined it" % (len(leaving), len(joining)))
+        return True
+
+    def revert_block(self, block_hash : str, client) -> None:
+        """Function to undo the state changes of a block leaving the chain, its transactions become pending again"""
+        state = client.state
+        transactions = {}
+        properties = {}
+        created = {}
+        for transaction_id in reversed(self.get_block(block_hash)["body"]["transactions"]):
+            details = state.get_transaction(transaction_id)
+            if details is None:
+                continue
+            transactions[transaction_id] = details
 
+            property_id = details["property_id"]
+            if property_id not in properties:
+                properties[property_id] = state.get_property(property_id)
+            if properties[property_id] is None:
+                continue
 
-    def add_block(self, new_block : Block) -> None:
-        """Function to add a new block into the blockchain"""
-        self.head = new_block.get_hash()
+            if transaction_id in properties[property_id]["history"]:
+                properties[property_id]["history"].remove(transaction_id)
+            if details["seller_id"] == "NA":
+                created[property_id] = {"address" : properties[property_id]["address"], "history" : []}
+
+        # Properties created by the block no longer exist till a block creates them again
+        removed = list(created)
+        properties = {property_id : details for property_id, details in properties.items()
+                      if details is not None and property_id not in created}
+
+        state.revert_block(list(transactions), properties, removed)
+        client.mempool.merge(transactions, created)
+
+    def apply_blocks(self, client) -> tuple:
+        """Function to commit the transactions of the queued blocks in order, stopping at the first block whose transactions are not all known
+
+        Returns the hash of that block and the IDs of its missing transactions, or None and an empty list once the queue is empty
+        """
+        state = client.state
+        while len(self.unapplied) != 0:
+            block_hash = self.unapplied[0]
+            transactions, properties = client.mempool.snapshot()
+
+            # Transactions already committed are part of the chain, the others must be pending along with the properties they create
+            pending = {}
+            missing = []
+            for transaction_id in self.get_block(block_hash)["body"]["transactions"]:
+                if state.get_transaction(transaction_id) is not None:
+                    continue
 
-        with open("./data/blockchain.txt", 'w') as f:
-            f.write(self.head)
+                details = transactions.get(transaction_id)
+                if details is None or (details["seller_id"] == "NA" and details["property_id"] not in properties):
+                    missing.append(transaction_id)
+                else:
+                    pending[transaction_id] = details
+
+            if len(missing) != 0:
+                return block_hash, missing
+
+            # The block is part of the chain whatever it holds, but sales of properties that do not exist change nothing
+            included, created, _, _ = self.committable(pending, properties, state)
+            self.commit_transactions(included, created, state)
+            client.mempool.remove(list(included), list(created))
+            self.unapplied.popleft()
+
+        return None, []
+
+    def committable(self, transactions : dict, properties : dict, state) -> tuple:
+        """Function to split transactions, in order, into the ones that can be committed along with copies of the properties they create,
+        the sales of properties still being created by pending transactions, and the sales of properties that do not exist"""
+        included = {}
+        created = {}
+        waiting = []
+        invalid = []
+        for transaction_id, details in transactions.items():
+            property_id = details["property_id"]
+            if details["seller_id"] == "NA":
+                if property_id not in properties:
+                    invalid.append(transaction_id)
+                    continue
 
-        self.block_list[new_block.get_hash()] = new_block.details
+                # The history of a created property is filled in by the commit, which must not touch the pending copy
+                created[property_id] = dict(properties[property_id], history = list(properties[property_id]["history"]))
+                included[transaction_id] = details
+            elif property_id in created or state.get_property(property_id) is not None:
+                included[transaction_id] = details
+            elif property_id in properties:
+                waiting.append(transaction_id)
+            else:
+                invalid.append(transaction_id)
 
-        with open("./data/block_list.txt", 'w') as f:
-            f.write(json.dumps(self.block_list))
+        return included, created, waiting, invalid
 
-        print("Minting Complete!\n")
+    def blocks_after(self, known_hash : str, tip_hash : str, limit : int = BLOCKS_PER_MESSAGE) -> list:
+        """Function to get, oldest first, up to limit blocks on the path from known_hash to tip_hash"""
 
-    def mint_block(self, peer_list : dict, client) -> None:
-        """Function to mint a new block and propagate it across the network"""
+        return [[block_hash, self.get_block(block_hash)] for block_hash in self.path_after(known_hash, tip_hash)[:limit]]
 
-        # Load the data of the new transactions
-        new_transactions = {}
-        with open("./data/temp_transactions.txt", 'r') as f:
-            new_transactions = json.loads(f.read())
+    def path_after(self, known_hash : str, tip_hash : str) -> list:
+        """Function to get, oldest first, the hashes of the blocks after known_hash up to tip_hash"""
 
-        new_properties = {}
-        with open("./data/temp_properties.txt", 'r') as f:
-            new_properties = json.loads(f.read())
+        if tip_hash not in self.log:
+            return []
 
-        if os.path.exists("./data/properties.txt"):
-            with open("./data/properties.txt", 'r') as f:
-                existing_properties = json.loads(f.read())
-        else:
-            existing_properties = {}
+        # A stored known_hash on another branch gives the path from the block both branches share
+        if known_hash in self.log:
+            _, joining = self.branches(known_hash, tip_hash)
+            joining.reverse()
+            return joining
 
-        if os.path.exists("./data/transactions.txt"):
-            with open("./data/transactions.txt", 'r') as f:
-                existing_transactions = json.loads(f.read())
-        else:
-            existing_transactions = {}
+        # Otherwise the path starts at the genesis block
+        path = []
+        top = tip_hash
+        while top != "" and top != known_hash:
+            path.append(top)
+            top = self.get_parent(top)
 
-        # Create the new block to be added
-        new_block = Block(self.head, [id for id in new_transactions])
+        path.reverse()
+        return path
+
+    def add_blocks(self, blocks : list, client) -> bool:
+        """Function to store a range of blocks, oldest first, received from a peer, switching to their branch if it is higher"""
+        stored = None
+        with self.lock:
+            for block_hash, details in blocks:
+                if block_hash in self.log:
+                    continue
+                if (details["header"]["prev_hash"] not in self.log or not Block.is_valid(block_hash, details) or
+                        not client.poet.verify_block(details)):
+                    break
+                self.store(block_hash, details)
+                stored = block_hash
+
+            return stored is not None and self.reorganize(stored, client)
+
+    def add_block(self, new_block : Block) -> bool:
+        """Function to add a new block into the blockchain, False if the head moved since it was created"""
+        with self.lock:
+            # Check to see if new block was received
+            if self.head != new_block.details["header"]["prev_hash"]:
+                print("Minting Stopped!\n")
+                return False
 
-        # Process the transactions
+            self.store(new_block.get_hash(), new_block.details)
+            self.cache_block(new_block.get_hash(), new_block.details)
+
+            self.set_head(new_block.get_hash())
+
+        print("Minting Complete!\n")
+        return True
+
+    def commit_transactions(self, new_transactions : dict, new_properties : dict, state) -> None:
+        """Function to apply the transactions of a block to the properties and completed transactions"""
+
+        # Process the transactions, looking up only the properties they modify
+        modified_properties = new_properties.copy()
         for transaction_id in new_transactions:
+            property_id = new_transactions[transaction_id]["property_id"]
             if new_transactions[transaction_id]["seller_id"] == "NA":
-                peer_list[new_transactions[transaction_id]["buyer_id"]]["properties"].append(new_transactions[transaction_id]["property_id"])
-                new_properties[new_transactions[transaction_id]["property_id"]]["history"].insert(0, transaction_id)
+                modified_properties[property_id]["history"].insert(0, transaction_id)
             else:
-                peer_list[new_transactions[transaction_id]["buyer_id"]]["properties"].append(new_transactions[transaction_id]["property_id"])
-                peer_list[new_transactions[transaction_id]["seller_id"]]["properties"].remove(new_transactions[transaction_id]["property_id"])
-                existing_properties[new_transactions[transaction_id]["property_id"]]["history"].insert(0, transaction_id)
-               
-
-        # Merge the previously completed and currently completed transactions
-        existing_transactions = existing_transactions | new_transactions
-        existing_properties = existing_properties | new_properties
-
-        new_transactions = {}
-        new_properties = {}
-
-        # Check to see if new block was received
-        with open("./data/blockchain.txt", 'r') as f:
-            self.head = f.read()
-
-        with open("./data/block_list.txt", 'r') as f:
-            self.block_list = json.loads(f.read())
-
-        # Storing all the modified data
-
-        with open("./data/temp_transactions.txt", 'w') as f:
-            f.write(json.dumps(new_transactions))
-        
-        with open("./data/temp_properties.txt", 'w') as f:
-            f.write(json.dumps(new_properties))
-
-        with open("./data/properties.txt", 'w') as f:
-            f.write(json.dumps(existing_properties))
-        
-        with open("./data/transactions.txt", 'w') as f:
-            f.write(json.dumps(existing_transactions))
-
-        with open("./data/peer_list.txt", 'w') as f:
-            f.write(json.dumps(peer_list))
-
-        # Check to see if new block was received
-        if self.head != new_block.details["header"]["prev_hash"]:
-            print("Minting Stopped!\n")
-            return
-        
-        # Add minted block to chain
-        self.add_block(new_block)
+                if property_id not in modified_properties:
+                    modified_properties[property_id] = state.get_property(property_id)
+                modified_properties[property_id]["history"].insert(0, transaction_id)
+
+        # Store the completed transactions and modified properties in one atomic update, the owners follow from them
+        state.commit_block(new_transactions, modified_properties)
+
+    def mint_block(self, client, tip : str = None, proof : dict = None) -> str:
+        """Function to mint a new block on the given head and propagate it across the network, returning its hash or None if none was minted"""
+
+        # The wait of the proof was drawn for the head it started on, a block received meanwhile makes it worthless,
+        # and the state must be committed up to the head before building on it
+        if (tip is not None and self.head != tip) or len(self.unapplied) != 0:
+            return None
+
+        # Choose the transactions of the block with the block policy, leaving them pending till they are committed
+        if len(client.mempool) == 0:
+            return None
+        chosen, _ = client.policy.select(client.mempool)
+        transactions, properties = client.mempool.snapshot()
+        new_transactions, new_properties, _, invalid = self.committable(
+            {transaction_id : transactions[transaction_id] for transaction_id in chosen}, properties, client.state)
+
+        # Sales of properties that do not exist never become valid, the ones waiting for a pending property stay pending
+        if len(invalid) != 0:
+            print("Dropped %d pending transactions involving unknown properties" % len(invalid))
+            client.mempool.remove(invalid)
+        if len(new_transactions) == 0:
+            return None
 
-        # Send the new block to the peers
-        data = {
-            "tag" : "new_block",
-            "data" : [self.block_list, self.head]
-        }
+        # Create the new block to be added
+        new_block = Block(self.head, [id for id in new_transactions])
 
-        data = json.dumps(data)
-        data = data.encode("utf-8")
-        
-        for peer in peer_list:
-            if peer == client.id:
-                continue
+        # Announce the wait of the Proof of Elapsed Time outside the header, so that the block hash does not change
+        if proof is not None:
+            new_block.details["poet"] = proof
+
+        self.commit_transactions(new_transactions, new_properties, client.state)
+        client.mempool.take(list(new_transactions))
+        client.policy.record(len(new_transactions), len(client.mempool))
+
+        # Add minted block to chain
+        if not self.add_block(new_block):
+            return None
 
-            reactor.callFromThread(self.transfer_data, client, data, ("127.0.0.1", peer_list[peer]["port_no"]))
+        # Gossip only the new block to the peers
+        client.gossip.publish("new_block", [new_block.get_hash(), new_block.details])
+        return new_block.get_hash()
 
 if __name__ == "__main__":
     chain = BlockChain()
\ No newline at end of file
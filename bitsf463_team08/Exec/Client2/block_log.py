@@ -0,0 +1,129 @@
+import os
+import json
+import struct
+import threading
+
+"""This file contains the implementation of the append-only block log used to persist the blockchain"""
+
+# Each index entry stores the raw 32 byte block hash, the segment number, the offset and the length of the record
+# followed by the raw hash of the previous block (all zeroes for the genesis block)
+INDEX_ENTRY = struct.Struct(">32sIQI32s")
+NO_PARENT = bytes(32)
+
+class BlockLog:
+    """This class stores blocks in append-only segment files along with a hash -> offset index"""
+
+    def __init__(self, directory : str = "./data/blocks", segment_size : int = 16 * 1024 * 1024) -> None:
+        """Initializes the block log, creating the directory if it does not exist"""
+        self.directory = directory
+        self.segment_size = segment_size
+        self.index_path = os.path.join(directory, "index.bin")
+        self.lock = threading.Lock()
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # Maps a block hash to (segment, offset, length, previous hash), kept in insertion order
+        self.index = {}
+        self.segment = 0
+        self.load_index()
+
+    def segment_path(self, segment : int) -> str:
+        """Function to get the path of a segment file"""
+        return os.path.join(self.directory, "segment_%05d.log" % segment)
+
+    def load_index(self) -> None:
+        """Function to load the index file into memory, discarding any entry not fully written"""
+        self.index = {}
+        self.segment = 0
+
+        if not os.path.exists(self.index_path):
+            open(self.index_path, 'wb').close()
+            return
+
+        with open(self.index_path, 'rb') as f:
+            raw = f.read()
+
+        valid = 0
+        sizes = {}
+        for offset in range(0, len(raw) - INDEX_ENTRY.size + 1, INDEX_ENTRY.size):
+            block_hash, segment, position, length, prev_hash = INDEX_ENTRY.unpack_from(raw, offset)
+
+            if segment not in sizes:
+                path = self.segment_path(segment)
+                sizes[segment] = os.path.getsize(path) if os.path.exists(path) else 0
+
+            # The record was not completely written before a crash
+            if position + length > sizes[segment]:
+                break
+
+            self.index[block_hash.hex()] = (segment, position, length, "" if prev_hash == NO_PARENT else prev_hash.hex())
+            self.segment = segment
+            valid = offset + INDEX_ENTRY.size
+
+        # Drop the torn tail of the index so that future appends stay aligned
+        if valid != len(raw):
+            with open(self.index_path, 'r+b') as f:
+                f.truncate(valid)
+
+    def append(self, block_hash : str, details : dict) -> None:
+        """Function to append a block to the log, O(1) in the length of the chain"""
+        record = (json.dumps(details) + "\n").encode("utf-8")
+        prev_hash = details["header"]["prev_hash"]
+
+        with self.lock:
+            if block_hash in self.index:
+                return
+
+            path = self.segment_path(self.segment)
+            if os.path.exists(path) and os.path.getsize(path) + len(record) > self.segment_size:
+                self.segment += 1
+                path = self.segment_path(self.segment)
+
+            with open(path, 'ab') as f:
+                position = f.tell()
+                f.write(record)
+
+            with open(self.index_path, 'ab') as f:
+                f.write(INDEX_ENTRY.pack(bytes.fromhex(block_hash), self.segment, position, len(record),
+                                         bytes.fromhex(prev_hash) if prev_hash != "" else NO_PARENT))
+
+            self.index[block_hash] = (self.segment, position, len(record), prev_hash)
+
+    def read(self, block_hash : str) -> dict:
+        """Function to read a single block from the log by seeking to its offset"""
+        location = self.index.get(block_hash)
+        if location is None:
+            return None
+
+        segment, position, length, _ = location
+        with open(self.segment_path(segment), 'rb') as f:
+            f.seek(position)
+            return json.loads(f.read(length))
+
+    def parent(self, block_hash : str) -> str:
+        """Function to get the hash of the previous block without reading the block itself"""
+        location = self.index.get(block_hash)
+        return None if location is None else location[3]
+
+    def items(self):
+        """Generator over all (hash, block) pairs in the order they were appended"""
+        for block_hash in list(self.index):
+            yield block_hash, self.read(block_hash)
+
+    def reset(self) -> None:
+        """Function to delete all blocks from the log"""
+        with self.lock:
+            for segment in range(self.segment + 1):
+                if os.path.exists(self.segment_path(segment)):
+                    os.remove(self.segment_path(segment))
+
+            open(self.index_path, 'wb').close()
+            self.index = {}
+            self.segment = 0
+
+    def __contains__(self, block_hash : str) -> bool:
+        return block_hash in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
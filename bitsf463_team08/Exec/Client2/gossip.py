@@ -0,0 +1,83 @@
+import hashlib
+import math
+import random
+
+from twisted.internet import reactor
+
+from endpoint import peer_endpoint
+from wire import MESSAGE_TYPES, TAGS, encode_message
+
+"""This file contains the implementation of the epidemic gossip overlay used to broadcast messages to every peer"""
+
+# Peers every message is pushed to, None for log2 of the number of peers but at least MIN_FANOUT
+GOSSIP_FANOUT = None
+MIN_FANOUT = 3
+
+# Largest number of hops a message is relayed over
+GOSSIP_TTL = 8
+
+def message_key(payload) -> bytes:
+    """Function to read the ID of a gossiped message from its payload without decoding it"""
+
+    # encode_message writes the payload compactly, so it always starts with ["<16 hex digits>"
+    return bytes(payload[2:18])
+
+class Gossip:
+    """This class pushes messages to a few random peers, each of which relays them once to a few more"""
+
+    def __init__(self, client, fanout : int = GOSSIP_FANOUT, ttl : int = GOSSIP_TTL) -> None:
+        """Initializes the gossip overlay of a client"""
+        self.client = client
+        self.fanout = fanout
+        self.ttl = ttl
+
+        self.published = 0
+        self.relayed = 0
+
+    def peers(self) -> list:
+        """Function to get the address of every peer not known to be dead"""
+        peer_list = self.client.peer_list
+        return [peer_endpoint(peer_list[peer]) for peer in list(peer_list) if peer != self.client.id and self.client.monitor.is_alive(peer)]
+
+    def targets(self, exclude : tuple = None) -> list:
+        """Function to pick the random peers a message is pushed to"""
+        peers = [addr for addr in self.peers() if addr != exclude]
+        fanout = self.fanout
+        if fanout is None:
+            fanout = max(MIN_FANOUT, math.ceil(math.log2(len(peers) + 1)))
+
+        return random.sample(peers, min(fanout, len(peers)))
+
+    def publish(self, tag : str, data, ttl : int = None) -> None:
+        """Function to start gossiping a message in a thread-safe manner, ttl 1 pushes it to the chosen peers only"""
+        message_type = MESSAGE_TYPES[tag]
+        message_id = hashlib.sha256(encode_message(tag, data)).hexdigest()[:16]
+
+        reactor.callFromThread(self.start, message_id, self.ttl if ttl is None else ttl, message_type, data)
+
+    def start(self, message_id : str, ttl : int, message_type : int, data) -> None:
+        """Function to push a new message from the reactor thread"""
+
+        # Copies relayed back to us are dropped by the dedup cache
+        self.client.dedup.add(message_id.encode("ascii"))
+        self.published += 1
+        self.push(message_id, ttl, message_type, data)
+
+    def push(self, message_id : str, ttl : int, message_type : int, data, exclude : tuple = None) -> None:
+        """Function to send a message to the chosen peers over the reliable channel"""
+        message = encode_message("gossip", [message_id, ttl, message_type, data])
+        for addr in self.targets(exclude):
+            self.client.reliable.send(message, addr)
+
+    def receive(self, message_id : str, ttl : int, message_type : int, data, addr : tuple) -> None:
+        """Function to relay a message seen for the first time and hand it to its handler"""
+
+        # Messages seen before were already dropped by the dedup cache before being decoded
+        if TAGS.get(message_type, "gossip") == "gossip":
+            return
+
+        if ttl > 1:
+            self.relayed += 1
+            self.push(message_id, ttl - 1, message_type, data, addr)
+
+        self.client.deliver(message_type, data, addr)
@@ -0,0 +1,176 @@
+import time
+
+from endpoint import peer_endpoint
+from wire import encode_message
+
+"""This file contains the implementation of the versioned membership of the network, changed by deltas instead of full peer lists"""
+
+# Deltas kept from each origin to answer peers that missed some, peers missing older ones get the full membership
+MAX_DELTAS = 256
+
+# Number of deltas sent in one reply
+DELTAS_PER_MESSAGE = 64
+
+# Seconds before the deltas missing from an origin are requested again
+REQUEST_INTERVAL = 1.0
+
+# Kinds of change a delta makes to the peer list
+JOIN = "join"
+LEAVE = "leave"
+ENDPOINT = "endpoint"
+
+def entry(host : str, port : int) -> dict:
+    """Function to create the entry of a peer in the peer list"""
+    return {
+        "host" : host,
+        "port_no" : port
+    }
+
+class Membership:
+    """This class keeps the peer list in agreement with the peers, every peer numbering the deltas it creates"""
+
+    def __init__(self, client) -> None:
+        """Initializes the membership of a client"""
+        self.client = client
+
+        # Maps every origin to the number of its last applied delta, which together make up the membership version
+        self.versions = {}
+
+        # Recent deltas of every origin, and deltas received after a gap waiting for the missing ones
+        self.log = {}
+        self.pending = {}
+        self.requested = {}
+
+        self.gaps = 0
+
+    def version(self) -> int:
+        """Function to get the number of deltas the membership is made of"""
+        return sum(self.versions.values())
+
+    def send(self, tag : str, data, addr : tuple) -> None:
+        """Function to send a membership message, which may be fragmented when the peer list is large"""
+        self.client.send_reliable(encode_message(tag, data), addr)
+
+    def save(self) -> None:
+        """Function to store the peer list and its version without blocking the reactor"""
+        self.client.io.run(self.client.state.save_peers, dict(self.client.peer_list), dict(self.versions))
+
+    def load(self, peer_list : dict, versions : dict) -> dict:
+        """Function to restore the stored version, returning the stored peer list without the ownership older clients kept in it"""
+        self.versions = dict(versions)
+        return {peer_id : entry(*peer_endpoint(details)) for peer_id, details in peer_list.items()}
+
+    def publish(self, kind : str, peer_id : str, endpoint : tuple = None) -> None:
+        """Function to apply a change made by us and gossip it to the peers"""
+        origin = self.client.id
+        delta = [origin, self.versions.get(origin, 0) + 1, kind, peer_id, list(endpoint) if endpoint is not None else None]
+
+        self.apply(delta, self.client.peer_list)
+        self.save()
+        self.client.gossip.publish("membership_delta", delta)
+
+    def change(self, delta : list, peer_list : dict) -> None:
+        """Function to make the change of a delta to a peer list"""
+        _, _, kind, peer_id, endpoint = delta
+        if kind == LEAVE:
+            peer_list.pop(peer_id, None)
+        else:
+            peer_list[peer_id] = entry(*endpoint)
+
+    def apply(self, delta : list, peer_list : dict) -> None:
+        """Function to apply a delta to a peer list and record it"""
+        self.change(delta, peer_list)
+
+        origin, number = delta[0], delta[1]
+        self.versions[origin] = number
+        log = self.log.setdefault(origin, [])
+        log.append(delta)
+        del log[:-MAX_DELTAS]
+
+    def receive(self, delta : list, addr : tuple) -> None:
+        """Function to apply a delta in order, asking the sender for the deltas missing before it"""
+        origin, number = delta[0], delta[1]
+        known = self.versions.get(origin, 0)
+        if number <= known:
+            return
+
+        if number > known + 1:
+            self.pending.setdefault(origin, {})[number] = delta
+            self.gaps += 1
+
+            now = time.monotonic()
+            if now - self.requested.get(origin, 0) > REQUEST_INTERVAL:
+                self.requested[origin] = now
+                self.request(addr)
+            return
+
+        self.apply(delta, self.client.peer_list)
+        self.apply_pending()
+        self.save()
+
+    def apply_pending(self) -> None:
+        """Function to apply the deltas that were waiting for the ones before them"""
+        for origin in list(self.pending):
+            waiting = self.pending[origin]
+            for number in sorted(waiting):
+                if number <= self.versions.get(origin, 0):
+                    del waiting[number]
+                elif number == self.versions.get(origin, 0) + 1:
+                    self.apply(waiting.pop(number), self.client.peer_list)
+
+            if len(waiting) == 0:
+                del self.pending[origin]
+
+    def request(self, addr : tuple) -> None:
+        """Function to ask a peer for the deltas we do not have"""
+        self.client.transfer_data(encode_message("request_membership", [self.versions]), addr)
+
+    def serve(self, versions : dict, addr : tuple) -> None:
+        """Function to send a peer the deltas newer than its version, or the full membership if some are no longer kept"""
+        deltas = []
+        for origin, number in self.versions.items():
+            known = versions.get(origin, 0)
+            if number <= known:
+                continue
+
+            log = self.log.get(origin, [])
+            if len(log) == 0 or log[0][1] > known + 1:
+                self.send_snapshot(addr)
+                return
+            deltas.extend(delta for delta in log if delta[1] > known)
+
+        for start in range(0, len(deltas), DELTAS_PER_MESSAGE):
+            self.send("membership_deltas", [deltas[start:start + DELTAS_PER_MESSAGE]], addr)
+
+    def send_snapshot(self, addr : tuple) -> None:
+        """Function to send the full membership and its version to a peer"""
+        self.send("membership", [self.versions, self.client.peer_list], addr)
+
+    def receive_deltas(self, deltas : list, addr : tuple) -> None:
+        """Function to apply the deltas sent in reply to a request"""
+        for delta in deltas:
+            self.pending.setdefault(delta[0], {})[delta[1]] = delta
+        self.apply_pending()
+        self.save()
+
+    def receive_snapshot(self, versions : dict, peers : dict) -> None:
+        """Function to adopt the full membership of a peer, keeping the changes we know of that it does not"""
+        peer_list = dict(peers)
+        for origin in self.versions:
+            for delta in self.log.get(origin, []):
+                if delta[1] > versions.get(origin, 0):
+                    self.change(delta, peer_list)
+
+        for origin, number in versions.items():
+            self.versions[origin] = max(number, self.versions.get(origin, 0))
+
+        self.client.peer_list = peer_list
+        self.apply_pending()
+        self.save()
+
+    def merge(self, peers : dict) -> None:
+        """Function to add the peers of a full peer list sent by an older client, which carries no version"""
+        for peer_id, details in peers.items():
+            if peer_id not in self.client.peer_list:
+                self.client.peer_list[peer_id] = entry(*peer_endpoint(details))
+        self.save()
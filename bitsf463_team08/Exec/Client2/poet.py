@@ -0,0 +1,106 @@
+import hashlib
+import math
+from datetime import datetime
+
+"""This file contains the implementation of the Proof of Elapsed Time, with waits drawn so that the first winner is expected after a target time"""
+
+# Seconds expected before the first of the competing peers wins, whatever the size of the network
+TARGET_INTERVAL = 5.0
+
+# Distribution of the waits - "exponential" with a rate scaled by the number of peers, or "uniform" as older clients drew them
+DISTRIBUTION = "exponential"
+
+# Seconds the clocks of two peers may differ by when checking that a winner waited long enough
+CLOCK_TOLERANCE = 2.0
+
+# Fraction of the peers we know of that a winner must have competed against, so that claiming a small network does not shorten its wait
+PEER_TOLERANCE = 0.5
+
+# Seconds after which a block is taken as history, minted among peers that may have left since, so its winner is no longer checked against the current peers
+PEER_WINDOW = 60.0
+
+# Accept blocks that announce no wait, only while older clients that do not announce one are still part of the network
+ACCEPT_UNPROVEN = False
+
+class PoET:
+    """This class draws the wait of a client before it mints, and verifies the waits announced by the winners"""
+
+    def __init__(self, client, target : float = TARGET_INTERVAL, distribution : str = DISTRIBUTION,
+                 accept_unproven : bool = ACCEPT_UNPROVEN) -> None:
+        """Initializes the Proof of Elapsed Time of a client, every peer has to use the same parameters"""
+        self.client = client
+        self.target = target
+        self.distribution = distribution
+        self.accept_unproven = accept_unproven
+
+        self.verified = 0
+        self.rejected = 0
+        self.unverified = 0
+
+    def peers(self) -> int:
+        """Function to count the peers competing to mint, ourselves included and the peers known to be dead left out"""
+        return max(1, sum(1 for peer_id in list(self.client.peer_list)
+                          if peer_id == self.client.id or self.client.monitor.is_alive(peer_id)))
+
+    def wait(self, minter : str, prev_hash : str, peers : int) -> float:
+        """Function to get the wait of a peer minting on a block, fixed by both so that it can be checked and not drawn again"""
+        digest = hashlib.sha256((minter + prev_hash).encode()).hexdigest()
+        uniform = int(digest[:13], 16) / 16 ** 13
+
+        # The smallest of n waits is exponential with n times the rate, or uniform over n + 1 times less, either way the target on average
+        if self.distribution == "uniform":
+            return uniform * (peers + 1) * self.target
+        return -math.log(1 - uniform) * peers * self.target
+
+    def draw(self, prev_hash : str) -> dict:
+        """Function to draw our wait before minting on a block, returning the proof announced with the block"""
+        peers = self.peers()
+        return {
+            "minter" : self.client.id,
+            "wait" : self.wait(self.client.id, prev_hash, peers),
+            "peers" : peers
+        }
+
+    def verify_block(self, details : dict, parent : dict = None) -> bool:
+        """Function to check the wait announced by the winner of a block against its parent, looked up in the chain if not given, called on the I/O thread"""
+
+        # The genesis block has no winner
+        if details.get("header", {}).get("prev_hash") == "":
+            return True
+
+        # Blocks minted by older clients do not announce their wait, and are only taken if we still allow for them
+        proof = details.get("poet")
+        if proof is None:
+            if self.accept_unproven:
+                self.unverified += 1
+                return True
+            self.rejected += 1
+            return False
+
+        try:
+            prev_hash = details["header"]["prev_hash"]
+            valid = math.isclose(proof["wait"], self.wait(proof["minter"], prev_hash, proof["peers"]), rel_tol = 1e-9)
+
+            # A block stamped ahead of our clock could claim a wait that is not over yet
+            timestamp = datetime.fromisoformat(details["header"]["timestamp"])
+            age = (datetime.now() - timestamp).total_seconds()
+            valid = valid and age >= -CLOCK_TOLERANCE
+
+            # The draw depends on the ID of the minter, which must be a peer so that no one can pick an ID giving a short wait
+            if valid and age <= PEER_WINDOW:
+                valid = proof["minter"] in self.client.peer_list and proof["peers"] >= PEER_TOLERANCE * self.peers()
+
+            # The winner must have waited the drawn time after the block it minted on, which is only known if we have it
+            if parent is None:
+                parent = self.client.chain.get_block(prev_hash)
+            if valid and parent is not None:
+                elapsed = (timestamp - datetime.fromisoformat(parent["header"]["timestamp"])).total_seconds()
+                valid = elapsed + CLOCK_TOLERANCE >= proof["wait"]
+        except (KeyError, TypeError, ValueError):
+            valid = False
+
+        if valid:
+            self.verified += 1
+        else:
+            self.rejected += 1
+        return valid
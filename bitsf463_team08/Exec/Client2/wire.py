@@ -0,0 +1,102 @@
+import json
+import struct
+
+"""This file contains the implementation of the binary format of the messages sent between clients"""
+
+# Every message starts with the magic bytes, the format version, the message type and the length of the payload
+MAGIC = b"LM"
+VERSION = 1
+HEADER = struct.Struct(">2sBBI")
+
+# Decoder shared by all messages, payloads are always UTF-8 JSON
+DECODER = json.JSONDecoder()
+
+# Message type of every tag, new tags must only ever be appended
+MESSAGE_TYPES = {tag : number for number, tag in enumerate([
+    "temp_properties",
+    "temp_transactions",
+    "new_user",
+    "peer_list_update",
+    "new_block",
+    "request_update",
+    "sending_transaction_with_h",
+    "sending_transaction_with_b",
+    "sending_transaction_with_s",
+    "proof_result",
+    "sync_manifest",
+    "request_manifest",
+    "request_chunks",
+    "sync_chunk",
+    "sync_expired",
+    "tip",
+    "request_headers",
+    "headers",
+    "request_bodies",
+    "bodies",
+    "request_mempool",
+    "mempool",
+    "request_blocks",
+    "blocks",
+    "update",
+    "inventory",
+    "request_transactions",
+    "transactions",
+    "mempool_sketch",
+    "sketch_failed",
+    "sketch_difference",
+    "gossip",
+    "reliable",
+    "ack",
+    "ping",
+    "ping_request",
+    "ping_ack",
+    "membership",
+    "membership_delta",
+    "request_membership",
+    "membership_deltas",
+], start = 1)}
+
+TAGS = {number : tag for tag, number in MESSAGE_TYPES.items()}
+
+class Message:
+    """This class defines a received message whose payload is only decoded when it is first used"""
+
+    __slots__ = ("type", "payload", "decoded")
+
+    def __init__(self, message_type : int, payload : memoryview) -> None:
+        """Initializes the message"""
+        self.type = message_type
+        self.payload = payload
+        self.decoded = None
+
+    @property
+    def tag(self) -> str:
+        """Tag of the message"""
+        return TAGS.get(self.type)
+
+    @property
+    def data(self):
+        """Decoded payload of the message"""
+        if self.decoded is None:
+            self.decoded = DECODER.decode(str(self.payload, "utf-8")) if len(self.payload) != 0 else ""
+        return self.decoded
+
+def encode_message(tag : str, data) -> bytes:
+    """Function to encode a message with the given tag and data"""
+    payload = json.dumps(data, separators = (",", ":")).encode("utf-8") if data != "" else b""
+    return encode_raw(tag, payload)
+
+def encode_raw(tag : str, payload : bytes) -> bytes:
+    """Function to encode a message whose payload is already in binary form rather than JSON"""
+    return HEADER.pack(MAGIC, VERSION, MESSAGE_TYPES[tag], len(payload)) + payload
+
+def decode_message(datagram : bytes) -> Message:
+    """Function to read the header of a received datagram, None if it is not a valid message"""
+    if len(datagram) < HEADER.size:
+        return None
+
+    magic, version, message_type, length = HEADER.unpack_from(datagram)
+    if magic != MAGIC or version != VERSION or length != len(datagram) - HEADER.size:
+        return None
+
+    return Message(message_type, memoryview(datagram)[HEADER.size:])
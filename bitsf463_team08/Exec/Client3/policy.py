@@ -0,0 +1,68 @@
+import time
+
+"""This file contains the implementation of the block production policy deciding when to mint and what goes in a block"""
+
+# Pending transactions that fill a block, and the encoded bytes of transactions a block may hold
+MAX_TRANSACTIONS = 3
+MAX_BYTES = 64 * 1024
+
+# Seconds the oldest pending transaction may wait before a block is minted for it, however few are pending
+MAX_AGE = 30.0
+
+# Adaptive mode grows the block size while blocks fill up and shrinks it when they do not, between these bounds
+ADAPTIVE = False
+MIN_TRANSACTIONS = 1
+ADAPTIVE_LIMIT = 256
+
+class BlockPolicy:
+    """This class triggers a mint when enough transactions or bytes are pending or the oldest has waited long enough"""
+
+    def __init__(self, max_transactions : int = MAX_TRANSACTIONS, max_bytes : int = MAX_BYTES, max_age : float = MAX_AGE,
+                 adaptive : bool = ADAPTIVE) -> None:
+        """Initializes the policy"""
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.adaptive = adaptive
+
+        # Number of transactions that fills a block, which adaptive mode moves between its bounds
+        self.target = max_transactions
+
+        self.full = 0
+        self.aged = 0
+
+    def due(self, mempool) -> bool:
+        """Function to check whether the pending transactions should be minted"""
+        if len(mempool) == 0:
+            return False
+        return len(mempool) >= self.target or mempool.bytes >= self.max_bytes or self.delay(mempool) == 0
+
+    def delay(self, mempool) -> float:
+        """Function to get the seconds left before the oldest pending transaction is too old, None if nothing is pending"""
+        oldest = mempool.oldest()
+        if oldest is None:
+            return None
+        return max(0.0, oldest + self.max_age - time.monotonic())
+
+    def select(self, mempool) -> tuple:
+        """Function to choose, oldest first, the pending transactions that go in the next block, returning their IDs and size"""
+        chosen = []
+        size = 0
+        with mempool.lock:
+            for transaction_id, transaction_size in mempool.sizes.items():
+                if len(chosen) == self.target or (len(chosen) != 0 and size + transaction_size > self.max_bytes):
+                    break
+                chosen.append(transaction_id)
+                size += transaction_size
+        return chosen, size
+
+    def record(self, count : int, left : int) -> None:
+        """Function to adapt the block size to the load, doubling it while full blocks leave a backlog and halving it after a block minted for age"""
+        if count >= self.target or left != 0:
+            self.full += 1
+            if self.adaptive and left != 0:
+                self.target = min(ADAPTIVE_LIMIT, self.target * 2)
+        else:
+            self.aged += 1
+            if self.adaptive:
+                self.target = max(MIN_TRANSACTIONS, self.target // 2)
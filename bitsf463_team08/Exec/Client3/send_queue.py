@@ -0,0 +1,93 @@
+import time
+from collections import deque
+
+from twisted.internet import reactor
+
+"""This file contains the implementation of the paced queue through which a client sends its datagrams"""
+
+# Bytes per second and burst size allowed for each destination
+SEND_RATE = 8 * 1024 * 1024
+SEND_BURST = 128 * 1024
+
+# Bytes charged for every datagram on top of its length, roughly what the kernel uses to buffer it
+DATAGRAM_COST = 1024
+
+# Datagrams kept for a destination that is being paced, newer ones are dropped
+MAX_QUEUED = 4096
+
+class Destination:
+    """This class holds the token bucket and the queued datagrams of one destination"""
+
+    def __init__(self, burst : int) -> None:
+        """Initializes the destination with a full bucket"""
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.queue = deque()
+        self.timer = None
+
+class SendQueue:
+    """This class paces the datagrams sent to every destination with a token bucket, running on the reactor thread"""
+
+    def __init__(self, client, rate : int = SEND_RATE, burst : int = SEND_BURST) -> None:
+        """Initializes the send queue of a client"""
+        self.client = client
+        self.rate = rate
+        self.burst = burst
+        self.destinations = {}
+
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, data : bytes, addr : tuple) -> None:
+        """Function to send a datagram now if the destination has tokens left, else queue it"""
+        destination = self.destinations.get(addr)
+        if destination is None:
+            destination = self.destinations[addr] = Destination(self.burst)
+
+        if len(destination.queue) == 0 and self.refill(destination) >= len(data) + DATAGRAM_COST:
+            self.write(destination, data, addr)
+            return
+
+        if len(destination.queue) >= MAX_QUEUED:
+            self.dropped += 1
+            return
+
+        destination.queue.append(data)
+        self.schedule(destination, addr)
+
+    def refill(self, destination : Destination) -> float:
+        """Function to add the tokens earned since the last update of a destination"""
+        now = time.monotonic()
+        destination.tokens = min(self.burst, destination.tokens + (now - destination.updated) * self.rate)
+        destination.updated = now
+        return destination.tokens
+
+    def write(self, destination : Destination, data : bytes, addr : tuple) -> None:
+        """Function to spend the tokens of a datagram and hand it to the transport"""
+        destination.tokens -= len(data) + DATAGRAM_COST
+        self.sent += 1
+        self.client.transport.write(data, addr)
+
+    def schedule(self, destination : Destination, addr : tuple) -> None:
+        """Function to wake up when the first queued datagram of a destination can be sent"""
+        if destination.timer is not None:
+            return
+
+        missing = len(destination.queue[0]) + DATAGRAM_COST - destination.tokens
+        destination.timer = reactor.callLater(max(0.0, missing / self.rate), self.drain, addr)
+
+    def drain(self, addr : tuple) -> None:
+        """Function to send the queued datagrams of a destination that its tokens allow"""
+        destination = self.destinations[addr]
+        destination.timer = None
+
+        self.refill(destination)
+        while len(destination.queue) != 0 and destination.tokens >= len(destination.queue[0]) + DATAGRAM_COST:
+            self.write(destination, destination.queue.popleft(), addr)
+
+        if len(destination.queue) != 0:
+            self.schedule(destination, addr)
+
+    def queued(self) -> int:
+        """Function to get the number of datagrams waiting to be sent"""
+        return sum(len(destination.queue) for destination in self.destinations.values())
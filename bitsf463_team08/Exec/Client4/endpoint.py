@@ -0,0 +1,44 @@
+import argparse
+
+"""This file contains the functions used to address peers by host and port, and the network options of a client"""
+
+# Host of the peers stored before entries carried one, and advertised when no interface is given
+DEFAULT_HOST = "127.0.0.1"
+
+# Interface the sockets are bound to, an empty string for every interface
+BIND_INTERFACE = ""
+
+# Peers a new user asks to join the network, tried in order
+BOOTSTRAP_PEERS = ["127.0.0.1:1000"]
+
+def parse_endpoint(text : str) -> tuple:
+    """Function to get the (host, port) address of an endpoint written as host:port"""
+    host, _, port = text.rpartition(":")
+    return host.strip("[]"), int(port)
+
+def format_endpoint(addr : tuple) -> str:
+    """Function to write an address as host:port"""
+    host, port = addr[0], addr[1]
+    return "[%s]:%d" % (host, port) if ":" in host else "%s:%d" % (host, port)
+
+def peer_endpoint(peer : dict) -> tuple:
+    """Function to get the address of a peer from its entry in the peer list"""
+    return peer.get("host", DEFAULT_HOST), peer["port_no"]
+
+def parse_arguments(port : int) -> argparse.Namespace:
+    """Function to read the network options of a client from the command line"""
+    parser = argparse.ArgumentParser(description = "Land management blockchain client")
+    parser.add_argument("--port", type = int, default = port, help = "UDP and TCP port to listen on")
+    parser.add_argument("--interface", default = BIND_INTERFACE, help = "address to bind to, every interface by default")
+    parser.add_argument("--host", default = None, help = "address advertised to peers, the interface by default")
+    parser.add_argument("--bootstrap", action = "append", default = None, metavar = "HOST:PORT",
+                        help = "peer to join the network through, may be repeated")
+
+    args = parser.parse_args()
+    if args.host is None:
+        args.host = args.interface or DEFAULT_HOST
+    if args.bootstrap is None:
+        args.bootstrap = BOOTSTRAP_PEERS
+    args.bootstrap = [parse_endpoint(text) for text in args.bootstrap]
+
+    return args
@@ -0,0 +1,287 @@
+import math
+import random
+import time
+
+from twisted.internet import reactor
+
+from endpoint import peer_endpoint
+from wire import encode_message
+
+"""This file contains the implementation of the SWIM style failure detector that tracks which peers are alive"""
+
+# Seconds between probes of a peer, and seconds to wait for its direct ack before asking others to probe it
+PROBE_INTERVAL = 1.0
+PROBE_TIMEOUT = 0.5
+
+# Number of peers asked to probe a peer that did not answer directly
+INDIRECT_PROBES = 3
+
+# Seconds a suspected peer has to refute the suspicion before it is declared dead
+SUSPECT_TIMEOUT = 5.0
+
+# Largest number of membership updates carried by a probe, and how many times log2 of the peers each is carried
+MAX_PIGGYBACK = 8
+DISSEMINATION_FACTOR = 3
+
+ALIVE = "alive"
+SUSPECT = "suspect"
+DEAD = "dead"
+
+class Member:
+    """This class holds what is known about the liveness of a peer"""
+
+    def __init__(self) -> None:
+        """Initializes the peer as alive, every peer is until proven otherwise"""
+        self.state = ALIVE
+        self.incarnation = 0
+        self.last_seen = None
+        self.rtt = None
+        self.timer = None
+
+class PeerMonitor:
+    """This class probes a peer every interval, suspects the peers that do not answer and evicts them if they stay silent"""
+
+    def __init__(self, client, interval : float = PROBE_INTERVAL) -> None:
+        """Initializes the failure detector of a client"""
+        self.client = client
+        self.interval = interval
+        self.timer = None
+
+        self.members = {}
+        self.incarnation = 0
+
+        # Peers left to probe in this round, and the probes waiting for an ack by sequence number
+        self.order = []
+        self.sequence = 0
+        self.probes = {}
+
+        # Maps the ID of a peer to the update about it being piggybacked and the number of times left to send it
+        self.updates = {}
+
+        # Maps the address of every peer to its ID, to recognise the peers datagrams come from
+        self.addresses = {}
+
+        self.probed = 0
+        self.suspected = 0
+        self.evicted = 0
+        self.refuted = 0
+
+    def member(self, peer_id : str) -> Member:
+        """Function to get the liveness of a peer"""
+        member = self.members.get(peer_id)
+        if member is None:
+            member = self.members[peer_id] = Member()
+        return member
+
+    def is_alive(self, peer_id : str) -> bool:
+        """Function to check whether messages should still be sent to a peer, suspected peers still get them"""
+        member = self.members.get(peer_id)
+        return member is None or member.state != DEAD
+
+    def counts(self) -> dict:
+        """Function to count the peers in each state"""
+        counts = {ALIVE : 0, SUSPECT : 0, DEAD : 0}
+        for peer_id in self.client.peer_list:
+            if peer_id != self.client.id:
+                counts[self.member(peer_id).state] += 1
+        return counts
+
+    def send(self, tag : str, data, addr : tuple) -> None:
+        """Function to send a probe message, which is never retransmitted as a lost probe is itself the signal"""
+        self.client.outbox.send(encode_message(tag, data), addr)
+
+    def start(self) -> None:
+        """Function to start probing the peers"""
+        self.timer = reactor.callLater(self.interval, self.tick)
+
+    def tick(self) -> None:
+        """Function to probe the next peer of the round"""
+        self.timer = reactor.callLater(self.interval, self.tick)
+
+        peer_list = self.client.peer_list
+        if len(self.order) == 0 or len(self.addresses) != len(peer_list):
+            self.addresses = {peer_endpoint(peer_list[peer_id]) : peer_id for peer_id in list(peer_list)}
+
+        # Every peer is probed once per round, in a random order that changes each round
+        if len(self.order) == 0:
+            self.order = [peer_id for peer_id in list(peer_list) if peer_id != self.client.id and self.is_alive(peer_id)]
+            random.shuffle(self.order)
+
+        while len(self.order) != 0:
+            peer_id = self.order.pop()
+            if peer_id in peer_list and self.is_alive(peer_id):
+                self.probe(peer_id)
+                return
+
+    def probe(self, peer_id : str) -> None:
+        """Function to ping a peer directly"""
+        self.sequence += 1
+        self.probed += 1
+        self.probes[self.sequence] = {
+            "target" : peer_id,
+            "sent" : time.monotonic(),
+            "relay" : None,
+            "timer" : reactor.callLater(PROBE_TIMEOUT, self.probe_indirectly, self.sequence)
+        }
+        self.send("ping", [self.sequence, self.piggyback()], peer_endpoint(self.client.peer_list[peer_id]))
+
+    def probe_indirectly(self, sequence : int) -> None:
+        """Function to ask a few other peers to ping a peer that did not answer, in case only our path to it is broken"""
+        probe = self.probes.get(sequence)
+        if probe is None:
+            return
+
+        target = probe["target"]
+        helpers = [peer_id for peer_id in list(self.client.peer_list)
+                   if peer_id not in (target, self.client.id) and self.member(peer_id).state == ALIVE]
+        endpoint = list(peer_endpoint(self.client.peer_list[target]))
+        for peer_id in random.sample(helpers, min(INDIRECT_PROBES, len(helpers))):
+            self.send("ping_request", [sequence, endpoint, self.piggyback()], peer_endpoint(self.client.peer_list[peer_id]))
+
+        probe["timer"] = reactor.callLater(max(0.0, self.interval - PROBE_TIMEOUT), self.probe_failed, sequence)
+
+    def probe_failed(self, sequence : int) -> None:
+        """Function to suspect a peer that answered neither us nor the peers probing it for us"""
+        probe = self.probes.pop(sequence, None)
+        if probe is not None and probe["target"] in self.client.peer_list:
+            self.suspect(probe["target"], self.member(probe["target"]).incarnation)
+
+    def receive_ping(self, sequence : int, updates : list, addr : tuple) -> None:
+        """Function to answer a probe"""
+        self.apply(updates)
+        self.send("ping_ack", [sequence, self.piggyback()], addr)
+
+    def receive_ping_request(self, sequence : int, endpoint : list, updates : list, addr : tuple) -> None:
+        """Function to probe a peer for another peer, passing the ack on to it"""
+        self.apply(updates)
+
+        self.sequence += 1
+        self.probes[self.sequence] = {
+            "target" : None,
+            "sent" : time.monotonic(),
+            "relay" : (sequence, addr),
+            "timer" : reactor.callLater(self.interval, self.probes.pop, self.sequence, None)
+        }
+        self.send("ping", [self.sequence, self.piggyback()], tuple(endpoint))
+
+    def receive_ping_ack(self, sequence : int, updates : list, addr : tuple) -> None:
+        """Function to record that a probed peer is alive"""
+        self.apply(updates)
+
+        probe = self.probes.pop(sequence, None)
+        if probe is None:
+            return
+        if probe["timer"].active():
+            probe["timer"].cancel()
+
+        if probe["relay"] is not None:
+            self.send("ping_ack", [probe["relay"][0], self.piggyback()], probe["relay"][1])
+            return
+
+        member = self.member(probe["target"])
+        if addr == self.address_of(probe["target"]):
+            rtt = time.monotonic() - probe["sent"]
+            member.rtt = rtt if member.rtt is None else 0.875 * member.rtt + 0.125 * rtt
+        self.heard_from(member)
+
+    def address_of(self, peer_id : str) -> tuple:
+        """Function to get the address of a peer, None if it left the peer list"""
+        peer = self.client.peer_list.get(peer_id)
+        return peer_endpoint(peer) if peer is not None else None
+
+    def heard(self, addr : tuple) -> None:
+        """Function to record that a datagram arrived from a peer"""
+        peer_id = self.addresses.get(addr)
+        if peer_id is not None:
+            self.heard_from(self.member(peer_id))
+
+    def heard_from(self, member : Member) -> None:
+        """Function to treat a peer we just heard from as alive, the peer refutes suspicions others spread about it"""
+        member.last_seen = time.monotonic()
+        if member.state != ALIVE:
+            self.revive(member, member.incarnation)
+
+    def revive(self, member : Member, incarnation : int) -> None:
+        """Function to mark a peer as alive again"""
+        if member.timer is not None and member.timer.active():
+            member.timer.cancel()
+        member.timer = None
+        member.state = ALIVE
+        member.incarnation = incarnation
+
+    def suspect(self, peer_id : str, incarnation : int) -> None:
+        """Function to suspect a peer, which is declared dead if the suspicion is not refuted in time"""
+        member = self.member(peer_id)
+        if member.state == DEAD or incarnation < member.incarnation or (member.state == SUSPECT and incarnation == member.incarnation):
+            return
+
+        if member.timer is not None and member.timer.active():
+            member.timer.cancel()
+        member.state = SUSPECT
+        member.incarnation = incarnation
+        member.timer = reactor.callLater(SUSPECT_TIMEOUT, self.evict, peer_id, incarnation)
+
+        self.suspected += 1
+        self.queue(peer_id, SUSPECT, incarnation)
+
+    def evict(self, peer_id : str, incarnation : int) -> None:
+        """Function to declare a peer dead, after which messages are no longer sent to it"""
+        member = self.member(peer_id)
+        if member.state == DEAD or incarnation < member.incarnation:
+            return
+
+        if member.timer is not None and member.timer.active():
+            member.timer.cancel()
+        member.timer = None
+        member.state = DEAD
+        member.incarnation = incarnation
+
+        self.evicted += 1
+        self.queue(peer_id, DEAD, incarnation)
+
+        # Messages still being retransmitted to the peer would only be lost
+        addr = self.address_of(peer_id)
+        if addr is not None:
+            self.client.reliable.forget(addr)
+
+    def queue(self, peer_id : str, state : str, incarnation : int) -> None:
+        """Function to piggyback an update about a peer on the next probes"""
+        transmissions = DISSEMINATION_FACTOR * max(1, math.ceil(math.log2(len(self.client.peer_list) + 1)))
+        self.updates[peer_id] = [state, incarnation, transmissions]
+
+    def piggyback(self) -> list:
+        """Function to get the updates carried by a probe, those sent the fewest times first"""
+        chosen = sorted(self.updates, key = lambda peer_id : -self.updates[peer_id][2])[:MAX_PIGGYBACK]
+
+        updates = []
+        for peer_id in chosen:
+            state, incarnation, transmissions = self.updates[peer_id]
+            updates.append([peer_id, state, incarnation])
+            if transmissions <= 1:
+                del self.updates[peer_id]
+            else:
+                self.updates[peer_id][2] = transmissions - 1
+        return updates
+
+    def apply(self, updates : list) -> None:
+        """Function to apply the updates piggybacked on a probe, a higher incarnation always wins"""
+        for peer_id, state, incarnation in updates:
+            if peer_id == self.client.id:
+                # Refute a suspicion about us by announcing a newer incarnation
+                if state != ALIVE and incarnation >= self.incarnation:
+                    self.incarnation = incarnation + 1
+                    self.refuted += 1
+                    self.queue(peer_id, ALIVE, self.incarnation)
+                continue
+
+            if peer_id not in self.client.peer_list:
+                continue
+
+            member = self.member(peer_id)
+            if state == ALIVE and incarnation > member.incarnation:
+                self.revive(member, incarnation)
+                self.queue(peer_id, ALIVE, incarnation)
+            elif state == SUSPECT:
+                self.suspect(peer_id, incarnation)
+            elif state == DEAD:
+                self.evict(peer_id, incarnation)
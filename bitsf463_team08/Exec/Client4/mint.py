@@ -0,0 +1,106 @@
+from collections import deque
+
+from twisted.internet import reactor
+
+"""This file contains the implementation of the mint scheduler, which runs at most one Proof of Elapsed Time wait per client when the block policy asks for a block"""
+
+# Number of blocks minted by us whose parents are remembered, to recognise competing blocks from peers
+RECENT_BLOCKS = 64
+
+class MintScheduler:
+    """This class coalesces the triggers to mint into a single wait, cancelled when a peer mints on the same head first"""
+
+    def __init__(self, client) -> None:
+        """Initializes the scheduler of a client"""
+        self.client = client
+
+        # The running wait, the head it was started on and the proof of the wait announced with the block
+        self.timer = None
+        self.tip = None
+        self.proof = None
+
+        # Checks the policy again when the oldest pending transaction becomes too old
+        self.age_timer = None
+
+        # Set while the block is being minted on the I/O thread
+        self.minting = False
+
+        # Parents of the blocks we minted recently, a peer block with the same parent forks the chain
+        self.parents = deque(maxlen = RECENT_BLOCKS)
+
+        self.triggered = 0
+        self.coalesced = 0
+        self.blocks = 0
+        self.cancelled = 0
+        self.wasted = 0
+        self.orphaned = 0
+
+    def waiting(self) -> bool:
+        """Function to check whether a wait is running"""
+        return self.timer is not None and self.timer.active()
+
+    def check(self) -> None:
+        """Function to start a wait if the block policy says the pending transactions are due, or to check again once the oldest is too old"""
+        policy = self.client.policy
+        if policy.due(self.client.mempool):
+            self.trigger()
+            return
+
+        delay = policy.delay(self.client.mempool)
+        if delay is not None and (self.age_timer is None or not self.age_timer.active()):
+            self.age_timer = reactor.callLater(delay, self.check)
+
+    def trigger(self) -> None:
+        """Function to start a wait unless one is already running or minting, called on the reactor thread"""
+        self.triggered += 1
+
+        # The transactions arriving while minting are checked once the block is minted
+        if self.minting or self.waiting():
+            self.coalesced += 1
+            return
+
+        self.tip = self.client.chain.head
+        self.proof = self.client.poet.draw(self.tip)
+        print("\nSleeping for", self.proof["wait"])
+        self.timer = reactor.callLater(self.proof["wait"], self.mint)
+
+    def mint(self) -> None:
+        """Function to mint once the wait is over, on the I/O thread so that the block is written in order with the received ones"""
+        self.timer = None
+
+        # The wait is drawn for the head it started on, a block received through a sync since then needs a new one
+        if self.client.chain.head != self.tip:
+            self.wasted += 1
+            self.check()
+            return
+
+        self.minting = True
+        deferred = self.client.io.run(self.client.chain.mint_block, self.client, self.tip, self.proof)
+        deferred.addBoth(self.finished, self.tip)
+
+    def finished(self, block_hash, parent : str) -> None:
+        """Function to count the minted block, and start another wait if the transactions left pending are due"""
+        self.minting = False
+
+        # No block is minted when the mempool was empty or the head moved before the I/O thread got to it, a failure is already reported by the I/O worker
+        if isinstance(block_hash, str):
+            self.blocks += 1
+            self.parents.append(parent)
+        else:
+            self.wasted += 1
+
+        self.check()
+
+    def received(self, result : str, details : dict) -> None:
+        """Function to cancel the wait when a peer minted on the same head or the chain switched branch, and count the forks of our blocks"""
+        prev_hash = details["header"]["prev_hash"]
+
+        if self.waiting() and ((result == "added" and prev_hash == self.tip) or result == "reorg"):
+            self.timer.cancel()
+            self.timer = None
+            self.cancelled += 1
+            self.wasted += 1
+        elif result == "stale" and prev_hash in self.parents:
+            # The peer minted on the same parent as we did, so one of the two blocks will be orphaned
+            self.parents.remove(prev_hash)
+            self.orphaned += 1